@@ -1,8 +1,8 @@
 from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
 import core_db.config
 from rich.table import Table
 from rich import box
-import subprocess
 import os
 
 from core_db.registry import ClientActions, ZoneActions, PortfolioActions, AppActions
@@ -80,9 +80,46 @@ from ..console import (
     get_iam_user_name,
     check_admin_privileges,
     get_organization_info,
+    clear_cache,
+    set_interactive,
 )
 
-from .deploy import start_deploy_stack
+from ..clients import clear_clients
+from ..stack_outputs import (
+    OUTPUT_AUTOMATION_BUCKET_NAME,
+    OUTPUT_ARTEFACTS_BUCKET_NAME,
+    get_stack_outputs,
+)
+from .deploy import (
+    P_ROLE,
+    confirm_deploy_stacks,
+    finish_deploy_stack,
+    prepare_deploy_stack,
+    start_deploy_stack,
+)
+from .graph import GraphType, run_graph
+from .checkpoint import (
+    P_COMPLETED_NODES,
+    load_checkpoint,
+    merge_options,
+    save_checkpoint,
+    clear_checkpoint,
+)
+from .preflight import (
+    P_AWS_CLI_VERSION,
+    P_PREFLIGHT,
+    check_preflight_results,
+    get_aws_cli_version,
+    run_preflight,
+)
+from .fanout import (
+    DEFAULT_ROLE_NAME,
+    P_ADDITIONAL_BUCKETS,
+    deploy_matrix,
+    get_role_arn,
+    get_target_data,
+    print_matrix_results,
+)
 
 PORTFOLIO = "core"
 BRANCH = "main"
@@ -109,38 +146,43 @@ def get_tags(data: dict, app: str) -> dict:
     }
 
 
-def deploy_roles(data, next) -> str:
+def get_roles_stack(data: dict) -> dict:
+    """Return the start_deploy_stack() arguments for the roles stack"""
 
-    cprint("\nDEPLOY ROLES\n", style="bold underline")
+    stack = dict(data)
 
-    scope_prefix = data[P_SCOPE]
-    clients_table_name = data[P_CLIENT_TABLE_NAME]
-    zones_table_name = data[P_ZONES_TABLE_NAME]
-    portfolios_table_name = data[P_PORTFOLIOS_TABLE_NAME]
-    app_table_name = data[P_APPS_TABLE_NAME]
-    bucket_name = data[P_BUCKET_NAME]
-    artefact_bucket_name = data[P_ARTEFACT_BUCKET_NAME]
+    scope_prefix = stack[P_SCOPE]
 
     cli_project_dir = os.path.dirname(os.path.realpath(core_cli.resources.__file__))
 
-    tags = get_tags(data, "roles")
-
-    data["parameters"] = {
-        "ClientsTableName": clients_table_name,
-        "ZonesTableName": zones_table_name,
-        "PortfoliosTableName": portfolios_table_name,
-        "AppsTableName": app_table_name,
-        "BucketName": bucket_name,
-        "ArtefactBucketName": artefact_bucket_name,
+    tags = get_tags(stack, "roles")
+
+    stack["parameters"] = {
+        "ClientsTableName": stack[P_CLIENT_TABLE_NAME],
+        "ZonesTableName": stack[P_ZONES_TABLE_NAME],
+        "PortfoliosTableName": stack[P_PORTFOLIOS_TABLE_NAME],
+        "AppsTableName": stack[P_APPS_TABLE_NAME],
+        "BucketName": stack[P_BUCKET_NAME],
+        "ArtefactBucketName": stack[P_ARTEFACT_BUCKET_NAME],
+        "AdditionalBucketArns": ",".join(
+            f"arn:aws:s3:::{name}/*" for name in stack.get(P_ADDITIONAL_BUCKETS, [])
+        ),
         **tags,
     }
 
-    data[P_TEMPLATE] = os.path.join(cli_project_dir, "core-roles.yaml")
-    data[P_STACK_NAME] = f"{scope_prefix}core-automation-roles"
-    data[P_TAGS] = tags
+    stack[P_TEMPLATE] = os.path.join(cli_project_dir, "core-roles.yaml")
+    stack[P_STACK_NAME] = f"{scope_prefix}core-automation-roles"
+    stack[P_TAGS] = tags
+
+    return stack
+
+
+def deploy_roles(data, next) -> str:
+
+    cprint("\nDEPLOY ROLES\n", style="bold underline")
 
     # Deploy the roles
-    start_deploy_stack(**data)
+    start_deploy_stack(**get_roles_stack(data))
 
     cprint("\nComplete!\n", style="bold green")
 
@@ -153,57 +195,70 @@ def deploy_roles(data, next) -> str:
     return next
 
 
-def deploy_storage(data, next) -> str:
+def register_storage(data: dict):
+    """Update the client facts with the storage information.
 
-    cprint("\nS3 BUCKET DEPLOYMENT\n", style="bold underline")
+    The bucket names are the real names from the storage stack outputs.
+    """
+    stack_name = get_storage_stack_name(data)
+    outputs = get_stack_outputs(stack_name, data[P_BUCKET_REGION], data.get(P_ROLE))
 
-    client = data[P_CLIENT]
-    organization_id = data[P_ORGANIZATION_ID]
-    automation_account = data[P_AUTOMATION_ACCOUNT]
-    scope_prefix = data[P_SCOPE]
-
-    # bucket name should be; "${ScopePrefix}${Client}-core-automation-${AWS::Region}"
-    automation_bucket = data[P_BUCKET_NAME]
-    bucket_region = data[P_BUCKET_REGION]
-
-    # bucket name should be; "${ScopePrefix}${Client}-core-automation-artefacts-${AWS::Region}"
-    artefacts_bucket = data[P_ARTEFACT_BUCKET_NAME]
-
-    # Update Client Vars with storage information
     ClientActions.patch(
         **{
-            P_CLIENT: client,
-            P_AUTOMATION_ACCOUNT: automation_account,
-            P_BUCKET_NAME: automation_bucket,
-            P_BUCKET_REGION: bucket_region,
-            P_ARTEFACT_BUCKET_NAME: artefacts_bucket,
+            P_CLIENT: data[P_CLIENT],
+            P_AUTOMATION_ACCOUNT: data[P_AUTOMATION_ACCOUNT],
+            P_BUCKET_NAME: outputs.get(
+                OUTPUT_AUTOMATION_BUCKET_NAME, data[P_BUCKET_NAME]
+            ),
+            P_BUCKET_REGION: data[P_BUCKET_REGION],
+            P_ARTEFACT_BUCKET_NAME: outputs.get(
+                OUTPUT_ARTEFACTS_BUCKET_NAME, data[P_ARTEFACT_BUCKET_NAME]
+            ),
         }
     )
 
+
+def get_storage_stack_name(data: dict) -> str:
+    return f"{data[P_SCOPE]}core-automation-storage"
+
+
+def get_storage_stack(data: dict) -> dict:
+    """Return the start_deploy_stack() arguments for the storage stack"""
+
+    stack = dict(data)
+
+    # bucket name should be; "${ScopePrefix}${Client}-core-automation-${AWS::Region}"
+    # artefacts bucket name should be; "${ScopePrefix}${Client}-core-automation-artefacts-${AWS::Region}"
+
     cli_project_dir = os.path.dirname(os.path.realpath(core_cli.resources.__file__))
 
-    tags = get_tags(data, "storage")
+    tags = get_tags(stack, "storage")
 
-    data[P_STACK_PARAMETERS] = {
-        "OrganizationId": organization_id,
-        "AutomationBucketName": automation_bucket,
-        "ArtefactsBucketName": artefacts_bucket,
+    stack[P_STACK_PARAMETERS] = {
+        "OrganizationId": stack[P_ORGANIZATION_ID],
+        "AutomationBucketName": stack[P_BUCKET_NAME],
+        "ArtefactsBucketName": stack[P_ARTEFACT_BUCKET_NAME],
         **tags,
     }
 
-    data[P_TEMPLATE] = os.path.join(cli_project_dir, "core-storage.yaml")
-    data[P_STACK_NAME] = f"{scope_prefix}core-automation-storage"
-    data[P_TAGS] = tags
-
-    # save the master region
-    region = data[P_REGION]
+    stack[P_TEMPLATE] = os.path.join(cli_project_dir, "core-storage.yaml")
+    stack[P_STACK_NAME] = get_storage_stack_name(stack)
+    stack[P_TAGS] = tags
 
     # Deploy the stack in the bucket region
-    data[P_REGION] = bucket_region
-    start_deploy_stack(**data)
+    stack[P_REGION] = stack[P_BUCKET_REGION]
+
+    return stack
+
+
+def deploy_storage(data, next) -> str:
+
+    cprint("\nS3 BUCKET DEPLOYMENT\n", style="bold underline")
+
+    start_deploy_stack(**get_storage_stack(data))
 
-    # Reset the master region
-    data[P_REGION] = region
+    # Update Client Vars with storage information
+    register_storage(data)
 
     cprint("\nComplete!\n", style="bold green")
 
@@ -383,66 +438,108 @@ def register_app(data):
     AppActions.update(**app_facts)
 
 
-def deploy_database(data, next) -> str:
+def get_facts_db_stack(data: dict) -> dict:
+    """Return the start_deploy_stack() arguments for the FACTS tables stack"""
 
-    client = data[P_CLIENT]
-    scope_prefix = data[P_SCOPE]
+    stack = dict(data)
 
     # inside the module "core_db" there is a submodule "platform" that contains the template.yaml file, get
     # the real path of the template.yaml file
-
     db_project_dir = os.path.dirname(os.path.realpath(core_db.platform.__file__))
 
-    # Deploy the FACTS tables
-    cprint("\nDEPLOY FACTS DATABASE\n", style="bold underline")
+    tags = get_tags(stack, "facts")
 
-    tags = get_tags(data, "facts")
-
-    data[P_STACK_PARAMETERS] = {
-        "ClientsTableName": data[P_CLIENT_TABLE_NAME],
-        "PortfoliosTableName": data[P_PORTFOLIOS_TABLE_NAME],
-        "AppsTableName": data[P_APPS_TABLE_NAME],
-        "ZonesTableName": data[P_ZONES_TABLE_NAME],
+    stack[P_STACK_PARAMETERS] = {
+        "ClientsTableName": stack[P_CLIENT_TABLE_NAME],
+        "PortfoliosTableName": stack[P_PORTFOLIOS_TABLE_NAME],
+        "AppsTableName": stack[P_APPS_TABLE_NAME],
+        "ZonesTableName": stack[P_ZONES_TABLE_NAME],
         **tags,
     }
 
-    # Save the mater region
-    region = data[P_REGION]
+    # Deploy in the dynamodb region
+    stack[P_REGION] = stack[P_DYNAMODB_REGION]
+
+    stack[P_TEMPLATE] = os.path.join(db_project_dir, "core-automation-db-facts.yaml")
+    stack[P_STACK_NAME] = f"{stack[P_SCOPE]}core-automation-db-facts"
+    stack[P_TAGS] = tags
 
-    # Set the region to the dynamodb region
-    data[P_REGION] = data[P_DYNAMODB_REGION]
+    return stack
 
-    data[P_TEMPLATE] = os.path.join(db_project_dir, "core-automation-db-facts.yaml")
-    data[P_STACK_NAME] = f"{scope_prefix}core-automation-db-facts"
-    data[P_TAGS] = tags
 
-    # Deploy the FACTS tables region
-    start_deploy_stack(**data)
+def get_items_db_stack(data: dict) -> dict:
+    """Return the start_deploy_stack() arguments for the ITEMS and EVENTS tables stack"""
 
-    # Deploy the ITEMS and EVENTS deployment info tables
-    cprint("\nDEPLOY DEPLOYMENTS DATABASE\n", style="bold underline")
+    stack = dict(data)
+
+    db_project_dir = os.path.dirname(os.path.realpath(core_db.platform.__file__))
 
-    tags = get_tags(data, "db")
+    tags = get_tags(stack, "db")
 
-    data[P_STACK_PARAMETERS] = {
-        "ItemTableName": data[P_ITEMS_TABLE_NAME],
-        "EventTableName": data[P_EVENTS_TABLE_NAME],
+    stack[P_STACK_PARAMETERS] = {
+        "ItemTableName": stack[P_ITEMS_TABLE_NAME],
+        "EventTableName": stack[P_EVENTS_TABLE_NAME],
         **tags,
     }
 
-    data[P_TEMPLATE] = os.path.join(db_project_dir, "core-automation-db-items.yaml")
-    data[P_STACK_NAME] = f"{scope_prefix}{client}-core-automation-db-items"
-    data[P_TAGS] = tags
+    # Deploy in the dynamodb region
+    stack[P_REGION] = stack[P_DYNAMODB_REGION]
 
-    start_deploy_stack(**data)
+    stack[P_TEMPLATE] = os.path.join(db_project_dir, "core-automation-db-items.yaml")
+    stack[P_STACK_NAME] = (
+        f"{stack[P_SCOPE]}{stack[P_CLIENT]}-core-automation-db-items"
+    )
+    stack[P_TAGS] = tags
+
+    return stack
+
+
+def register_database(data: dict):
+    """Register the client, zone, portfolio and app of the core automation deployment.
+
+    The four registry items are in different tables and don't depend on each
+    other, so they are written concurrently.
+    """
 
-    # Reset the master region
-    data[P_REGION] = region
+    # The registry entries describe the "db" app of the core portfolio
+    registry = dict(data)
+    get_tags(registry, "db")
 
-    register_client(data)
-    register_zone(data)
-    register_portfolio(data)
-    register_app(data)
+    steps = [register_client, register_zone, register_portfolio, register_app]
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        futures = [executor.submit(step, dict(registry)) for step in steps]
+
+    # Raise the first error, if any
+    for future in futures:
+        future.result()
+
+
+# The database stacks deploy in parallel.  Registration needs both.
+DATABASE_GRAPH: GraphType = {
+    "db_facts": (lambda data: start_deploy_stack(**get_facts_db_stack(data)), []),
+    "db_items": (lambda data: start_deploy_stack(**get_items_db_stack(data)), []),
+    "registry": (register_database, ["db_facts", "db_items"]),
+}
+
+
+def deploy_database(data, next) -> str:
+
+    # Deploy the FACTS tables and the ITEMS and EVENTS deployment info tables
+    cprint("\nDEPLOY DATABASE\n", style="bold underline")
+
+    # Show both change sets and ask once, then deploy the two stacks in parallel
+    plans = [
+        prepare_deploy_stack(**get_facts_db_stack(data)),
+        prepare_deploy_stack(**get_items_db_stack(data)),
+    ]
+    plans = [plan for plan in plans if plan]
+    if plans and confirm_deploy_stacks(plans):
+        with ThreadPoolExecutor(max_workers=len(plans)) as executor:
+            futures = [executor.submit(finish_deploy_stack, plan) for plan in plans]
+        for future in futures:
+            future.result()
+
+    register_database(data)
 
     cprint(
         "\n[bold]WOW!  Good Job![/bold] The Process is complete!\n", style="bold green"
@@ -853,17 +950,8 @@ def check_aws_cli(data, next) -> str:
 
     # check to see that the aws cli is installed in Windows and in Linux
 
-    # run "aws --version" and capture the output
-    try:
-        result = subprocess.run(
-            ["aws", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-    except FileNotFoundError:
-        raise Exception(
-            "The AWS CLI is not installed.  Please install the AWS CLI and configure it with the appropriate permissions."
-        )
-
-    version = result.stdout.decode("utf-8").strip()
+    # run "aws --version" unless the preflight already did
+    version = data.get(P_AWS_CLI_VERSION) or get_aws_cli_version()
 
     cprint(f"The AWS CLI is installed: {version}\n")
 
@@ -872,13 +960,37 @@ def check_aws_cli(data, next) -> str:
     return next
 
 
-def welcome(data, next) -> str:
+def preflight(data, next) -> str:
+    cprint("\nPREFLIGHT CHECKS\n", style="bold underline")
+    cprint("Checking the AWS CLI, your identity, organization and privileges...\n")
+
+    results = run_preflight()
+    check_preflight_results(results)
+
+    # Saved with the checkpoint, so a resumed bootstrap doesn't probe again
+    data[P_PREFLIGHT] = results
+    data[P_AWS_CLI_VERSION] = results["AWS CLI"]["value"]
+
+    return next
+
+
+def reset_credentials():
+    """Use the profile's credentials, not ones left in the environment"""
 
     if "AWS_ACCESS_KEY_ID" in os.environ:
         del os.environ["AWS_ACCESS_KEY_ID"]
     if "AWS_SECRET_ACCESS_KEY" in os.environ:
         del os.environ["AWS_SECRET_ACCESS_KEY"]
 
+    # The credentials may have changed.  Forget anything we looked up with the old ones.
+    clear_cache()
+    clear_clients()
+
+
+def welcome(data, next) -> str:
+
+    reset_credentials()
+
     cprint("\nWELCOME\n", style="bold underline")
     cprint("Welcome to the Core-Automation setup!\n")
     cprint(
@@ -916,10 +1028,22 @@ def done(data, next) -> str:
     return next
 
 
+# The steps that only check the environment and configuration
+CHECK_STEPS = [
+    "welcome",
+    "preflight",
+    "check_aws_cli",
+    "env",
+    "profile",
+    "admin",
+    "org",
+]
+
 # The steps to setup the core automation platform
 # step_name -> (function, next_step_name)
 STEPS: dict[str, tuple[Callable, str]] = {
-    "welcome": (welcome, "check_aws_cli"),
+    "welcome": (welcome, "preflight"),
+    "preflight": (preflight, "check_aws_cli"),
     "check_aws_cli": (check_aws_cli, "env"),
     "env": (check_environment, "profile"),
     "profile": (check_profile, "admin"),
@@ -935,6 +1059,85 @@ STEPS: dict[str, tuple[Callable, str]] = {
     "done": (done, "quit"),
 }
 
+# The stack deployments and registrations in non-interactive mode.
+# node_name -> (function(data), [dependency node names])
+# The roles, storage and database stacks are independent and deploy in parallel.
+DEPLOY_GRAPH: GraphType = {
+    **DATABASE_GRAPH,
+    "roles": (lambda data: start_deploy_stack(**get_roles_stack(data)), []),
+    "storage": (lambda data: start_deploy_stack(**get_storage_stack(data)), []),
+    "storage_facts": (register_storage, ["registry", "storage"]),
+}
+
+
+def deploy_all(data, next) -> str:
+
+    cprint("\nDEPLOY CORE AUTOMATION\n", style="bold underline")
+
+    # Skip the stacks deployed before a failure.  The checkpoint saves the list.
+    completed = data.setdefault(P_COMPLETED_NODES, [])
+    run_graph(
+        DEPLOY_GRAPH, data, completed=set(completed), on_complete=completed.append
+    )
+
+    return next
+
+
+# The steps in non-interactive mode.  The checks are the same, then everything
+# is deployed at once.
+UNATTENDED_STEPS: dict[str, tuple[Callable, str]] = {
+    **{name: step for name, step in STEPS.items() if name in CHECK_STEPS},
+    "config": (check_configuration, "deploy"),
+    "deploy": (deploy_all, "done"),
+    "done": (done, "quit"),
+}
+
+# The stacks that can be deployed to many accounts and regions
+FANOUT_STACKS: dict[str, Callable[[dict], dict]] = {
+    "roles": get_roles_stack,
+    "storage": get_storage_stack,
+}
+
+
+def deploy_fanout(data, next) -> str:
+
+    cprint("\nDEPLOY TO ACCOUNTS AND REGIONS\n", style="bold underline")
+
+    accounts = data.get("accounts") or [data[P_AUTOMATION_ACCOUNT]]
+    regions = data.get("regions") or [data[P_REGION]]
+    role_name = data.get("role_name") or DEFAULT_ROLE_NAME
+
+    results = deploy_matrix(
+        data,
+        FANOUT_STACKS,
+        accounts,
+        regions,
+        data[P_CURRENT_ACCOUNT],
+        role_name,
+        data.get("max_workers") or 4,
+    )
+    print_matrix_results(results)
+
+    if any(result["status"] != "complete" for result in results.values()):
+        raise Exception("One or more deployments failed.")
+
+    # The client record has one bucket: the automation account's in the first region
+    account, region = data[P_AUTOMATION_ACCOUNT], regions[0]
+    if account in accounts:
+        role = None
+        if account != data[P_CURRENT_ACCOUNT]:
+            role = get_role_arn(account, role_name)
+        register_storage(get_target_data(data, account, region, role, regions))
+
+    return next
+
+
+# The steps to deploy the roles and storage stacks to many accounts and regions
+FANOUT_STEPS: dict[str, tuple[Callable, str]] = {
+    **UNATTENDED_STEPS,
+    "deploy": (deploy_fanout, "done"),
+}
+
 
 def get_description() -> str:
     return """Bootstrap the Core-Automation Platform.
@@ -961,6 +1164,10 @@ CLIENT and AUTOMATION_ACCOUNT environment variables can be defined with
 """
 
 
+# The bootstrap options when they are not given on the command line
+_OPTION_DEFAULTS: dict = {}
+
+
 def get_bootstrap_command(parser) -> ExecuteCommandsType:
 
     description = "Bootstrap the Core-Automation platform"
@@ -971,21 +1178,110 @@ def get_bootstrap_command(parser) -> ExecuteCommandsType:
         metavar="<account_number>",
         help="The automation account number",
     )
+    p.add_argument(
+        "-y",
+        "--yes",
+        dest="yes",
+        action="store_true",
+        help="Do not prompt.  Deploy all the stacks in parallel",
+    )
+    p.add_argument(
+        "--force",
+        dest="force",
+        action="store_true",
+        help="Deploy the stacks even if they are unchanged since the last deployment",
+    )
+    p.add_argument(
+        "--accounts",
+        dest="accounts",
+        type=lambda value: [a.strip() for a in value.split(",") if a.strip()],
+        metavar="<account>,<account>",
+        help="Deploy the roles and storage stacks to these accounts.  Implies --yes",
+    )
+    p.add_argument(
+        "--regions",
+        dest="regions",
+        type=lambda value: [r.strip() for r in value.split(",") if r.strip()],
+        metavar="<region>,<region>",
+        help="Deploy the roles and storage stacks to these regions.  Implies --yes",
+    )
+    p.add_argument(
+        "--role-name",
+        dest="role_name",
+        metavar="<name>",
+        default=DEFAULT_ROLE_NAME,
+        help=f"The role to assume in the other accounts. Default: {DEFAULT_ROLE_NAME}",
+    )
+    p.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=4,
+        metavar="<n>",
+        help="Number of concurrent deployments. Default: 4",
+    )
+    p.add_argument(
+        "--json",
+        dest="json",
+        action="store_true",
+        help="Show the change sets as JSON",
+    )
+    p.add_argument(
+        "--restart",
+        dest="restart",
+        action="store_true",
+        help="Ignore the checkpoint of a failed bootstrap and start from the beginning",
+    )
+
+    _OPTION_DEFAULTS.clear()
+    _OPTION_DEFAULTS.update(vars(p.parse_args([])))
+
     return {"bootstrap": (description, execute_setup)}
 
 
 def execute_setup(**kwargs):
+    steps = STEPS
+    if kwargs.get("yes"):
+        set_interactive(False)
+        steps = UNATTENDED_STEPS
+    if kwargs.get("accounts") or kwargs.get("regions"):
+        # The targets deploy concurrently, so nothing can prompt or show change sets
+        set_interactive(False)
+        steps = FANOUT_STEPS
+
+    # One checkpoint per profile and client
+    key = (
+        f"{kwargs.get(P_AWS_PROFILE) or util.get_aws_profile()}:"
+        f"{kwargs.get(P_CLIENT) or util.get_client()}"
+    )
+
     step = "welcome"
+
+    checkpoint = None if kwargs.get("restart") else load_checkpoint(key)
+    if checkpoint and checkpoint["step"] in steps:
+        step = checkpoint["step"]
+        kwargs = merge_options(checkpoint["data"], kwargs, _OPTION_DEFAULTS)
+        cprint(f"Resuming the bootstrap at step [cyan]{step}[/cyan]", style="bold")
+
+        # What welcome does for a fresh start.  The preflight results are saved.
+        reset_credentials()
+
     try:
         while step != "quit":
-            fn = STEPS[step][0]
-            next = STEPS[step][1]
+            save_checkpoint(key, step, kwargs)
+            fn = steps[step][0]
+            next = steps[step][1]
             step = fn(kwargs, next)
+        clear_checkpoint(key)
         return 0
     except KeyboardInterrupt:
+        save_checkpoint(key, step, kwargs)
         cprint("Aborted by user.")
         return 1
     except Exception as e:
+        # Save the progress of the step (e.g. the stacks deployed) before it failed
+        save_checkpoint(key, step, kwargs)
         cprint(f"Error: {e}", style="bold red")
+        cprint("Run the bootstrap again to resume at this step, or use --restart.")
         cprint()
         return 1
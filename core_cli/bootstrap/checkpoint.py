@@ -0,0 +1,88 @@
+"""Checkpoint of a bootstrap in progress.
+
+Before each step runs, the step name and the bootstrap data (which holds the
+results of the checks done so far) are saved.  If the bootstrap fails or is
+interrupted it resumes at the failing step instead of repeating the profile,
+privilege and organization checks and the stacks that are already deployed.
+
+The checkpoint is ~/.core/bootstrap-checkpoint.json.  It is removed when the
+bootstrap completes and ignored when it is older than CHECKPOINT_TTL.
+"""
+
+import json
+import os
+import time
+
+from ..console import cprint
+
+CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".core")
+
+CHECKPOINT_FILE = os.path.join(CHECKPOINT_DIR, "bootstrap-checkpoint.json")
+
+# Don't resume from a checkpoint older than this (seconds)
+CHECKPOINT_TTL = 24 * 60 * 60
+
+# The key in the bootstrap data for the completed deployment graph nodes
+P_COMPLETED_NODES = "completed_nodes"
+
+
+def _read_checkpoints() -> dict:
+    try:
+        with open(CHECKPOINT_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_checkpoints(checkpoints: dict):
+    # The bootstrap data holds account and role details.  Only the user can read it.
+    try:
+        os.makedirs(CHECKPOINT_DIR, mode=0o700, exist_ok=True)
+        temp_file = f"{CHECKPOINT_FILE}.{os.getpid()}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(checkpoints, f, indent=2, default=str)
+        os.replace(temp_file, CHECKPOINT_FILE)
+    except OSError as e:
+        cprint(f"Cannot save the bootstrap checkpoint: {e}", style="yellow")
+
+
+def load_checkpoint(key: str) -> dict | None:
+    """Return the checkpoint {"step", "data", "saved"} or None"""
+
+    checkpoint = _read_checkpoints().get(key)
+    if not checkpoint or time.time() - checkpoint.get("saved", 0) > CHECKPOINT_TTL:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(key: str, step: str, data: dict):
+    """Save the step to resume at and the bootstrap data"""
+
+    checkpoints = _read_checkpoints()
+    checkpoints[key] = {"step": step, "data": data, "saved": time.time()}
+    _write_checkpoints(checkpoints)
+
+
+def merge_options(saved: dict, options: dict, defaults: dict) -> dict:
+    """The saved bootstrap data with the options given on this command line.
+
+    The given options win over the saved ones.  Defaults (including store_true
+    flags left off) don't.
+    """
+    return {
+        **saved,
+        **{
+            k: v
+            for k, v in options.items()
+            if v is not None and (k not in defaults or v != defaults[k])
+        },
+    }
+
+
+def clear_checkpoint(key: str):
+    """Remove the checkpoint.  The next bootstrap starts from the beginning."""
+
+    checkpoints = _read_checkpoints()
+    if checkpoints.pop(key, None) is not None:
+        _write_checkpoints(checkpoints)
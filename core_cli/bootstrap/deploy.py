@@ -1,4 +1,8 @@
 import os
+import json
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterator
 from rich.table import Table
 from rich import box
 
@@ -6,6 +10,8 @@ import core_helper.aws as aws
 import core_framework as util
 from core_framework.models import ActionSpec
 from core_framework.constants import (
+    P_BUCKET_NAME,
+    P_BUCKET_REGION,
     P_REGION,
     P_TEMPLATE,
     P_STACK_NAME,
@@ -15,7 +21,28 @@ from core_framework.constants import (
 
 import core_logging as log
 
-from ..console import cprint, get_input
+from .. import clients
+from ..stack_outputs import describe_stack, forget_stack
+from ..console import cprint, jprint, get_input
+from .events import (
+    CREATE_COMPLETE,
+    UPDATE_COMPLETE,
+    DELETE_COMPLETE,
+    get_stack_id,
+    get_last_event_id,
+    wait_for_stack,
+)
+from .ledger import get_fingerprint, is_unchanged, record_deployment, forget_deployment
+from .staging import get_template_source
+
+# Larger change sets are summarized.  Use --json to see all the changes.
+MAX_CHANGE_ROWS = 100
+
+# The key in the deployment data for the ARN of a role to assume in the target account
+P_ROLE = "role"
+
+# The stack statuses where a matching ledger entry means there is nothing to do
+STABLE_STATUSES = ["CREATE_COMPLETE", "UPDATE_COMPLETE", "IMPORT_COMPLETE"]
 
 
 def generate_parameters(data: dict):
@@ -34,11 +61,11 @@ def generate_parameters(data: dict):
 
 
 # function will delete the changeset if it exists
-def delete_change_set_if_exists(stack_name, region):
+def delete_change_set_if_exists(stack_name, region, role=None):
 
     cprint(f"Checking if change set {stack_name}-change-set exists...")
 
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
 
     # Check if the change set exists
     try:
@@ -70,30 +97,33 @@ def delete_change_set_if_exists(stack_name, region):
 
 
 # Create a change set for the stack
-def create_stack_change_set(data: dict, region: str):
+def create_stack_change_set(
+    data: dict, region: str, source: dict | None = None, role: str | None = None
+):
 
     stack_name = data[P_STACK_NAME]
     template = data[P_TEMPLATE]
+    source = source or {"TemplateBody": open(template).read()}
 
     tags = data.get(P_TAGS, {})
 
     # delete the change set if it exists
-    delete_change_set_if_exists(stack_name, region)
+    delete_change_set_if_exists(stack_name, region, role)
 
     cprint(f"Creating change set for stack {stack_name}...")
     cprint("This may take a while...")
 
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
 
     # Create a change set for the stack
     response = cloudformation.create_change_set(
         StackName=stack_name,
-        TemplateBody=open(template).read(),
         Parameters=generate_parameters(data),
         Capabilities=["CAPABILITY_IAM", "CAPABILITY_NAMED_IAM"],
         ChangeSetName=f"{stack_name}-change-set",
         ChangeSetType="UPDATE",
         Tags=aws.transform_tag_hash(tags),
+        **source,
     )
 
     # if the response error is FAILED then query the reason and print on the console
@@ -122,23 +152,102 @@ def create_stack_change_set(data: dict, region: str):
         reason = response["StatusReason"]
         cprint(f"Cannot create change set: {reason}")
         cprint("Since there is no change set, we will stop this deployment.")
-        return {"Status": "ABORT"}
+        return {"Status": "ABORT", "StatusReason": reason}
 
     cprint("Change set created successfully.")
 
     return response
 
 
-# fucntion will read all the values that will be changes from the changeset and siplay the changes in a table
-def display_stack_change_set(stack_name: str, region: str):
-
-    cloudformation = aws.cfn_client(region=region)
-
-    # Get the change set
-    response = cloudformation.describe_change_set(
-        ChangeSetName=f"{stack_name}-change-set", StackName=stack_name
-    )
-    changes = response["Changes"]
+def iter_change_set(
+    stack_name: str, region: str, role: str | None = None
+) -> Iterator[dict]:
+    """Yield the resource changes of the change set, one page at a time"""
+
+    cloudformation = clients.cfn_client(region, role)
+
+    args = {"ChangeSetName": f"{stack_name}-change-set", "StackName": stack_name}
+    while True:
+        response = cloudformation.describe_change_set(**args)
+        for change in response.get("Changes", []):
+            resource_change = change.get("ResourceChange")
+            if resource_change:
+                yield resource_change
+        if not response.get("NextToken"):
+            break
+        args["NextToken"] = response["NextToken"]
+
+
+def get_change_rows(resource_change: dict) -> list[tuple]:
+    """Return the table rows of a resource change.  One row per change detail."""
+
+    action = resource_change.get("Action", "")
+    logical_id = resource_change.get("LogicalResourceId", "")
+    physical_id = resource_change.get("PhysicalResourceId", "")
+    replacement = resource_change.get("Replacement", "")
+    change_type = resource_change.get("ResourceType", "")
+
+    details = resource_change.get("Details")
+    if not details:
+        return [(action, logical_id, change_type, replacement, physical_id, "")]
+
+    rows = []
+    for resource in details:
+        change_source = resource.get("ChangeSource", "")
+        target = resource.get("Target", {})
+        target_name = ""
+
+        if change_source == "DirectModification":
+            if "Name" in target:
+                target_name = target["Name"]
+            elif "Attribute" in target:
+                target_name = target["Attribute"]
+
+        elif change_source == "ResourceReference":
+            if "Name" in target:
+                target_name = target["Name"]
+
+        rows.append(
+            (action, logical_id, change_type, replacement, physical_id, target_name)
+        )
+    return rows
+
+
+# function will read all the changes from the change set and display them.  Large
+# change sets are summarized so they don't flood the console.
+def display_stack_change_set(
+    stack_name: str, region: str, role: str | None = None, as_json: bool = False
+):
+
+    summary: Counter = Counter()
+    changes = []
+    rows = []
+    truncated = False
+    for resource_change in iter_change_set(stack_name, region, role):
+        action = resource_change.get("Action", "")
+        summary[(action, resource_change.get("Replacement", "") or "-")] += 1
+        if as_json:
+            changes.append(resource_change)
+        elif len(rows) < MAX_CHANGE_ROWS:
+            rows.extend(get_change_rows(resource_change))
+        else:
+            truncated = True
+
+    if as_json:
+        jprint(
+            json.dumps(
+                {
+                    "StackName": stack_name,
+                    "Summary": [
+                        {"Action": a, "Replacement": r, "Count": n}
+                        for (a, r), n in sorted(summary.items())
+                    ],
+                    "Changes": changes,
+                },
+                default=str,
+            )
+        )
+        return
 
     cprint("The following changes will be made:")
 
@@ -151,63 +260,36 @@ def display_stack_change_set(stack_name: str, region: str):
     table.add_column("Physical ID", style="cyan", no_wrap=True)
     table.add_column("Target", style="cyan", no_wrap=True)
 
-    # Display the changes
-    for change in changes:
-
-        resource_change = change.get("ResourceChange")
-
-        if resource_change:
-
-            action = resource_change.get("Action", "")
-            logical_id = resource_change.get("LogicalResourceId", "")
-            physical_id = resource_change.get("PhysicalResourceId", "")
-            replacement = resource_change.get("Replacement", "")
-            change_type = resource_change.get("ResourceType")
-
-            details = resource_change.get("Details")
-            if details:
-                for resource in details:
-                    change_source = resource.get("ChangeSource", "")
-                    target = resource.get("Target", "")
-                    target_name = ""
-
-                    if change_source == "DirectModification":
-                        if "Name" in target:
-                            target_name = resource["Target"]["Name"]
-                        elif "Attribute" in target:
-                            target_name = resource["Target"]["Attribute"]
-
-                    elif change_source == "ResourceReference":
-                        if "Name" in target:
-                            target_name = resource["Target"]["Name"]
-
-                    table.add_row(
-                        action,
-                        logical_id,
-                        change_type,
-                        replacement,
-                        physical_id,
-                        target_name,
-                    )
-            else:
-                table.add_row(
-                    action,
-                    logical_id,
-                    change_type,
-                    replacement,
-                    physical_id,
-                    target_name,
-                )
+    for row in rows:
+        table.add_row(*row)
+
+    cprint(table)
+
+    if truncated:
+        cprint("[dim]Only the first changes are shown.  Use --json to see all.[/dim]")
+
+    # Summarize the changes by action and replacement
+    table = Table(title="Change Summary", box=box.SIMPLE)
+    table.add_column("Action", style="cyan")
+    table.add_column("Replacement", style="cyan")
+    table.add_column("Resources", justify="right")
+    for (action, replacement), count in sorted(summary.items()):
+        table.add_row(action, replacement, str(count))
+    table.add_row("[bold]Total[/bold]", "", f"[bold]{sum(summary.values())}[/bold]")
 
     cprint(table)
 
 
-def deploy_stack_change(stack_name: str, region: str):
+def deploy_stack_change(stack_name: str, region: str, role: str | None = None):
 
     cprint(f"Deploying change set for stack {stack_name}...")
     cprint("This may take a while...")
 
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
+
+    stack_id = get_stack_id(stack_name, region, role)
+    since_event_id = get_last_event_id(stack_id, region, role)
+    started = datetime.now(timezone.utc)
 
     # Execute the change set.  Ensure capabilities are et to allow IAM changes
     response = cloudformation.execute_change_set(
@@ -220,52 +302,55 @@ def deploy_stack_change(stack_name: str, region: str):
     ):
         raise Exception(f"Error executing change set: {response}")
 
-    try:
-        # wait for the change set to be
-        waiter = cloudformation.get_waiter("stack_update_complete")
-        waiter.wait(StackName=stack_name)
-    except ValueError as e:
-        cprint(e)
+    # follow the stack events until the update is complete
+    wait_for_stack(
+        stack_id, region, UPDATE_COMPLETE, since_event_id, role, stack_name, started
+    )
 
 
-def check_stack_exists(stack_name: str, region: str):
+def get_stack_status(
+    stack_name: str, region: str, role: str | None = None
+) -> str | None:
+    """Return the status of the stack or None if it doesn't exist.
+
+    The stack outputs are cached by the same call.
+    """
+    stack = describe_stack(stack_name, region, role)
+    return stack["StackStatus"] if stack else None
 
-    cloudformation = aws.cfn_client(region=region)
-    stack_exists = False
-    try:
-        stacks = cloudformation.describe_stacks()
-        for stack in stacks["Stacks"]:
-            if stack["StackName"] == stack_name:
-                stack_exists = True
-                break
-    except Exception as e:
-        cprint(e)
-        stack_exists = False
 
-    return stack_exists
+def check_stack_exists(stack_name: str, region: str, role: str | None = None):
 
+    return get_stack_status(stack_name, region, role) is not None
 
-def delete_stack_if_in_bad_status(stack_name: str, region: str):
 
-    if not check_stack_exists(stack_name, region):
+def delete_stack_if_in_bad_status(
+    stack_name: str, region: str, role: str | None = None
+):
+
+    if not check_stack_exists(stack_name, region, role):
         return True
 
     # if the current stack status is ROLLBACK_COMPLETE, DELETE it
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
     stack = cloudformation.describe_stacks(StackName=stack_name)
     stack_status = stack["Stacks"][0]["StackStatus"]
 
     # If a Rollback is complete, then delete the stack
     if stack_status == "ROLLBACK_COMPLETE":
         cprint(f"Stack {stack_name} is in status {stack_status}.  Deleting stack...")
-        delete_stack(stack_name, region)
+        delete_stack(stack_name, region, role)
         return True
 
-    # if the current stack is in progress, then raise an exception
+    # if the current stack is in progress or rolling back, then raise an exception
     if stack_status in [
         "CREATE_IN_PROGRESS",
         "UPDATE_IN_PROGRESS",
         "DELETE_IN_PROGRESS",
+        "ROLLBACK_IN_PROGRESS",
+        "UPDATE_ROLLBACK_IN_PROGRESS",
+        "UPDATE_COMPLETE_CLEANUP_IN_PROGRESS",
+        "UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS",
     ]:
         raise Exception(
             f"Stack {stack_name} is in status {stack_status}.  Cannot deploy stack while in progress."
@@ -273,59 +358,83 @@ def delete_stack_if_in_bad_status(stack_name: str, region: str):
 
 
 # function will deploy the cloudformation stack using the yaml template 'cfn-core-api-app.yaml'
-def deploy_stack(data: dict, region: str):
+def deploy_stack(
+    data: dict, region: str, source: dict | None = None, role: str | None = None
+):
 
     stack_name = data[P_STACK_NAME]
     template = data[P_TEMPLATE]
+    source = source or {"TemplateBody": open(template).read()}
     tags = data.get(P_TAGS, {})
 
     cprint(f"Deploying stack {stack_name}...")
     cprint("This may take a while...")
 
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
 
     # Deploy the CloudFormation stack.  Make sure the stack appears on the AWS "Appications" console page.
     response = cloudformation.create_stack(
         StackName=stack_name,
         Parameters=generate_parameters(data),
-        TemplateBody=open(template).read(),
         Capabilities=["CAPABILITY_IAM", "CAPABILITY_NAMED_IAM"],
         Tags=aws.transform_tag_hash(tags),
+        **source,
     )
 
-    # wait for the stack creation to complete
-    waiter = cloudformation.get_waiter("stack_create_complete")
-    waiter.wait(StackName=stack_name)
+    # follow the stack events until the stack creation is complete
+    wait_for_stack(
+        response["StackId"], region, CREATE_COMPLETE, None, role, stack_name
+    )
 
     return response
 
 
 # Delete the stack and wait for it to be completed
-def delete_stack(stack_name: str, region: str):
+def delete_stack(stack_name: str, region: str, role: str | None = None):
 
     cprint(f"Deleting stack {stack_name}...")
     cprint("This may take a while...")
 
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
+
+    # A deleted stack can only be described by its id
+    stack_id = get_stack_id(stack_name, region, role)
+    if stack_id is None:
+        cprint(f"Stack {stack_name} does not exist.")
+        return None
+    since_event_id = get_last_event_id(stack_id, region, role)
+    started = datetime.now(timezone.utc)
 
     response = cloudformation.delete_stack(StackName=stack_name)
 
-    # wait for the stack deletion to complete
-    waiter = cloudformation.get_waiter("stack_delete_complete")
-    waiter.wait(StackName=stack_name)
+    forget_deployment(stack_name, region, role)
+    forget_stack(stack_name, region, role)
+
+    # follow the stack events until the stack deletion is complete
+    wait_for_stack(
+        stack_id, region, DELETE_COMPLETE, since_event_id, role, stack_name, started
+    )
 
     return response
 
 
 # Use aws boto3 to verify the stack yaml file is correct and can be deployed
-def verify_stack_template(stack_name: str, template: str, region: str):
+def verify_stack_template(
+    stack_name: str,
+    template: str,
+    region: str,
+    source: dict | None = None,
+    role: str | None = None,
+):
 
     cprint(f"Validating stack {stack_name}...")
     cprint("This may take a while...")
 
-    cloudformation = aws.cfn_client(region=region)
+    cloudformation = clients.cfn_client(region, role)
+
+    source = source or {"TemplateBody": open(template).read()}
 
-    response = cloudformation.validate_template(TemplateBody=open(template).read())
+    response = cloudformation.validate_template(**source)
     # if the response has an error, rais an exception
     if (
         "ResponseMetadata" in response
@@ -338,7 +447,11 @@ def verify_stack_template(stack_name: str, template: str, region: str):
     return True
 
 
-def start_deploy_stack(**kwargs):
+def prepare_deploy_stack(**kwargs) -> dict | None:
+    """Validate a stack and create its change set, without deploying anything.
+
+    Returns the plan for finish_deploy_stack, or None if there is nothing to deploy.
+    """
 
     # Configure logging
     log.getLogger("boto3").setLevel(log.WARNING)
@@ -350,6 +463,9 @@ def start_deploy_stack(**kwargs):
     template = kwargs.get(P_TEMPLATE)
     region = kwargs.get(P_REGION, util.get_region())
 
+    # The role to assume to deploy into another account
+    role = kwargs.get(P_ROLE)
+
     if not stack_name:
         raise Exception("Please provide the stack name as an argument.")
 
@@ -362,27 +478,98 @@ def start_deploy_stack(**kwargs):
     if not os.path.exists(template):
         raise Exception(f"{template} does not exist")
 
+    body = open(template).read()
+
+    # skip the stack if exactly the same thing was deployed last time
+    fingerprint = get_fingerprint(
+        body, generate_parameters(kwargs), kwargs.get(P_TAGS, {})
+    )
+    if (
+        not kwargs.get("force", False)
+        and is_unchanged(stack_name, region, fingerprint, role)
+        and get_stack_status(stack_name, region, role) in STABLE_STATUSES
+    ):
+        cprint(
+            f"Stack {stack_name} is unchanged since the last deployment.  Skipping.  "
+            "Use --force to deploy it anyway."
+        )
+        return None
+
+    # stage the template in the automation bucket (if it exists) and use the
+    # same TemplateURL for every call
+    source = get_template_source(
+        body, kwargs.get(P_BUCKET_NAME), kwargs.get(P_BUCKET_REGION), role
+    )
+
     # verify the stack
-    verify_stack_template(stack_name, template, region)
+    verify_stack_template(stack_name, template, region, source, role)
 
-    delete_stack_if_in_bad_status(stack_name, region)
+    delete_stack_if_in_bad_status(stack_name, region, role)
 
     cprint(f"Checking if stack {stack_name} exists...")
-    stack_exists = check_stack_exists(stack_name, region)
+    stack_exists = check_stack_exists(stack_name, region, role)
     if stack_exists:
-        result = create_stack_change_set(kwargs, region)
+        result = create_stack_change_set(kwargs, region, source, role)
         if result["Status"] == "ABORT":
             cprint("No changes.")
-            return
-        display_stack_change_set(stack_name, region)
-        result = get_input("Do you want to deploy the change set?", ["Y", "n"], "y")
-        if result.lower() == "y":
-            deploy_stack_change(stack_name, region)
-        else:
-            cprint("Change set deployment aborted.")
+            # The stack already matches the template.  Remember that for next time.
+            if "didn't contain changes" in result.get("StatusReason", ""):
+                record_deployment(stack_name, region, fingerprint, role)
+            return None
+        display_stack_change_set(stack_name, region, role, kwargs.get("json", False))
+
+    return {
+        "data": kwargs,
+        "stack_name": stack_name,
+        "region": region,
+        "role": role,
+        "source": source,
+        "fingerprint": fingerprint,
+        "exists": stack_exists,
+    }
+
+
+def confirm_deploy_stacks(plans: list[dict]) -> bool:
+    """Ask once for all the change sets of the plans.  New stacks are not asked for."""
+
+    if not any(plan["exists"] for plan in plans):
+        return True
+
+    prompt = (
+        "Do you want to deploy the change set?"
+        if len(plans) == 1
+        else "Do you want to deploy the change sets?"
+    )
+    result = get_input(prompt, ["Y", "n"], "y")
+    if result.lower() != "y":
+        cprint("Change set deployment aborted.")
+        return False
+
+    return True
+
+
+def finish_deploy_stack(plan: dict):
+    """Execute the change set, or create the stack, of a plan and wait for it"""
+
+    stack_name = plan["stack_name"]
+    region = plan["region"]
+    role = plan["role"]
+
+    if plan["exists"]:
+        deploy_stack_change(stack_name, region, role)
     else:
         cprint("Stack does not exist.  Deploying new stack...")
-        deploy_stack(kwargs, region)
+        deploy_stack(plan["data"], region, plan["source"], role)
+
+    record_deployment(stack_name, region, plan["fingerprint"], role)
+    describe_stack(stack_name, region, role)
+
+
+def start_deploy_stack(**kwargs):
+
+    plan = prepare_deploy_stack(**kwargs)
+    if plan and confirm_deploy_stacks([plan]):
+        finish_deploy_stack(plan)
 
     cprint("Process complete.")
 
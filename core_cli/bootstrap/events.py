@@ -0,0 +1,203 @@
+"""Follow a CloudFormation stack operation by tailing its events.
+
+Instead of a boto3 waiter (which polls describe_stacks on a fixed delay and says
+nothing), the tailer polls describe_stack_events for the events that are newer
+than the last one seen and prints them as they happen.  The poll interval starts
+short, backs off while nothing is happening and resets when events arrive.
+
+The first *_FAILED event fails the operation.  The tailer then follows the
+rollback until the stack settles, so the next deployment doesn't find the stack
+busy in ROLLBACK_IN_PROGRESS or UPDATE_ROLLBACK_IN_PROGRESS.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+from .. import clients
+from ..console import cprint
+
+MIN_POLL_DELAY = 2.0
+MAX_POLL_DELAY = 15.0
+POLL_BACKOFF = 1.5
+
+# Stop waiting after this long.  Same as the default boto3 stack waiters.
+MAX_WAIT = 3600
+
+# Without a last seen event, events this much older than the start of the operation
+# are still shown.  Allows for the local clock being ahead of AWS.
+CLOCK_SKEW = timedelta(minutes=5)
+
+STACK_RESOURCE_TYPE = "AWS::CloudFormation::Stack"
+
+CREATE_COMPLETE = ["CREATE_COMPLETE"]
+UPDATE_COMPLETE = ["UPDATE_COMPLETE"]
+DELETE_COMPLETE = ["DELETE_COMPLETE"]
+
+# Stack statuses that mean the operation didn't work.  The ones in progress are
+# followed until the stack settles.
+FAILED_STATUSES = [
+    "CREATE_FAILED",
+    "ROLLBACK_IN_PROGRESS",
+    "ROLLBACK_COMPLETE",
+    "ROLLBACK_FAILED",
+    "DELETE_FAILED",
+    "UPDATE_FAILED",
+    "UPDATE_ROLLBACK_IN_PROGRESS",
+    "UPDATE_ROLLBACK_COMPLETE",
+    "UPDATE_ROLLBACK_FAILED",
+]
+
+STATUS_STYLES = {"FAILED": "red", "COMPLETE": "green", "IN_PROGRESS": "yellow"}
+
+
+class StackOperationFailed(Exception):
+    """A stack or one of its resources failed"""
+
+
+def get_stack_id(stack_name: str, region: str, role: str | None = None) -> str | None:
+    """Return the StackId of the stack or None if it doesn't exist"""
+
+    cloudformation = clients.cfn_client(region, role)
+    try:
+        response = cloudformation.describe_stacks(StackName=stack_name)
+    except ClientError:
+        return None
+    return response["Stacks"][0]["StackId"]
+
+
+def get_last_event_id(
+    stack_id: str, region: str, role: str | None = None
+) -> str | None:
+    """Return the id of the most recent event of the stack.
+
+    Take this before starting an operation so the tailer only shows the new events.
+    """
+    cloudformation = clients.cfn_client(region, role)
+    try:
+        events = cloudformation.describe_stack_events(StackName=stack_id)["StackEvents"]
+    except ClientError:
+        return None
+    return events[0]["EventId"] if events else None
+
+
+def get_new_events(
+    cloudformation, stack_id: str, since_event_id: str | None
+) -> list[dict]:
+    """Return the events newer than since_event_id, oldest first.
+
+    describe_stack_events returns the newest events first, so only the pages up
+    to the last seen event are read.
+    """
+    events: list[dict] = []
+    paginator = cloudformation.get_paginator("describe_stack_events")
+    for page in paginator.paginate(StackName=stack_id):
+        for event in page["StackEvents"]:
+            if event["EventId"] == since_event_id:
+                return list(reversed(events))
+            events.append(event)
+    return list(reversed(events))
+
+
+def print_event(stack_name: str, event: dict):
+    """Print one stack event"""
+
+    status = event.get("ResourceStatus", "")
+    style = next((s for k, s in STATUS_STYLES.items() if status.endswith(k)), "white")
+
+    timestamp = event["Timestamp"].strftime("%H:%M:%S")
+    message = (
+        f"{timestamp} {stack_name} {event.get('LogicalResourceId', '')} "
+        f"({event.get('ResourceType', '')}) [{style}]{status}[/{style}]"
+    )
+    reason = event.get("ResourceStatusReason")
+    if reason:
+        message += f" {reason}"
+
+    cprint(message)
+
+
+def wait_for_stack(
+    stack_id: str,
+    region: str,
+    success_statuses: list[str],
+    since_event_id: str | None = None,
+    role: str | None = None,
+    stack_name: str | None = None,
+    started: datetime | None = None,
+) -> str:
+    """Tail the stack events until the stack reaches one of the success statuses.
+
+    Args:
+        stack_id (str): The StackId.  Use the id, not the name, so a deleted stack
+            can still be followed.
+        region (str): The region of the stack
+        success_statuses (list[str]): The stack statuses that complete the operation
+        since_event_id (str, optional): Only show the events after this one
+        role (str, optional): The role to assume to read the stack events
+        stack_name (str, optional): The name shown in the output
+        started (datetime, optional): When the operation started.  Without a
+            since_event_id, older events are skipped so a failure from an earlier
+            operation doesn't stop the wait.  Defaults to now.
+
+    Raises:
+        StackOperationFailed: On the first *_FAILED event or a rollback, once the
+            rollback is over
+
+    Returns:
+        str: The final stack status
+    """
+    cloudformation = clients.cfn_client(region, role)
+    stack_name = stack_name or stack_id
+
+    cutoff = None
+    if since_event_id is None:
+        cutoff = (started or datetime.now(timezone.utc)) - CLOCK_SKEW
+
+    delay = MIN_POLL_DELAY
+    deadline = time.monotonic() + MAX_WAIT
+
+    # The first failure.  Raised when the stack stops rolling back.
+    failure = None
+
+    while time.monotonic() < deadline:
+        events = get_new_events(cloudformation, stack_id, since_event_id)
+
+        for event in events:
+            since_event_id = event["EventId"]
+            if cutoff and event["Timestamp"] < cutoff:
+                continue
+            print_event(stack_name, event)
+
+            status = event.get("ResourceStatus", "")
+            is_stack = (
+                event.get("ResourceType") == STACK_RESOURCE_TYPE
+                and event.get("PhysicalResourceId") == stack_id
+            )
+
+            failed = status.endswith("_FAILED") or (
+                is_stack and status in FAILED_STATUSES
+            )
+            if failed and failure is None:
+                reason = event.get("ResourceStatusReason", status)
+                resource = event.get("LogicalResourceId")
+                failure = f"Stack {stack_name}: {resource} {reason}"
+                cprint(f"Stack {stack_name} failed.  Waiting for it to roll back...")
+
+            if is_stack and not status.endswith("_IN_PROGRESS"):
+                if failure is not None:
+                    raise StackOperationFailed(failure)
+                if status in success_statuses:
+                    return status
+
+        # Poll quickly while things are happening and back off while they aren't
+        if events:
+            delay = MIN_POLL_DELAY
+        else:
+            delay = min(delay * POLL_BACKOFF, MAX_POLL_DELAY)
+        time.sleep(delay)
+
+    if failure is not None:
+        raise StackOperationFailed(f"{failure} (still rolling back)")
+    raise StackOperationFailed(f"Timed out waiting for stack {stack_name}")
@@ -0,0 +1,232 @@
+"""Deploy the core automation stacks to a matrix of accounts and regions.
+
+The role in each account is assumed once (the credentials are shared by all the
+regions of that account) and the targets are deployed concurrently with a bounded
+number of workers.  One failed target does not stop the others.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+from rich import box
+from rich.table import Table
+
+from core_framework.constants import (
+    P_ARTEFACT_BUCKET_NAME,
+    P_BUCKET_NAME,
+    P_BUCKET_REGION,
+    P_CLIENT,
+    P_REGION,
+    P_SCOPE,
+)
+
+from .. import clients
+from ..console import cprint
+from .deploy import P_ROLE, start_deploy_stack
+
+# The role assumed in the target accounts
+DEFAULT_ROLE_NAME = "OrganizationAccountAccessRole"
+
+# The IAM roles are global.  These stacks deploy once per account, in the first region.
+GLOBAL_STACKS = ["roles"]
+
+# The buckets of the other regions of the account, for the roles stack policies
+P_ADDITIONAL_BUCKETS = "additional_buckets"
+
+# S3 bucket names are 3 to 63 characters
+MAX_BUCKET_NAME_LENGTH = 63
+
+
+def get_role_arn(account: str, role_name: str) -> str:
+    return f"arn:aws:iam::{account}:role/{role_name}"
+
+
+def get_matrix(
+    accounts: list[str], regions: list[str], stacks: list[str]
+) -> list[tuple[str, str, str]]:
+    """Return the (account, region, stack) targets.
+
+    Global stacks are only deployed to the first region of each account.
+    """
+    targets = []
+    for account in accounts:
+        for i, region in enumerate(regions):
+            for stack in stacks:
+                if stack in GLOBAL_STACKS and i > 0:
+                    continue
+                targets.append((account, region, stack))
+    return targets
+
+
+def get_bucket_names(data: dict, account: str, region: str) -> tuple[str, str]:
+    """The automation and artefacts bucket names of a target.
+
+    Bucket names are global, so they include the account and the region:
+    "{scope}{client}-core-automation[-artefacts]-{account}-{region}".  The artefacts
+    bucket is the automation bucket if the two are the same in the bootstrap data.
+    """
+    prefix = f"{data.get(P_SCOPE) or ''}{data[P_CLIENT]}-core-automation"
+    bucket_name = f"{prefix}-{account}-{region}"
+    if data.get(P_ARTEFACT_BUCKET_NAME) in [None, "", data.get(P_BUCKET_NAME)]:
+        return bucket_name, bucket_name
+    return bucket_name, f"{prefix}-artefacts-{account}-{region}"
+
+
+def check_bucket_name(bucket_name: str):
+    """Raise ValueError if S3 will reject the length of the bucket name"""
+    if not 3 <= len(bucket_name) <= MAX_BUCKET_NAME_LENGTH:
+        raise ValueError(
+            f"Bucket name {bucket_name} is {len(bucket_name)} characters.  S3 bucket "
+            f"names are 3 to {MAX_BUCKET_NAME_LENGTH} characters.  Use a shorter "
+            "client or scope."
+        )
+
+
+def get_target_data(
+    data: dict, account: str, region: str, role: str | None, regions: list[str]
+) -> dict:
+    """The deployment data of one target.
+
+    The roles stack of the account also gets the buckets of the account's other
+    regions so its policies cover them.
+    """
+    target = dict(data)
+    target[P_REGION] = region
+    target[P_BUCKET_REGION] = region
+    target[P_ROLE] = role
+    target[P_BUCKET_NAME], target[P_ARTEFACT_BUCKET_NAME] = get_bucket_names(
+        data, account, region
+    )
+    target[P_ADDITIONAL_BUCKETS] = sorted(
+        {
+            name
+            for other in regions
+            if other != region
+            for name in get_bucket_names(data, account, other)
+        }
+    )
+    return target
+
+
+def assume_roles(
+    accounts: list[str], current_account: str, role_name: str
+) -> dict[str, str | Exception | None]:
+    """Assume the role in each account once.
+
+    Returns:
+        dict: account -> role ARN, None for the current account, or the exception
+        if the role could not be assumed
+    """
+    roles: dict[str, str | Exception | None] = {}
+    for account in accounts:
+        if account == current_account:
+            roles[account] = None
+            continue
+        role = get_role_arn(account, role_name)
+        try:
+            # The session is cached by the client factory and reused by every region
+            clients.sts_client(role).get_caller_identity()
+            roles[account] = role
+        except Exception as e:
+            cprint(f"Cannot assume {role}: {e}", style="bold red")
+            roles[account] = e
+    return roles
+
+
+def _deploy_target(stack_builder: Callable[[dict], dict], target: dict) -> float:
+    start = time.monotonic()
+    start_deploy_stack(**stack_builder(target))
+    return time.monotonic() - start
+
+
+def deploy_matrix(
+    data: dict,
+    stack_builders: dict[str, Callable[[dict], dict]],
+    accounts: list[str],
+    regions: list[str],
+    current_account: str,
+    role_name: str = DEFAULT_ROLE_NAME,
+    max_workers: int = 4,
+) -> dict[tuple[str, str, str], dict]:
+    """Deploy the stacks to every account and region.
+
+    Args:
+        data (dict): The bootstrap data
+        stack_builders (dict): stack name -> function returning the
+            start_deploy_stack() arguments for the target data
+        accounts (list[str]): The target accounts
+        regions (list[str]): The target regions
+        current_account (str): The account of the current credentials.  No role is
+            assumed to deploy into it.
+        role_name (str): The name of the role to assume in the other accounts
+        max_workers (int): The maximum number of concurrent deployments
+
+    Returns:
+        dict: (account, region, stack) -> {"status", "elapsed", "message"}
+    """
+    # Don't start anything if a bucket name is invalid
+    for account in accounts:
+        for region in regions:
+            for bucket_name in get_bucket_names(data, account, region):
+                check_bucket_name(bucket_name)
+
+    roles = assume_roles(accounts, current_account, role_name)
+
+    results: dict[tuple[str, str, str], dict] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        matrix = get_matrix(accounts, regions, list(stack_builders))
+        for account, region, stack in matrix:
+            role = roles[account]
+            if isinstance(role, Exception):
+                results[(account, region, stack)] = {
+                    "status": "skipped",
+                    "elapsed": 0.0,
+                    "message": f"Cannot assume role: {role}",
+                }
+                continue
+            target = get_target_data(data, account, region, role, regions)
+            future = executor.submit(_deploy_target, stack_builders[stack], target)
+            futures[future] = (account, region, stack)
+
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = {
+                    "status": "complete",
+                    "elapsed": future.result(),
+                    "message": "",
+                }
+            except Exception as e:
+                results[key] = {"status": "failed", "elapsed": 0.0, "message": str(e)}
+            cprint(f"{' / '.join(key)}: {results[key]['status']}")
+
+    return results
+
+
+def print_matrix_results(results: dict[tuple[str, str, str], dict]):
+    """Print the summary table of the fan-out deployment"""
+
+    table = Table(title="Deployment Summary", box=box.SIMPLE)
+    table.add_column("Account", style="cyan")
+    table.add_column("Region", style="cyan")
+    table.add_column("Stack", style="cyan")
+    table.add_column("Status")
+    table.add_column("Elapsed", justify="right")
+    table.add_column("Message")
+
+    styles = {"complete": "green", "failed": "red", "skipped": "yellow"}
+    for (account, region, stack), result in sorted(results.items()):
+        style = styles[result["status"]]
+        table.add_row(
+            account,
+            region,
+            stack,
+            f"[{style}]{result['status']}[/{style}]",
+            f"{result['elapsed']:.0f}s",
+            result["message"],
+        )
+
+    cprint(table)
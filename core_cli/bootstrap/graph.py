@@ -0,0 +1,157 @@
+"""Run bootstrap steps as a dependency graph.
+
+Each node is a function that takes the bootstrap data dictionary, plus the names of
+the nodes it depends on.  A node starts as soon as all of its dependencies have
+completed, so independent CloudFormation stacks deploy in parallel and the total
+time is the critical path rather than the sum of all the steps.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable
+
+from rich import box
+from rich.table import Table
+
+from ..console import cprint
+
+# node name -> (function(data), [dependency node names])
+GraphType = dict[str, tuple[Callable[[dict], None], list[str]]]
+
+
+def validate_graph(nodes: GraphType) -> list[str]:
+    """Check the dependencies exist and there are no cycles.
+
+    Returns:
+        list[str]: The nodes in a valid (topological) execution order
+    """
+    for name, (_, depends_on) in nodes.items():
+        for dependency in depends_on:
+            if dependency not in nodes:
+                raise ValueError(f"Step {name} depends on unknown step {dependency}")
+
+    order: list[str] = []
+    remaining = dict(nodes)
+    while remaining:
+        ready = [
+            name
+            for name, (_, depends_on) in remaining.items()
+            if all(d in order for d in depends_on)
+        ]
+        if not ready:
+            raise ValueError(f"Circular dependency between steps: {list(remaining)}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+
+    return order
+
+
+def run_graph(
+    nodes: GraphType,
+    data: dict,
+    max_workers: int = 4,
+    completed: set[str] | None = None,
+    on_complete: Callable[[str], None] | None = None,
+    title: str = "Bootstrap Steps",
+    quiet: bool = False,
+) -> dict[str, dict]:
+    """Execute the graph.
+
+    If a step fails no new steps are started.  The steps already running are
+    allowed to finish (a CloudFormation deployment can't be abandoned half way)
+    and then the first error is raised.
+
+    Args:
+        nodes (GraphType): The steps and their dependencies
+        data (dict): The bootstrap data passed to each step
+        max_workers (int): The maximum number of steps running at the same time
+        completed (set[str], optional): Steps completed by a previous run.  They
+            are not run again.
+        on_complete (Callable, optional): Called with the name of each step as it
+            completes
+        title (str): The title of the results table
+        quiet (bool): Only print the failures.  No progress messages or table.
+
+    Returns:
+        dict[str, dict]: For each step its "status" and "elapsed" seconds
+    """
+    validate_graph(nodes)
+
+    results: dict[str, dict] = {
+        name: {"status": "skipped", "elapsed": 0.0} for name in nodes
+    }
+    started: dict = {}
+    completed = {name for name in completed or [] if name in nodes}
+    for name in completed:
+        results[name] = {"status": "resumed", "elapsed": 0.0}
+    error: Exception | None = None
+
+    def run(name: str) -> float:
+        start = time.monotonic()
+        nodes[name][0](data)
+        return time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            if error is None:
+                for name, (_, depends_on) in nodes.items():
+                    if name in started.values() or name in completed:
+                        continue
+                    if all(d in completed for d in depends_on):
+                        if not quiet:
+                            cprint(f"Starting step [cyan]{name}[/cyan]")
+                        started[executor.submit(run, name)] = name
+
+            if not started:
+                break
+
+            done, _ = wait(started, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = started.pop(future)
+                try:
+                    elapsed = future.result()
+                    results[name] = {"status": "complete", "elapsed": elapsed}
+                    completed.add(name)
+                    if on_complete:
+                        on_complete(name)
+                    if not quiet:
+                        cprint(f"Step [cyan]{name}[/cyan] complete ({elapsed:.1f}s)")
+                except Exception as e:
+                    results[name] = {"status": "failed", "elapsed": 0.0}
+                    cprint(f"Step [cyan]{name}[/cyan] failed: {e}", style="bold red")
+                    if error is None:
+                        error = e
+
+    if not quiet:
+        print_graph_results(results, title)
+
+    if error is not None:
+        raise error
+
+    return results
+
+
+def print_graph_results(results: dict[str, dict], title: str = "Bootstrap Steps"):
+    """Print a table of the steps, their status and timings"""
+
+    table = Table(title=title, box=box.SIMPLE)
+    table.add_column("Step", style="cyan")
+    table.add_column("Status")
+    table.add_column("Elapsed", justify="right")
+
+    styles = {
+        "complete": "green",
+        "resumed": "dim",
+        "failed": "red",
+        "skipped": "yellow",
+    }
+    for name, result in results.items():
+        status = result["status"]
+        table.add_row(
+            name,
+            f"[{styles[status]}]{status}[/{styles[status]}]",
+            f"{result['elapsed']:.1f}s",
+        )
+
+    cprint(table)
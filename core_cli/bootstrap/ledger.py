@@ -0,0 +1,85 @@
+"""A local ledger of the stacks this CLI deployed successfully.
+
+Each entry is a fingerprint (sha256) of the template body, the parameters and the
+tags of the last successful deployment.  When a re-run would deploy exactly the
+same thing, the validation and change set round trips are skipped.
+
+The ledger is ~/.core/deployments.json.  Entries are keyed by AWS profile, region
+and stack name (and the assumed role when deploying into another account).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import core_framework as util
+
+LEDGER_FILE = os.path.join(os.path.expanduser("~"), ".core", "deployments.json")
+
+_LOCK = threading.Lock()
+
+
+def get_fingerprint(template_body: str, parameters: list | dict, tags: dict) -> str:
+    """Return the sha256 of what is being deployed"""
+
+    digest = hashlib.sha256()
+    digest.update(template_body.encode("utf-8"))
+    digest.update(json.dumps(parameters, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(json.dumps(tags or {}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _get_key(stack_name: str, region: str, role: str | None = None) -> str:
+    key = f"{util.get_aws_profile()}:{region}:{stack_name}"
+    return f"{key}@{role}" if role else key
+
+
+def _read_ledger() -> dict:
+    try:
+        with open(LEDGER_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_ledger(ledger: dict):
+    os.makedirs(os.path.dirname(LEDGER_FILE), exist_ok=True)
+    temp_file = f"{LEDGER_FILE}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(ledger, f, indent=2, sort_keys=True)
+    os.replace(temp_file, LEDGER_FILE)
+
+
+def is_unchanged(
+    stack_name: str, region: str, fingerprint: str, role: str | None = None
+) -> bool:
+    """True if the last successful deployment of the stack has the same fingerprint"""
+
+    with _LOCK:
+        entry = _read_ledger().get(_get_key(stack_name, region, role))
+    return entry is not None and entry.get("Fingerprint") == fingerprint
+
+
+def record_deployment(
+    stack_name: str, region: str, fingerprint: str, role: str | None = None
+):
+    """Save the fingerprint of a successful deployment"""
+
+    with _LOCK:
+        ledger = _read_ledger()
+        ledger[_get_key(stack_name, region, role)] = {
+            "Fingerprint": fingerprint,
+            "Deployed": datetime.now(timezone.utc).isoformat(),
+        }
+        _write_ledger(ledger)
+
+
+def forget_deployment(stack_name: str, region: str, role: str | None = None):
+    """Remove the stack from the ledger.  The next deployment will not be skipped."""
+
+    with _LOCK:
+        ledger = _read_ledger()
+        if ledger.pop(_get_key(stack_name, region, role), None) is not None:
+            _write_ledger(ledger)
@@ -0,0 +1,110 @@
+"""Run the bootstrap preflight probes concurrently.
+
+The check steps each shell out or call AWS.  The probes don't depend on each other,
+so they all run at once before the first check.  The AWS lookups are cached by the
+console helpers, which makes the check steps that follow cache hits.  A probe that
+fails stops the bootstrap before the first check.  The results are kept in the
+bootstrap data, so a resumed bootstrap doesn't probe again.
+"""
+
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from rich import box
+from rich.table import Table
+
+from ..console import (
+    cprint,
+    get_iam_user_name,
+    get_organization_info,
+    check_admin_privileges,
+)
+
+# The key in the bootstrap data for the AWS CLI version found by the preflight
+P_AWS_CLI_VERSION = "aws_cli_version"
+
+# The key in the bootstrap data for the results of the preflight probes
+P_PREFLIGHT = "preflight"
+
+
+def get_aws_cli_version() -> str:
+    """Return the output of "aws --version" """
+    try:
+        result = subprocess.run(
+            ["aws", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except FileNotFoundError:
+        raise Exception(
+            "The AWS CLI is not installed.  Please install the AWS CLI and configure "
+            "it with the appropriate permissions."
+        )
+    return result.stdout.decode("utf-8").strip()
+
+
+# probe name -> function returning the probe result
+PROBES: dict[str, Callable[[], Any]] = {
+    "AWS CLI": get_aws_cli_version,
+    "IAM User": get_iam_user_name,
+    "Organization": get_organization_info,
+    "Administrative Privileges": lambda: check_admin_privileges(get_iam_user_name()),
+}
+
+
+def _run_probe(fn: Callable[[], Any]) -> tuple[Any, float]:
+    start = time.monotonic()
+    return fn(), time.monotonic() - start
+
+
+def run_preflight(probes: dict[str, Callable[[], Any]] = PROBES) -> dict[str, dict]:
+    """Run the probes concurrently.
+
+    Returns:
+        dict: probe name -> {"ok", "elapsed", "value" or "error"}
+    """
+    start = time.monotonic()
+
+    results: dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+        futures = {name: executor.submit(_run_probe, fn) for name, fn in probes.items()}
+        for name, future in futures.items():
+            try:
+                value, elapsed = future.result()
+                results[name] = {"ok": True, "elapsed": elapsed, "value": value}
+            except Exception as e:
+                results[name] = {"ok": False, "elapsed": 0.0, "error": str(e)}
+
+    print_preflight_results(results, time.monotonic() - start)
+
+    return results
+
+
+def check_preflight_results(results: dict[str, dict]):
+    """Raise an exception naming the probes that failed"""
+
+    failed = [f"{name}: {r['error']}" for name, r in results.items() if not r["ok"]]
+    if failed:
+        raise Exception(f"The preflight checks failed.  {'; '.join(failed)}")
+
+
+def print_preflight_results(results: dict[str, dict], elapsed: float):
+    """Print the probes, their status and timings"""
+
+    table = Table(title="Preflight Checks", box=box.SIMPLE)
+    table.add_column("Check", style="cyan")
+    table.add_column("Status")
+    table.add_column("Elapsed", justify="right")
+    table.add_column("Message")
+
+    for name, result in results.items():
+        if result["ok"] and result["value"] is False:
+            status, message = "[yellow]NO[/yellow]", ""
+        elif result["ok"]:
+            status, message = "[green]OK[/green]", ""
+        else:
+            status, message = "[red]FAILED[/red]", result["error"]
+        table.add_row(name, status, f"{result['elapsed']:.1f}s", message)
+
+    cprint(table)
+    cprint(f"Preflight checks completed in {elapsed:.1f}s\n")
@@ -0,0 +1,108 @@
+"""Stage CloudFormation templates in S3.
+
+A TemplateBody is limited to 51,200 bytes and is sent again with every API call.
+When the automation bucket exists the template is uploaded once under a content
+addressed key and the validation, change set and stack creation calls all use
+the same TemplateURL.  An unchanged template is never uploaded twice.
+"""
+
+import hashlib
+import threading
+
+from botocore.exceptions import ClientError
+
+import core_framework as util
+
+from .. import clients
+from ..console import cprint
+
+# The CloudFormation limit for a TemplateBody
+MAX_TEMPLATE_BODY_SIZE = 51200
+
+TEMPLATE_PREFIX = "templates"
+
+_LOCK = threading.Lock()
+
+# (bucket_name, role) -> True if the bucket exists and we can use it with the role
+_BUCKETS: dict[tuple[str, str | None], bool] = {}
+
+# (bucket_name, key) of the templates that are known to be uploaded
+_STAGED: set[tuple[str, str]] = set()
+
+
+def get_template_key(body: str) -> str:
+    """The content addressed key of a template"""
+    return f"{TEMPLATE_PREFIX}/{hashlib.sha256(body.encode('utf-8')).hexdigest()}.yaml"
+
+
+def get_template_url(bucket_name: str, bucket_region: str, key: str) -> str:
+    return f"https://{bucket_name}.s3.{bucket_region}.amazonaws.com/{key}"
+
+
+def _bucket_exists(s3_client, bucket_name: str, role: str | None = None) -> bool:
+    with _LOCK:
+        if (bucket_name, role) in _BUCKETS:
+            return _BUCKETS[(bucket_name, role)]
+    try:
+        s3_client.head_bucket(Bucket=bucket_name)
+        exists = True
+    except ClientError:
+        exists = False
+    with _LOCK:
+        _BUCKETS[(bucket_name, role)] = exists
+    return exists
+
+
+def _upload_template(s3_client, bucket_name: str, key: str, body: str):
+    with _LOCK:
+        if (bucket_name, key) in _STAGED:
+            return
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=key)
+    except ClientError:
+        cprint(f"Uploading template to s3://{bucket_name}/{key}")
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=body.encode("utf-8"),
+            ContentType="application/x-yaml",
+        )
+    with _LOCK:
+        _STAGED.add((bucket_name, key))
+
+
+def get_template_source(
+    body: str,
+    bucket_name: str | None = None,
+    bucket_region: str | None = None,
+    role: str | None = None,
+) -> dict:
+    """Return the TemplateURL or TemplateBody argument for the CloudFormation API.
+
+    The template is staged in the bucket when the bucket exists.  Without a bucket
+    the body is sent inline, which only works for small templates.
+
+    Args:
+        body (str): The template
+        bucket_name (str, optional): The automation bucket
+        bucket_region (str, optional): The region of the automation bucket
+        role (str, optional): The role to assume to reach the bucket of another account
+
+    Returns:
+        dict: {"TemplateURL": url} or {"TemplateBody": body}
+    """
+    if bucket_name:
+        bucket_region = bucket_region or util.get_region()
+        s3_client = clients.s3_client(bucket_region, role)
+        if _bucket_exists(s3_client, bucket_name, role):
+            key = get_template_key(body)
+            _upload_template(s3_client, bucket_name, key, body)
+            return {"TemplateURL": get_template_url(bucket_name, bucket_region, key)}
+
+    if len(body.encode("utf-8")) > MAX_TEMPLATE_BODY_SIZE:
+        raise Exception(
+            f"The template is larger than {MAX_TEMPLATE_BODY_SIZE} bytes and must be "
+            f"staged in S3, but the bucket '{bucket_name}' is not available."
+        )
+
+    return {"TemplateBody": body}
@@ -0,0 +1,146 @@
+"""Shared boto3 clients for the CLI.
+
+Creating a boto3 client resolves endpoints, loads the service model and walks the
+credential chain.  That is expensive, so every CLI module gets its clients from here.
+Clients are cached by (service, region, profile, role) and are safe to share between
+threads.  Sessions and client creation are not thread-safe in boto3, so those happen
+under a lock.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from botocore.client import BaseClient
+from botocore.config import Config
+
+import core_framework as util
+
+# Sized for the concurrent fan-out in bulk SCP, export, purge and deploy commands
+MAX_POOL_CONNECTIONS = 50
+
+# Adaptive retries rate-limit on the client side when AWS starts throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    retries={"mode": "adaptive", "max_attempts": 10},
+)
+
+# Refresh assumed-role credentials this long before they expire
+CREDENTIALS_REFRESH_MARGIN = timedelta(minutes=5)
+
+ROLE_SESSION_NAME = "core-automation-cli"
+
+_LOCK = threading.RLock()
+
+# (profile, role) -> (session, expiration or None)
+_SESSIONS: dict[tuple, tuple[boto3.Session, datetime | None]] = {}
+
+# (service, region, profile, role) -> client
+_CLIENTS: dict[tuple, BaseClient] = {}
+
+
+def _get_profile_session(profile: str | None) -> boto3.Session:
+    key = (profile, None)
+    if key not in _SESSIONS:
+        session = boto3.Session()
+        # A named profile that doesn't exist raises ProfileNotFound rather than
+        # quietly falling back to the default credential chain.  With no config
+        # file the "default" profile is the default credential chain.
+        if profile and (profile != "default" or profile in session.available_profiles):
+            session = boto3.Session(profile_name=profile)
+        _SESSIONS[key] = (session, None)
+    return _SESSIONS[key][0]
+
+
+def _get_session(profile: str | None, role: str | None, region: str) -> boto3.Session:
+    if not role:
+        return _get_profile_session(profile)
+
+    key = (profile, role)
+    entry = _SESSIONS.get(key)
+    now = datetime.now(timezone.utc)
+    if entry and entry[1] - CREDENTIALS_REFRESH_MARGIN > now:
+        return entry[0]
+
+    # The credentials have expired (or never existed).  Drop the clients built on them.
+    for client_key in [k for k in _CLIENTS if k[2:] == key]:
+        del _CLIENTS[client_key]
+
+    sts = _get_profile_session(profile).client(
+        "sts", region_name=region, config=CLIENT_CONFIG
+    )
+    credentials = sts.assume_role(RoleArn=role, RoleSessionName=ROLE_SESSION_NAME)[
+        "Credentials"
+    ]
+    session = boto3.Session(
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"],
+    )
+    _SESSIONS[key] = (session, credentials["Expiration"])
+    return session
+
+
+def get_client(
+    service: str,
+    region: str | None = None,
+    role: str | None = None,
+    profile: str | None = None,
+) -> BaseClient:
+    """Return a shared boto3 client.
+
+    Args:
+        service (str): The AWS service name (e.g. "organizations", "cloudformation")
+        region (str, optional): The region.  Defaults to util.get_region()
+        role (str, optional): The ARN of a role to assume.  Credentials are cached
+            and refreshed before they expire.
+        profile (str, optional): The AWS profile.  Defaults to util.get_aws_profile()
+
+    Returns:
+        BaseClient: The client.  Safe to use from many threads.
+    """
+    region = region or util.get_region()
+    profile = profile or util.get_aws_profile()
+
+    with _LOCK:
+        session = _get_session(profile, role, region)
+        key = (service, region, profile, role)
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = session.client(service, region_name=region, config=CLIENT_CONFIG)
+            _CLIENTS[key] = client
+        return client
+
+
+def clear_clients():
+    """Drop all cached clients and sessions.  Use after the credentials change."""
+    with _LOCK:
+        _CLIENTS.clear()
+        _SESSIONS.clear()
+
+
+def org_client(role: str | None = None) -> BaseClient:
+    """Organizations client.  Organizations is a global service homed in us-east-1"""
+    return get_client("organizations", "us-east-1", role)
+
+
+def iam_client(role: str | None = None) -> BaseClient:
+    """IAM client"""
+    return get_client("iam", role=role)
+
+
+def sts_client(role: str | None = None) -> BaseClient:
+    """STS client"""
+    return get_client("sts", role=role)
+
+
+def cfn_client(region: str | None = None, role: str | None = None) -> BaseClient:
+    """CloudFormation client"""
+    return get_client("cloudformation", region, role)
+
+
+def s3_client(
+    region: str | None = None, role: str | None = None, profile: str | None = None
+) -> BaseClient:
+    """S3 client"""
+    return get_client("s3", region, role, profile)
@@ -1,23 +1,77 @@
-from typing import Any
+from typing import Any, Callable
+import functools
+import json
 import os
 import re
+import threading
+import time
 from rich.console import Console
 from rich.prompt import Prompt
 
-import zipfile
-
-from core_helper.magic import MagicS3Client
+from botocore.exceptions import ClientError
 
 import core_framework as util
 from core_framework.models import TaskPayload
 from core_framework.constants import V_PACKAGE_ZIP
 
-import core_helper.aws as aws
+from . import clients
 
 from .exceptions import OrganizationNotSetException
+from .packager import build_package, get_package_sha256, stream_package
+from .transfer import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_PART_SIZE,
+    upload_file,
+    upload_stream,
+)
 
 console = Console()
 
+# Process-wide cache of AWS lookups.  Key is (function name, aws profile, *args)
+_CACHE: dict[tuple, Any] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def memoize(fn: Callable) -> Callable:
+    """Cache the result of an AWS lookup for the life of the process.
+
+    Results are keyed by the current AWS profile and the function arguments so
+    switching profiles never returns another profile's answer.  Exceptions are
+    not cached.  Use clear_cache() to invalidate.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        key = (fn.__name__, util.get_aws_profile(), *args)
+        with _CACHE_LOCK:
+            if key in _CACHE:
+                return _copy(_CACHE[key])
+        value = fn(*args)
+        with _CACHE_LOCK:
+            _CACHE[key] = value
+        return _copy(value)
+
+    return wrapper
+
+
+def _copy(value: Any) -> Any:
+    # hand out copies so callers can't mutate the cached dict
+    return dict(value) if isinstance(value, dict) else value
+
+
+def clear_cache(name: str | None = None):
+    """Invalidate the cached AWS lookups.  Privilege verdicts have their own TTL cache.
+
+    Args:
+        name (str, optional): Only clear the entries of this function (e.g. "get_account_info").
+    """
+    with _CACHE_LOCK:
+        if name is None:
+            _CACHE.clear()
+        else:
+            for key in [k for k in _CACHE if k[0] == name]:
+                del _CACHE[key]
+
 
 def print_account_info(account_info):
     print("\nAccount Information\n")
@@ -34,57 +88,97 @@ def cprint(msg: Any | None = None, **kwargs):
     console.print(msg, **kwargs)
 
 
+def format_bytes(size: int | float) -> str:
+    """Human readable size"""
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
 def jprint(msg: Any | None = None):
     if msg is None:
         msg = ""
     console.print_json(msg)
 
 
+# When False, get_input() answers every prompt with its default (see set_interactive)
+_INTERACTIVE = True
+
+# Only one prompt at a time when steps run in parallel
+_PROMPT_LOCK = threading.Lock()
+
+
+def set_interactive(interactive: bool):
+    """Turn prompting on or off.
+
+    When off, get_input() returns the default or, if there is none, the first choice.
+    """
+    global _INTERACTIVE
+    _INTERACTIVE = interactive
+
+
+def is_interactive() -> bool:
+    """Return True if we may prompt the user"""
+    return _INTERACTIVE
+
+
 def get_input(
     message: str, choices: list[str] | None = None, default: str | None = None
 ) -> str | None:
     """get input from the user.  Loop until they enter something"""
-    while True:
-        value = Prompt.ask(message, choices=choices, default=default)
-        if not value:
-            value = default
-        if choices:
-            if value:
-                y = any(value.lower() == x.lower() for x in choices)
-                if y:
-                    return value
-            console.print("Please select from the options.")
-        else:
-            return value
-
-
+    if not _INTERACTIVE:
+        value = default if default is not None else (choices[0] if choices else None)
+        console.print(f"{message} [dim](auto: {value})[/dim]")
+        return value
+
+    with _PROMPT_LOCK:
+        while True:
+            value = Prompt.ask(message, choices=choices, default=default)
+            if not value:
+                value = default
+            if choices:
+                if value:
+                    y = any(value.lower() == x.lower() for x in choices)
+                    if y:
+                        return value
+                console.print("Please select from the options.")
+            else:
+                return value
+
+
+@memoize
 def get_organization_info():
     """get the organization information"""
     try:
-        org_client = aws.org_client()
+        org_client = clients.org_client()
         response = org_client.describe_organization()
         id = response["Organization"]["Id"]
         master_account_id = response["Organization"]["MasterAccountId"]
         email = response["Organization"]["MasterAccountEmail"]
-        response = org_client.describe_account(AccountId=master_account_id)
-        name = response["Account"]["Name"]
-        return {"Id": id, "AccountId": master_account_id, "Name": name, "Email": email}
     except org_client.exceptions.AWSOrganizationsNotInUseException:
         raise OrganizationNotSetException()
 
+    # Shares the cache with get_account_info() so the master account is described only once
+    name = get_account_info(master_account_id)["Name"]
+    return {"Id": id, "AccountId": master_account_id, "Name": name, "Email": email}
 
+
+@memoize
 def get_account_info(account_id):
     try:
-        org_client = aws.org_client()
+        org_client = clients.org_client()
         response = org_client.describe_account(AccountId=account_id)
         return response["Account"]
     except org_client.exceptions.AWSOrganizationsNotInUseException:
         raise OrganizationNotSetException()
 
 
+@memoize
 def get_iam_user_name():
     try:
-        iam_client = aws.iam_client()
+        iam_client = clients.iam_client()
         response = iam_client.get_user()
         return response["User"]["UserName"]
     except iam_client.exceptions.NoSuchEntityException:
@@ -94,8 +188,155 @@ def get_iam_user_name():
         return "Unknown user"
 
 
-def check_admin_privileges(user_name):
-    iam_client = aws.iam_client()
+# The actions every organization command calls to check the account it runs in.
+# Each command also checks for the actions it calls itself, and no others, so
+# read-only users can run the read-only commands.
+ORGANIZATION_ACTIONS = [
+    "organizations:DescribeOrganization",
+    "organizations:DescribeAccount",
+]
+
+# Show the tree of organizational units and accounts
+ORGANIZATION_TREE_ACTIONS = ORGANIZATION_ACTIONS + [
+    "organizations:ListRoots",
+    "organizations:ListOrganizationalUnitsForParent",
+    "organizations:ListAccountsForParent",
+    "organizations:DescribeOrganizationalUnit",
+]
+
+# Export the accounts with their tags and policies
+ORGANIZATION_EXPORT_ACTIONS = ORGANIZATION_ACTIONS + [
+    "organizations:ListRoots",
+    "organizations:ListOrganizationalUnitsForParent",
+    "organizations:ListAccountsForParent",
+    "organizations:ListTagsForResource",
+    "organizations:ListPoliciesForTarget",
+]
+
+# Show and list the service control policies
+SCP_READ_ACTIONS = ORGANIZATION_ACTIONS + [
+    "organizations:ListPolicies",
+    "organizations:DescribePolicy",
+    "organizations:ListTargetsForPolicy",
+]
+
+# Attach or detach a service control policy, to one target or to an OU tree
+SCP_ATTACH_ACTIONS = SCP_READ_ACTIONS + [
+    "organizations:ListOrganizationalUnitsForParent",
+    "organizations:ListAccountsForParent",
+    "organizations:DescribeOrganizationalUnit",
+    "organizations:AttachPolicy",
+]
+SCP_DETACH_ACTIONS = SCP_READ_ACTIONS + [
+    "organizations:ListOrganizationalUnitsForParent",
+    "organizations:ListAccountsForParent",
+    "organizations:DescribeOrganizationalUnit",
+    "organizations:DetachPolicy",
+]
+
+# The actions a principal must be allowed to bootstrap and manage the engine
+ADMIN_ACTIONS = [
+    "cloudformation:CreateStack",
+    "cloudformation:CreateChangeSet",
+    "iam:CreateRole",
+    "iam:PutRolePolicy",
+    "iam:PassRole",
+    "s3:CreateBucket",
+    "dynamodb:CreateTable",
+    "organizations:DescribeOrganization",
+]
+
+# How long (seconds) a privilege verdict is trusted before we simulate again
+PRIVILEGE_CACHE_TTL = 900
+
+# Private to the user.  A shared temp directory would let others plant verdicts.
+PRIVILEGE_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".core", "privileges.json")
+
+# principal|actions -> {"allowed": bool, "expires": epoch seconds}
+_PRIVILEGE_CACHE: dict[str, dict] = {}
+
+
+@memoize
+def get_principal_arn(identity_arn: str) -> str:
+    """Convert the caller identity ARN to an ARN that can be used for policy simulation.
+
+    IAM users are returned as is.  STS assumed-role sessions (including SSO permission
+    sets, which live under the /aws-reserved/sso.amazonaws.com/ path) are converted
+    to the ARN of the role.
+
+    Args:
+        identity_arn (str): The ARN returned by sts:GetCallerIdentity
+
+    Returns:
+        str: The ARN of the IAM user or role
+    """
+    parts = identity_arn.split(":", 5)
+    account_id, resource = parts[4], parts[5]
+
+    if not resource.startswith("assumed-role/"):
+        return identity_arn
+
+    role_name = resource.split("/")[1]
+    try:
+        iam_client = clients.iam_client()
+        return iam_client.get_role(RoleName=role_name)["Role"]["Arn"]
+    except Exception:
+        # We may not be allowed to read the role.  Guess the ARN without the path.
+        return f"arn:aws:iam::{account_id}:role/{role_name}"
+
+
+def _read_privilege_cache() -> dict:
+    try:
+        with open(PRIVILEGE_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_privilege_cache(cache: dict):
+    try:
+        os.makedirs(os.path.dirname(PRIVILEGE_CACHE_FILE), mode=0o700, exist_ok=True)
+        now = time.time()
+        cache = {k: v for k, v in cache.items() if v["expires"] > now}
+        temp_file = f"{PRIVILEGE_CACHE_FILE}.{os.getpid()}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        os.replace(temp_file, PRIVILEGE_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def clear_privilege_cache():
+    """Forget all privilege verdicts"""
+    with _CACHE_LOCK:
+        _PRIVILEGE_CACHE.clear()
+    try:
+        os.remove(PRIVILEGE_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def simulate_privileges(principal_arn: str, actions: list[str]) -> bool:
+    """Run one batched policy simulation for all the actions.
+
+    Group, inline, managed and permission boundary policies are all evaluated
+    by IAM so we don't need to walk them ourselves.
+
+    Returns:
+        bool: True if every action is allowed
+    """
+    iam_client = clients.iam_client()
+    paginator = iam_client.get_paginator("simulate_principal_policy")
+    for page in paginator.paginate(PolicySourceArn=principal_arn, ActionNames=actions):
+        for result in page["EvaluationResults"]:
+            if result["EvalDecision"] != "allowed":
+                return False
+    return True
+
+
+def _has_attached_admin_policy(user_name: str) -> bool:
+    iam_client = clients.iam_client()
     paginator = iam_client.get_paginator("list_attached_user_policies")
     for page in paginator.paginate(UserName=user_name):
         for policy in page["AttachedPolicies"]:
@@ -104,6 +345,60 @@ def check_admin_privileges(user_name):
     return False
 
 
+def check_admin_privileges(
+    user_name: str | None = None, actions: list[str] | None = None
+) -> bool:
+    """Check that the current principal may perform the actions a command needs.
+
+    The verdict is cached per principal and action set for PRIVILEGE_CACHE_TTL seconds
+    so repeated commands don't simulate again.
+
+    Args:
+        user_name (str, optional): The IAM user name.  Only used if we are not
+            allowed to simulate policies and must look for an attached
+            AdministratorAccess policy.
+        actions (list[str], optional): The actions to check.  Defaults to ADMIN_ACTIONS.
+
+    Returns:
+        bool: True if the principal has the privileges
+    """
+    actions = sorted(actions or ADMIN_ACTIONS)
+
+    identity_arn = clients.sts_client().get_caller_identity()["Arn"]
+
+    # The account root user can do anything
+    if identity_arn.endswith(":root"):
+        return True
+
+    principal_arn = get_principal_arn(identity_arn)
+    key = f"{principal_arn}|{','.join(actions)}"
+
+    with _CACHE_LOCK:
+        if not _PRIVILEGE_CACHE:
+            _PRIVILEGE_CACHE.update(_read_privilege_cache())
+        entry = _PRIVILEGE_CACHE.get(key)
+    if entry and entry["expires"] > time.time():
+        return entry["allowed"]
+
+    try:
+        allowed = simulate_privileges(principal_arn, actions)
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ["AccessDenied", "AccessDeniedException"]:
+            raise
+        # Not allowed to simulate.  An administrator would be, but an IAM user may
+        # still have the AdministratorAccess policy attached directly.
+        allowed = bool(user_name) and _has_attached_admin_policy(user_name)
+
+    with _CACHE_LOCK:
+        _PRIVILEGE_CACHE[key] = {
+            "allowed": allowed,
+            "expires": time.time() + PRIVILEGE_CACHE_TTL,
+        }
+        _write_privilege_cache(_PRIVILEGE_CACHE)
+
+    return allowed
+
+
 def __gen_path(task_payload: TaskPayload) -> str:
     dd = task_payload.DeploymentDetails
     parts = [dd.Portfolio]
@@ -115,6 +410,11 @@ def __gen_path(task_payload: TaskPayload) -> str:
     return "-".join(parts)
 
 
+def get_package_dir(task_payload: TaskPayload) -> str:
+    """The temp directory package_project() writes the package.zip to"""
+    return util.get_temp_dir(__gen_path(task_payload))
+
+
 def package_project(root_dir: str, task_payload: TaskPayload) -> str:
 
     # if the basedir of root_dir is not 'platform' then fail
@@ -123,34 +423,109 @@ def package_project(root_dir: str, task_payload: TaskPayload) -> str:
             "Invalid root directory. You must specify a platform directory"
         )
 
-    # use the python zipfile module to create a zip file of the project and include only the subfoloders "vars", "components"
-    # and output the zip to the file "package.zip" in the "temp" directory
+    # Zip the "vars" and "components" subfolders (or the manifest patterns) into
+    # "package.zip" in the temp directory.  See packager.build_package()
 
-    path = __gen_path(task_payload)
-
-    temp_dir = util.get_temp_dir(path)
+    temp_dir = get_package_dir(task_payload)
     fn = os.path.join(temp_dir, V_PACKAGE_ZIP)
 
-    with zipfile.ZipFile(fn, "w") as zipf:
-        for root, _, files in os.walk(root_dir):
-            for file in files:
-                zipf.write(os.path.join(root, file))
+    build_package(root_dir, fn)
+
     return temp_dir
 
 
-def upload_project(task_payload: TaskPayload, temp_dir: str) -> str:
-    # upload the zip file to the s3 bucket
+def stream_project(
+    root_dir: str,
+    task_payload: TaskPayload,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    show_progress: bool = True,
+    profile: str | None = None,
+) -> dict:
+    """Package the platform directory straight into the package key in S3.
+
+    The zip is uploaded part by part while it is built.  No temp file is written.
+    See packager.stream_package() and transfer.upload_stream().
+
+    Returns:
+        dict: The package totals and the upload result
+    """
+    if not root_dir.endswith("platform"):
+        raise ValueError(
+            "Invalid root directory. You must specify a platform directory"
+        )
+
+    return upload_stream(
+        lambda f: stream_package(root_dir, f),
+        task_payload.Package.BucketRegion,
+        task_payload.Package.BucketName,
+        task_payload.Package.Key,
+        part_size=part_size,
+        max_concurrency=max_concurrency,
+        show_progress=show_progress,
+        profile=profile,
+    )
+
+
+# The S3 object metadata holding the SHA-256 of the package zip
+PACKAGE_SHA256_METADATA = "sha256"
+
+
+def is_package_uploaded(
+    region: str,
+    bucket_name: str,
+    file_key: str,
+    sha256: str,
+    profile: str | None = None,
+) -> bool:
+    """True if the object in S3 is the same package (by its sha256 metadata)"""
+    try:
+        response = clients.s3_client(region, profile=profile).head_object(
+            Bucket=bucket_name, Key=file_key
+        )
+    except ClientError:
+        return False
+    return response.get("Metadata", {}).get(PACKAGE_SHA256_METADATA) == sha256
+
+
+def upload_project(
+    task_payload: TaskPayload,
+    temp_dir: str,
+    force: bool = False,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    show_progress: bool = True,
+    profile: str | None = None,
+) -> str:
+    # upload the zip file to the s3 bucket.  Skip it if S3 already has this package.
 
     file_key = task_payload.Package.Key
     bucket_name = task_payload.Package.BucketName
     region = task_payload.Package.BucketRegion
 
-    # Give me an actual s3 resource or my virtual 'file' bucket resource.  Depends on util.is_use_s3()
-    bucket = MagicS3Client.get_bucket(region, bucket_name)
-
     fn = os.path.join(temp_dir, V_PACKAGE_ZIP)
 
-    with open(fn, "rb") as data:
-        bucket.put_object(Key=file_key, Body=data)
+    metadata = None
+    if util.is_use_s3():
+        sha256 = get_package_sha256(fn)
+        if not force and is_package_uploaded(
+            region, bucket_name, file_key, sha256, profile
+        ):
+            cprint(f"s3://{bucket_name}/{file_key} is up to date, not uploading.")
+            return file_key
+        metadata = {PACKAGE_SHA256_METADATA: sha256}
+
+    # Multipart to S3 or a put_object to the local bucket.  See transfer.upload_file()
+    upload_file(
+        fn,
+        region,
+        bucket_name,
+        file_key,
+        metadata=metadata,
+        part_size=part_size,
+        max_concurrency=max_concurrency,
+        show_progress=show_progress,
+        profile=profile,
+    )
 
     return file_key
@@ -21,8 +21,6 @@ from core_framework.constants import (
     P_USERNAME,
 )
 
-import core_helper.aws as aws
-
 from core_cli import __version__
 
 # Please note that core_cli requires initial environment variables to be set.  Really only core_db needs it, but....
@@ -37,6 +35,7 @@ from core_cli.init import get_init_command
 from core_cli.domain import get_domain_command
 from core_cli.facts import get_facts_command
 from core_cli.configure import get_configure_command
+from core_cli import clients
 from core_cli.console import get_iam_user_name
 
 # Commands are built during the parser configuration.
@@ -120,7 +119,10 @@ def add_current_user_to_data(data):
     try:
 
         data[P_CORRELATION_ID] = util.get_correlation_id()
-        data[P_IDENTITY] = aws.get_identity()
+        # The shared STS client, so the CLI makes a single boto3 session
+        identity = clients.sts_client().get_caller_identity()
+        identity.pop("ResponseMetadata", None)
+        data[P_IDENTITY] = identity
         data[P_USERNAME] = get_iam_user_name()
         # data[P_USERNAME] = aws.get_username()
 
@@ -3,24 +3,17 @@
 import os
 import re
 
-import boto3
 from botocore.exceptions import ClientError
 
+from .. import clients
 from ..cmdparser import ExecuteCommandsType
 
-
-def assume_role(profile, account_id, role_name):
-    """rbac into the organization account"""
-    try:
-        session = boto3.Session(profile_name=profile)
-        sts_client = session.client("sts")
-        response = sts_client.assume_role(
-            RoleArn=f"arn:aws:iam::{account_id}:role/{role_name}",
-            RoleSessionName="AssumeRoleSession",
-        )
-        return response["Credentials"]
-    except ClientError as e:
-        raise OSError(f"Error assuming role: {e}") from e
+from .purge import (
+    purge_prefixes,
+    print_purge_results,
+    estimate_prefixes,
+    print_estimate,
+)
 
 
 def add_clean_parser(subparsers) -> ExecuteCommandsType:
@@ -66,10 +59,32 @@ def add_clean_parser(subparsers) -> ExecuteCommandsType:
     subparser.add_argument(
         "--bucket-name", default=bucket_name, help="S3 Bucket Name", required=False
     )
+    subparser.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=8,
+        metavar="<n>",
+        help="Number of concurrent delete requests. Default: 8",
+    )
+    subparser.add_argument(
+        "--dry-run",
+        "--estimate",
+        dest="dry_run",
+        action="store_true",
+        help="Only report the number of objects and bytes that would be deleted",
+    )
 
     return {"clean": (description, execute_clean)}
 
 
+def get_branch_prefixes(common_key_path: str) -> list[str]:
+    """The S3 prefixes of everything stored for a branch"""
+    return [
+        f"{root}/{common_key_path}/" for root in ["packages", "artefacts", "files/build"]
+    ]
+
+
 def make_defaults(**kwargs):
     """make the defaults"""
     client = kwargs.get("client", None)
@@ -113,31 +128,21 @@ def execute_clean(**kwargs):
 
     print("\nOne moment...")
 
-    delete_keys = [
-        {"Key": f"/packages/{common_key_path}"},
-        {"Key": f"/artefacts/{common_key_path}"},
-        {"Key": f"/files/build/{common_key_path}"},
-    ]
+    prefixes = get_branch_prefixes(common_key_path)
 
     try:
-        credentials = assume_role(aws_profile, master_account, automation_role)
-        session_token = credentials["SessionToken"]
-        session = boto3.Session(
-            profile_name=aws_profile,
-            region_name=bucket_region,
-            aws_session_token=session_token,
-        )
-        s3 = session.client("s3")
-        response = s3.delete_objects(
-            Bucket=bucket_name, Delete={"Objects": delete_keys, "Quiet": False}
+        role = f"arn:aws:iam::{master_account}:role/{automation_role}"
+        s3 = clients.get_client("s3", bucket_region, role, aws_profile)
+        if kwargs.get("dry_run"):
+            print_estimate(estimate_prefixes(s3, bucket_name, prefixes))
+            print("\nDry run.  Nothing was deleted.")
+            return
+        results = purge_prefixes(
+            s3, bucket_name, prefixes, max_workers=kwargs.get("max_workers") or 8
         )
     except ClientError as e:
         raise OSError(f"{e}") from e
 
-    items = response["Deleted"]
-    print("\nDeleted Items:")
-    for item in items:
-        print(f"  - {item['Key']}")
-    print("\nDone.")
+    print_purge_results(results)
 
-    print(kwargs)
+    print("\nDone.")
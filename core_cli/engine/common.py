@@ -7,6 +7,7 @@ from ..console import (
     get_account_info,
     get_iam_user_name,
     check_admin_privileges,
+    ADMIN_ACTIONS,
     get_organization_info,
 )
 
@@ -60,7 +61,7 @@ def exexecution_check(kwargs):
         cprint("Aborted")
         raise Exception("Not in master account")
 
-    is_admin = check_admin_privileges(user_name)
+    is_admin = check_admin_privileges(user_name, ADMIN_ACTIONS)
 
     if not is_admin:
         cprint("\nYou do not have administrator privileges in this account.")
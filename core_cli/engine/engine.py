@@ -5,6 +5,7 @@ from ..cmdparser import ExecuteCommandsType
 from .deploy import add_deploy_parser
 from .zones import add_zones_parser
 from .clean import add_clean_parser
+from .retention import add_retention_parser
 from .vpc import add_vpc_parser
 from .init import add_init_parser
 from .app import add_app_parser
@@ -38,6 +39,7 @@ def get_engine_command(subparsers) -> ExecuteCommandsType:
     TASKS.update(add_deploy_parser(task_parsers))
     TASKS.update(add_zones_parser(task_parsers))
     TASKS.update(add_clean_parser(task_parsers))
+    TASKS.update(add_retention_parser(task_parsers))
     TASKS.update(add_vpc_parser(task_parsers))
     TASKS.update(add_app_parser(task_parsers))
     TASKS.update(add_source_parser(task_parsers))
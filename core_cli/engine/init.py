@@ -2,7 +2,6 @@
 
 import json
 import os
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 from jinja2 import Environment, FileSystemLoader, TemplateNotFound
 
@@ -10,6 +9,7 @@ import core_framework as util
 
 from core_cli import __version__
 
+from .. import clients
 from ..cmdparser import ExecuteCommandsType
 from ..exceptions import OrganizationNotSetException
 from ..console import (
@@ -69,7 +69,7 @@ def create_trust_policy(iam, role_name, resources_dir):
             ) from e
 
 
-def create_access_policy(iam, session, role_name, resources_dir):
+def create_access_policy(iam, sts, role_name, resources_dir):
     """crate the access policy for the role"""
     # Initialize Jinja2 environment
     env = Environment(loader=FileSystemLoader(resources_dir))
@@ -90,7 +90,7 @@ def create_access_policy(iam, session, role_name, resources_dir):
         policy_name = f"{role_name}-policy"
         try:
             policy = iam.get_policy(
-                PolicyArn=f'arn:aws:iam::{session.client("sts").get_caller_identity()["Account"]}:policy/{policy_name}'
+                PolicyArn=f'arn:aws:iam::{sts.get_caller_identity()["Account"]}:policy/{policy_name}'
             )
             policy_arn = policy["Policy"]["Arn"]
             print(f"Policy '{policy_name}' already exists. Updating policy.")
@@ -147,11 +147,9 @@ def create_roles(**kwargs):
     )
 
     try:
-        # Create a boto3 session using the specified profile
-        session = boto3.Session(profile_name=profile_name)
-
-        # Initialize IAM client using the session
-        iam = session.client("iam")
+        # Initialize the IAM and STS clients using the specified profile
+        iam = clients.get_client("iam", profile=profile_name)
+        sts = clients.get_client("sts", profile=profile_name)
 
         # Set the path to the templates
         resources_dir = os.path.join(
@@ -164,7 +162,7 @@ def create_roles(**kwargs):
 
         create_trust_policy(iam, role_name, resources_dir)
 
-        create_access_policy(iam, session, role_name, resources_dir)
+        create_access_policy(iam, sts, role_name, resources_dir)
 
     except ClientError as e:
         raise OSError(f"An AWS error occurred: {e.response['Error']['Message']}") from e
@@ -189,11 +187,11 @@ def detach_policy(iam, role_name):
         print(f"Detached policy '{policy['PolicyArn']}' from role '{role_name}'.")
 
 
-def delete_policy(iam, session, role_name):
+def delete_policy(iam, sts, role_name):
     """delete all policy associated with the role based on the policy name prefix"""
     # Delete the policy
     policy_name = f"{role_name}-policy"
-    account_id = session.client("sts").get_caller_identity()["Account"]
+    account_id = sts.get_caller_identity()["Account"]
     policy_arn = f"arn:aws:iam::{account_id}:policy/{policy_name}"
 
     try:
@@ -221,11 +219,9 @@ def delete_roles(**kwargs):
         raise ValueError("Both 'profile_name' and 'role_name' must be provided.")
 
     try:
-        # Create a boto3 session using the specified profile
-        session = boto3.Session(profile_name=profile_name)
-
-        # Initialize IAM client using the session
-        iam = session.client("iam")
+        # Initialize the IAM and STS clients using the specified profile
+        iam = clients.get_client("iam", profile=profile_name)
+        sts = clients.get_client("sts", profile=profile_name)
 
         # Check if the role exists
         try:
@@ -241,7 +237,7 @@ def delete_roles(**kwargs):
 
         detach_policy(iam, role_name)
 
-        delete_policy(iam, session, role_name)
+        delete_policy(iam, sts, role_name)
 
         # Delete the role
         iam.delete_role(RoleName=role_name)
@@ -0,0 +1,271 @@
+"""Delete everything under S3 prefixes.
+
+Each prefix is listed with the list_objects_v2 paginator (list_object_versions
+when the bucket is versioned, so old versions and delete markers go too) and the
+keys are deleted with delete_objects in batches of 1,000, the API maximum.  The
+prefixes are listed concurrently and the batches are deleted concurrently while
+the listing continues.  Only a bounded number of batches is held in memory.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from botocore.exceptions import ClientError
+from rich import box
+from rich.table import Table
+
+from ..console import cprint, format_bytes
+
+# delete_objects accepts at most 1,000 keys
+MAX_DELETE_BATCH = 1000
+
+
+def is_versioned(s3_client, bucket_name: str) -> bool:
+    """True if versioning is (or was) enabled on the bucket"""
+    response = s3_client.get_bucket_versioning(Bucket=bucket_name)
+    return response.get("Status") in ["Enabled", "Suspended"]
+
+
+def iter_objects(
+    s3_client, bucket_name: str, prefix: str, versions: bool = False
+) -> Iterator[dict]:
+    """Yield every object under the prefix.
+
+    Each object is {"Key", "Size", "LastModified"} plus "VersionId" when versions
+    are listed.  Delete markers are included with a size of 0.
+    """
+    if not versions:
+        paginator = s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield {
+                    "Key": item["Key"],
+                    "Size": item.get("Size", 0),
+                    "LastModified": item.get("LastModified"),
+                }
+        return
+
+    paginator = s3_client.get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for item in page.get("Versions", []):
+            yield {
+                "Key": item["Key"],
+                "VersionId": item["VersionId"],
+                "Size": item.get("Size", 0),
+                "LastModified": item.get("LastModified"),
+            }
+        for item in page.get("DeleteMarkers", []):
+            yield {
+                "Key": item["Key"],
+                "VersionId": item["VersionId"],
+                "Size": 0,
+                "LastModified": item.get("LastModified"),
+            }
+
+
+def iter_batches(objects: Iterator[dict], size: int = MAX_DELETE_BATCH):
+    """Group the objects into lists of at most size objects"""
+    batch = []
+    for item in objects:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _delete_batch(s3_client, bucket_name: str, batch: list[dict]) -> dict:
+    """Delete one batch.  Returns the objects and bytes deleted and the errors"""
+
+    objects = []
+    for o in batch:
+        if "VersionId" in o:
+            objects.append({"Key": o["Key"], "VersionId": o["VersionId"]})
+        else:
+            objects.append({"Key": o["Key"]})
+    response = s3_client.delete_objects(
+        Bucket=bucket_name, Delete={"Objects": objects, "Quiet": True}
+    )
+
+    # With Quiet, only the errors are returned
+    errors = response.get("Errors", [])
+    failed = {(e["Key"], e.get("VersionId")) for e in errors}
+    deleted = [o for o in batch if (o["Key"], o.get("VersionId")) not in failed]
+
+    return {
+        "Objects": len(deleted),
+        "Bytes": sum(o["Size"] for o in deleted),
+        "Errors": [f"{e['Key']}: {e.get('Message', e.get('Code'))}" for e in errors],
+    }
+
+
+def purge_prefixes(
+    s3_client,
+    bucket_name: str,
+    prefixes: list[str],
+    versions: bool | None = None,
+    max_workers: int = 8,
+) -> dict[str, dict]:
+    """Delete every object (and version) under the prefixes.
+
+    Args:
+        s3_client: The S3 client
+        bucket_name (str): The bucket
+        prefixes (list[str]): The prefixes to purge.  End them with "/".
+        versions (bool, optional): Delete all the object versions.  Default: True
+            if the bucket is versioned
+        max_workers (int): The number of concurrent delete_objects calls
+
+    Returns:
+        dict: prefix -> {"Objects", "Bytes", "Errors"}
+    """
+    if versions is None:
+        versions = is_versioned(s3_client, bucket_name)
+
+    results = {p: {"Objects": 0, "Bytes": 0, "Errors": []} for p in prefixes}
+    lock = threading.Lock()
+
+    # Don't let the listing run ahead of the deletes by more than this many batches
+    pending = threading.BoundedSemaphore(max_workers * 2)
+
+    def delete(prefix: str, batch: list[dict]):
+        try:
+            result = _delete_batch(s3_client, bucket_name, batch)
+        except Exception as e:
+            result = {"Objects": 0, "Bytes": 0, "Errors": [str(e)]}
+        finally:
+            pending.release()
+        with lock:
+            totals = results[prefix]
+            totals["Objects"] += result["Objects"]
+            totals["Bytes"] += result["Bytes"]
+            totals["Errors"].extend(result["Errors"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as deleter:
+
+        def list_prefix(prefix: str):
+            objects = iter_objects(s3_client, bucket_name, prefix, versions)
+            for batch in iter_batches(objects):
+                pending.acquire()
+                deleter.submit(delete, prefix, batch)
+
+        list_workers = max(min(len(prefixes), max_workers), 1)
+        with ThreadPoolExecutor(max_workers=list_workers) as lister:
+            futures = {p: lister.submit(list_prefix, p) for p in prefixes}
+
+        for prefix, future in futures.items():
+            try:
+                future.result()
+            except ClientError as e:
+                results[prefix]["Errors"].append(str(e))
+
+    return results
+
+
+def estimate_prefix(
+    s3_client, bucket_name: str, prefix: str, versions: bool = False
+) -> dict:
+    """Count the objects and bytes under the prefix.
+
+    The listing is streamed, so the keys are never held in memory.
+
+    Returns:
+        dict: {"Objects", "Bytes", "Oldest", "Newest"}.  The timestamps are None
+        if the prefix is empty.
+    """
+    estimate = {"Objects": 0, "Bytes": 0, "Oldest": None, "Newest": None}
+    for item in iter_objects(s3_client, bucket_name, prefix, versions):
+        estimate["Objects"] += 1
+        estimate["Bytes"] += item["Size"]
+        modified = item["LastModified"]
+        if modified is None:
+            continue
+        if estimate["Oldest"] is None or modified < estimate["Oldest"]:
+            estimate["Oldest"] = modified
+        if estimate["Newest"] is None or modified > estimate["Newest"]:
+            estimate["Newest"] = modified
+    return estimate
+
+
+def estimate_prefixes(
+    s3_client,
+    bucket_name: str,
+    prefixes: list[str],
+    versions: bool | None = None,
+    max_workers: int = 8,
+) -> dict[str, dict]:
+    """Estimate all the prefixes concurrently.  See estimate_prefix()"""
+
+    if versions is None:
+        versions = is_versioned(s3_client, bucket_name)
+
+    workers = max(min(len(prefixes), max_workers), 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            p: executor.submit(estimate_prefix, s3_client, bucket_name, p, versions)
+            for p in prefixes
+        }
+    return {p: future.result() for p, future in futures.items()}
+
+
+def print_estimate(estimates: dict[str, dict]):
+    """Print the objects, bytes and age of the objects under each prefix"""
+
+    def when(value) -> str:
+        return value.strftime("%Y-%m-%d %H:%M") if value else ""
+
+    table = Table(title="Estimate", box=box.SIMPLE)
+    table.add_column("Prefix", style="cyan")
+    table.add_column("Objects", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("Oldest")
+    table.add_column("Newest")
+
+    for prefix, estimate in estimates.items():
+        table.add_row(
+            prefix,
+            str(estimate["Objects"]),
+            format_bytes(estimate["Bytes"]),
+            when(estimate["Oldest"]),
+            when(estimate["Newest"]),
+        )
+
+    total_objects = sum(e["Objects"] for e in estimates.values())
+    total_bytes = sum(e["Bytes"] for e in estimates.values())
+    table.add_row(
+        "[bold]Total[/bold]", str(total_objects), format_bytes(total_bytes), "", ""
+    )
+
+    cprint(table)
+
+
+def print_purge_results(results: dict[str, dict]):
+    """Print the objects and bytes deleted for each prefix"""
+
+    table = Table(title="Deleted", box=box.SIMPLE)
+    table.add_column("Prefix", style="cyan")
+    table.add_column("Objects", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("Errors", justify="right")
+
+    for prefix, result in results.items():
+        table.add_row(
+            prefix,
+            str(result["Objects"]),
+            format_bytes(result["Bytes"]),
+            str(len(result["Errors"])),
+        )
+
+    total_objects = sum(r["Objects"] for r in results.values())
+    total_bytes = sum(r["Bytes"] for r in results.values())
+    table.add_row(
+        "[bold]Total[/bold]", str(total_objects), format_bytes(total_bytes), ""
+    )
+
+    cprint(table)
+
+    for prefix, result in results.items():
+        for error in result["Errors"][:10]:
+            cprint(f"  {prefix}: {error}", style="red")
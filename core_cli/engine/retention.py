@@ -0,0 +1,329 @@
+"""Delete old builds of every branch of every app in the automation bucket.
+
+Builds are stored as <root>/<portfolio>/<app>/<branch>/<build>/... under the
+packages, artefacts and files/build roots.  The bucket is scanned once, with one
+concurrent listing per root and portfolio, and the objects are totalled per
+build.  A build is deleted when it is older than the maximum age or is not one
+of the latest builds of its branch.  The latest build of a branch is always kept
+unless --delete-latest is given: it may be the released build.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+from rich import box
+from rich.table import Table
+
+from .. import clients
+from ..cmdparser import ExecuteCommandsType
+from ..console import cprint, get_input
+
+from .clean import make_defaults
+from .purge import format_bytes, is_versioned, iter_objects, purge_prefixes
+
+ROOTS = ["packages", "artefacts", "files/build"]
+
+# (portfolio, app, branch, build)
+BuildKey = tuple[str, str, str, str]
+
+
+def list_portfolios(s3_client, bucket_name: str, root: str) -> list[str]:
+    """Return the portfolio names under a root"""
+
+    portfolios = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    pages = paginator.paginate(Bucket=bucket_name, Prefix=f"{root}/", Delimiter="/")
+    for page in pages:
+        for common_prefix in page.get("CommonPrefixes", []):
+            portfolios.append(common_prefix["Prefix"][len(root) + 1 :].rstrip("/"))
+    return portfolios
+
+
+def _scan_portfolio(
+    s3_client, bucket_name: str, root: str, portfolio: str, versions: bool
+) -> dict[BuildKey, dict]:
+    """Total the objects of each build under <root>/<portfolio>/"""
+
+    prefix = f"{root}/{portfolio}/"
+    builds: dict[BuildKey, dict] = {}
+    for item in iter_objects(s3_client, bucket_name, prefix, versions):
+        parts = item["Key"][len(prefix) :].split("/")
+        # app/branch/build/<file>.  Anything not inside a build is left alone.
+        if len(parts) < 4:
+            continue
+        key = (portfolio, parts[0], parts[1], parts[2])
+        build = builds.setdefault(
+            key, {"Objects": 0, "Bytes": 0, "Newest": None, "Roots": set()}
+        )
+        build["Objects"] += 1
+        build["Bytes"] += item["Size"]
+        build["Roots"].add(root)
+        modified = item["LastModified"]
+        if modified and (build["Newest"] is None or modified > build["Newest"]):
+            build["Newest"] = modified
+    return builds
+
+
+def scan_builds(
+    s3_client, bucket_name: str, versions: bool, max_workers: int = 8
+) -> dict[BuildKey, dict]:
+    """Scan the bucket once and total the objects, bytes and newest timestamp
+    of every build across all the roots"""
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        portfolio_futures = {
+            root: executor.submit(list_portfolios, s3_client, bucket_name, root)
+            for root in ROOTS
+        }
+        scan_futures = [
+            executor.submit(
+                _scan_portfolio, s3_client, bucket_name, root, portfolio, versions
+            )
+            for root, future in portfolio_futures.items()
+            for portfolio in future.result()
+        ]
+
+        builds: dict[BuildKey, dict] = {}
+        for future in scan_futures:
+            for key, build in future.result().items():
+                total = builds.setdefault(
+                    key, {"Objects": 0, "Bytes": 0, "Newest": None, "Roots": set()}
+                )
+                total["Objects"] += build["Objects"]
+                total["Bytes"] += build["Bytes"]
+                total["Roots"] |= build["Roots"]
+                if build["Newest"] and (
+                    total["Newest"] is None or build["Newest"] > total["Newest"]
+                ):
+                    total["Newest"] = build["Newest"]
+
+    return builds
+
+
+def get_deletable_builds(
+    builds: dict[BuildKey, dict],
+    keep: int | None = None,
+    max_age_days: int | None = None,
+    now: datetime | None = None,
+    delete_latest: bool = False,
+) -> list[BuildKey]:
+    """Apply the retention policy.
+
+    A build is deleted when it is older than max_age_days or when it is not one of
+    the latest keep builds of its branch.  The latest build of each branch is kept
+    however old it is, unless delete_latest is True.
+
+    Returns:
+        list[BuildKey]: The builds to delete
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=max_age_days) if max_age_days else None
+
+    branches: dict[tuple[str, str, str], list[BuildKey]] = {}
+    for key in builds:
+        branches.setdefault(key[:3], []).append(key)
+
+    epoch = datetime.min.replace(tzinfo=timezone.utc)
+
+    deletable = []
+    for branch_builds in branches.values():
+        branch_builds.sort(key=lambda k: builds[k]["Newest"] or epoch, reverse=True)
+        for rank, key in enumerate(branch_builds):
+            if rank == 0 and not delete_latest:
+                continue
+            newest = builds[key]["Newest"] or epoch
+            if (keep is not None and rank >= keep) or (cutoff and newest < cutoff):
+                deletable.append(key)
+
+    return sorted(deletable)
+
+
+def get_build_prefixes(
+    builds: dict[BuildKey, dict], keys: list[BuildKey]
+) -> list[str]:
+    """The S3 prefixes of the builds in each root they were found in"""
+    return [
+        f"{root}/{'/'.join(key)}/"
+        for key in keys
+        for root in ROOTS
+        if root in builds[key]["Roots"]
+    ]
+
+
+def print_retention_plan(builds: dict[BuildKey, dict], deletable: list[BuildKey]):
+    """Show how many builds of each branch are kept and deleted"""
+
+    delete = set(deletable)
+
+    branches: dict[tuple[str, str, str], dict] = {}
+    for key, build in builds.items():
+        branch = branches.setdefault(
+            key[:3], {"Builds": 0, "Delete": 0, "Objects": 0, "Bytes": 0}
+        )
+        branch["Builds"] += 1
+        if key in delete:
+            branch["Delete"] += 1
+            branch["Objects"] += build["Objects"]
+            branch["Bytes"] += build["Bytes"]
+
+    table = Table(title="Retention Plan", box=box.SIMPLE)
+    table.add_column("Portfolio", style="cyan")
+    table.add_column("App", style="cyan")
+    table.add_column("Branch", style="cyan")
+    table.add_column("Builds", justify="right")
+    table.add_column("Keep", justify="right", style="green")
+    table.add_column("Delete", justify="right", style="red")
+    table.add_column("Objects", justify="right")
+    table.add_column("Size", justify="right")
+
+    for (portfolio, app, branch), totals in sorted(branches.items()):
+        if not totals["Delete"]:
+            continue
+        table.add_row(
+            portfolio,
+            app,
+            branch,
+            str(totals["Builds"]),
+            str(totals["Builds"] - totals["Delete"]),
+            str(totals["Delete"]),
+            str(totals["Objects"]),
+            format_bytes(totals["Bytes"]),
+        )
+
+    cprint(table)
+
+    total_bytes = sum(builds[key]["Bytes"] for key in deletable)
+    cprint(
+        f"{len(deletable)} of {len(builds)} build(s) in {len(branches)} branch(es) "
+        f"to delete, {format_bytes(total_bytes)}.\n"
+    )
+
+
+def add_retention_parser(subparsers) -> ExecuteCommandsType:
+    """add the retention parser"""
+
+    description = "Delete old builds of all the branches in the automation bucket"
+
+    subparser = subparsers.add_parser(
+        "retention",
+        description=description,
+        help=description,
+    )
+    subparser.set_group_title(0, "Retention tasks")
+    subparser.set_group_title(1, "Available options")
+
+    bucket_region = os.environ.get(
+        "BUCKET_REGION", os.environ.get("AWS_REGION", "ap-southeast-1")
+    )
+    bucket_name = os.environ.get("BUCKET_NAME", None)
+
+    subparser.add_argument(
+        "--keep",
+        dest="keep",
+        type=int,
+        metavar="<n>",
+        help="Keep the latest <n> builds of each branch",
+    )
+    subparser.add_argument(
+        "--max-age",
+        dest="max_age",
+        type=int,
+        metavar="<days>",
+        help="Delete the builds older than <days> days",
+    )
+    subparser.add_argument(
+        "--delete-latest",
+        dest="delete_latest",
+        action="store_true",
+        help="Let --max-age delete the latest build of a branch.  It may be released.",
+    )
+    subparser.add_argument(
+        "--bucket-region",
+        default=bucket_region,
+        help="S3 Bucket Region",
+        required=False,
+    )
+    subparser.add_argument(
+        "--bucket-name", default=bucket_name, help="S3 Bucket Name", required=False
+    )
+    subparser.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=8,
+        metavar="<n>",
+        help="Number of concurrent S3 requests. Default: 8",
+    )
+    subparser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        help="Show the builds that would be deleted and stop",
+    )
+
+    return {"retention": (description, execute_retention)}
+
+
+def execute_retention(**kwargs):
+    """execute the command"""
+    kwargs = make_defaults(**kwargs)
+
+    keep = kwargs.get("keep")
+    max_age = kwargs.get("max_age")
+    bucket_name = kwargs.get("bucket_name")
+    bucket_region = kwargs.get("bucket_region")
+    max_workers = kwargs.get("max_workers") or 8
+
+    if keep is None and max_age is None:
+        raise ValueError("Specify --keep and/or --max-age.")
+    if keep is not None and keep < 1:
+        raise ValueError("--keep must be at least 1.")
+
+    master_account = kwargs.get("master_account")
+    automation_role = kwargs.get("automation_role")
+    role = f"arn:aws:iam::{master_account}:role/{automation_role}"
+
+    cprint(f"Scanning s3://{bucket_name} for builds...\n")
+
+    try:
+        s3 = clients.get_client("s3", bucket_region, role, kwargs.get("aws_profile"))
+        versions = is_versioned(s3, bucket_name)
+        builds = scan_builds(s3, bucket_name, versions, max_workers)
+    except ClientError as e:
+        raise OSError(f"{e}") from e
+
+    deletable = get_deletable_builds(
+        builds, keep, max_age, delete_latest=kwargs.get("delete_latest", False)
+    )
+
+    print_retention_plan(builds, deletable)
+
+    if not deletable or kwargs.get("dry_run"):
+        cprint("Nothing was deleted.")
+        return
+
+    result = get_input(f"Delete {len(deletable)} build(s)?", ["y", "n"], "n")
+    if result.lower() != "y":
+        cprint("Aborted.")
+        return
+
+    prefixes = get_build_prefixes(builds, deletable)
+
+    try:
+        results = purge_prefixes(s3, bucket_name, prefixes, versions, max_workers)
+    except ClientError as e:
+        raise OSError(f"{e}") from e
+
+    objects = sum(r["Objects"] for r in results.values())
+    size = sum(r["Bytes"] for r in results.values())
+    errors = [e for r in results.values() for e in r["Errors"]]
+
+    cprint(f"\nDeleted {objects} object(s), {format_bytes(size)} freed.")
+    for error in errors[:10]:
+        cprint(f"  {error}", style="red")
+    if errors:
+        cprint(f"{len(errors)} object(s) could not be deleted.", style="bold red")
+
+    cprint("Done.")
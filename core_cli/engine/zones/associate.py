@@ -2,25 +2,17 @@
 
 from typing import Any, Dict
 import botocore
-import boto3
+
+from ... import clients
 
 _r53_client: Dict[str, Any] = {}
 
 
 def _assume_role(profile, account, role_name, region):
-    """assume the role"""
+    """return a route53 client in the account using the role"""
     try:
-        client = boto3.client("sts", profile=profile, region_name=region)
-        response = client.assume_role(
-            RoleArn=f"arn:aws:iam::{account}:role/{role_name}"
-        )
-        if response:
-            return boto3.session.Session(
-                aws_access_key_id=response["Credentials"]["AccessKeyId"],
-                aws_secret_access_key=response["Credentials"]["SecretAccessKey"],
-                aws_session_token=response["Credentials"]["SessionToken"],
-                region_name=region,
-            )
+        role = f"arn:aws:iam::{account}:role/{role_name}"
+        return clients.get_client("route53", region, role, profile)
     except botocore.exceptions.ClientError as e:
         print(f"Failed to assume role: {e}")
         print(
@@ -34,8 +26,9 @@ def _get_r53_client(profile_name, account, role_name, region):
     """get the r53 client singletone"""
     try:
         if _r53_client.get(account) is None:
-            session = _assume_role(profile_name, account, role_name, region)
-            _r53_client[account] = session.client("route53")
+            _r53_client[account] = _assume_role(
+                profile_name, account, role_name, region
+            )
         return _r53_client[account]
     except botocore.exceptions.ClientError as e:
         raise OSError("Failed to get R53 client") from e
@@ -50,6 +50,7 @@ from core_db.config import get_table_name
 from core_cli import __version__
 
 from .console import cprint, get_organization_info
+from .stack_outputs import list_stack_outputs
 from .cmdparser import ExecuteCommandsType
 from .environment import print_environmnt
 
@@ -142,6 +143,32 @@ def show_configuration(data):
     print_environmnt()
 
 
+def show_stack_outputs():
+    """Show the outputs of the stacks deployed by the CLI.  These come from the
+    local cache so no AWS calls are made."""
+
+    stacks = list_stack_outputs()
+    if not stacks:
+        return
+
+    table = Table(title="Deployed Stacks", box=box.SIMPLE)
+    table.add_column("Stack", style="cyan")
+    table.add_column("Region", style="cyan")
+    table.add_column("Status", style="dark_orange")
+    table.add_column("Output", style="dark_goldenrod")
+    table.add_column("Value", style="dark_orange")
+
+    for stack in stacks:
+        columns = [stack["StackName"], stack["Region"], stack["StackStatus"]]
+        outputs = sorted(stack["Outputs"].items()) or [("", "")]
+        for key, value in outputs:
+            table.add_row(*columns, key, value)
+            # Only show the stack on its first row
+            columns = ["", "", ""]
+
+    cprint(table)
+
+
 def execute_info(**kwargs):
 
     cprint(f"Core Automation Information v{__version__}\n")
@@ -150,6 +177,8 @@ def execute_info(**kwargs):
 
     show_configuration(kwargs)
 
+    show_stack_outputs()
+
 
 def get_info_command(subparsers) -> ExecuteCommandsType:
 
@@ -7,14 +7,16 @@ from ..console import (
     get_organization_info,
     get_account_info,
     check_admin_privileges,
+    ORGANIZATION_ACTIONS,
     cprint,
 )
 
 
-def exexecution_check(kwargs):
+def exexecution_check(kwargs, actions: list[str] = ORGANIZATION_ACTIONS):
     """Print introduction to function and check for admin privileges
 
-    Kwargs is mutated and the org_info and account_info are added to it.
+    Kwargs is mutated and the org_info and account_info are added to it.  The
+    principal must be allowed the actions the command calls.
     """
 
     cprint(f"Core Automation Organizations v{__version__}\n")
@@ -60,7 +62,7 @@ def exexecution_check(kwargs):
         cprint("Aborted")
         raise Exception("Not in master account")
 
-    is_admin = check_admin_privileges(user_name)
+    is_admin = check_admin_privileges(user_name, actions)
 
     if not is_admin:
         cprint("\nYou do not have administrator privileges in this account.")
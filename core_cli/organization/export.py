@@ -0,0 +1,212 @@
+"""Export every account in the organization with its OU path, tags and SCPs"""
+
+import csv
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterator
+
+from .. import clients
+from ..cmdparser import ExecuteCommandsType
+from ..console import ORGANIZATION_EXPORT_ACTIONS, cprint
+
+from .common import exexecution_check
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+
+COLUMNS = [
+    "AccountId",
+    "Name",
+    "Email",
+    "Status",
+    "JoinedMethod",
+    "JoinedTimestamp",
+    "ParentId",
+    "OuPath",
+    "Tags",
+    "PolicyIds",
+]
+
+
+def _list_children(org_client, parent_id: str, path: str) -> tuple[list, list]:
+    """List the child OUs (with their path) and the accounts of a parent"""
+
+    ous = []
+    paginator = org_client.get_paginator("list_organizational_units_for_parent")
+    for page in paginator.paginate(ParentId=parent_id):
+        for ou in page["OrganizationalUnits"]:
+            ous.append((ou["Id"], f"{path}/{ou['Name']}"))
+
+    accounts = []
+    paginator = org_client.get_paginator("list_accounts_for_parent")
+    for page in paginator.paginate(ParentId=parent_id):
+        for account in page["Accounts"]:
+            accounts.append((account, parent_id, path))
+
+    return ous, accounts
+
+
+def _describe_account(org_client, account: dict, parent_id: str, path: str) -> dict:
+    """Build the export row for an account"""
+
+    account_id = account["Id"]
+
+    tags = {}
+    paginator = org_client.get_paginator("list_tags_for_resource")
+    for page in paginator.paginate(ResourceId=account_id):
+        for tag in page["Tags"]:
+            tags[tag["Key"]] = tag["Value"]
+
+    policy_ids = []
+    paginator = org_client.get_paginator("list_policies_for_target")
+    for page in paginator.paginate(
+        TargetId=account_id, Filter="SERVICE_CONTROL_POLICY"
+    ):
+        policy_ids.extend(policy["Id"] for policy in page["Policies"])
+
+    joined = account.get("JoinedTimestamp")
+
+    return {
+        "AccountId": account_id,
+        "Name": account.get("Name", ""),
+        "Email": account.get("Email", ""),
+        "Status": account.get("Status", ""),
+        "JoinedMethod": account.get("JoinedMethod", ""),
+        "JoinedTimestamp": joined.isoformat() if joined else "",
+        "ParentId": parent_id,
+        "OuPath": path,
+        "Tags": tags,
+        "PolicyIds": policy_ids,
+    }
+
+
+def crawl_accounts(max_workers: int = 8) -> Iterator[dict]:
+    """Crawl the organization concurrently and yield one row per account.
+
+    Rows are yielded as soon as they are complete.  Account lookups take priority
+    over expanding more OUs, so only a bounded number of accounts waits in memory
+    no matter how big the organization is.
+    """
+    org_client = clients.org_client()
+
+    root_id = org_client.list_roots()["Roots"][0]["Id"]
+
+    limit = max_workers * 4
+    ous = deque([(root_id, "Root")])
+    accounts = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        while ous or accounts or pending:
+
+            while accounts and len(pending) < limit:
+                args = accounts.popleft()
+                future = executor.submit(_describe_account, org_client, *args)
+                pending[future] = "account"
+
+            while ous and len(pending) < limit and len(accounts) < limit:
+                parent_id, path = ous.popleft()
+                future = executor.submit(_list_children, org_client, parent_id, path)
+                pending[future] = "ou"
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind = pending.pop(future)
+                if kind == "ou":
+                    child_ous, child_accounts = future.result()
+                    ous.extend(child_ous)
+                    accounts.extend(child_accounts)
+                else:
+                    yield future.result()
+
+
+def write_csv(filename: str, rows: Iterator[dict]) -> int:
+    """Write the rows to a CSV file.
+
+    Tags are written as a JSON object and policy ids are separated with ";".
+    """
+    count = 0
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            row["Tags"] = json.dumps(row["Tags"], sort_keys=True)
+            row["PolicyIds"] = ";".join(row["PolicyIds"])
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(filename: str, rows: Iterator[dict]) -> int:
+    """Write the rows as one JSON document per line"""
+    count = 0
+    with open(filename, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def get_export_tasks(subparsers) -> ExecuteCommandsType:
+    """Add the export parser"""
+
+    description = "Export all organization accounts with OU path, tags and SCPs"
+    export_parser = subparsers.add_parser(
+        "export",
+        description=description,
+        usage="core organization export --out <file> [<options>]",
+        help=description,
+    )
+    export_parser.set_group_title(0, "Export actions")
+    export_parser.set_group_title(1, "Available options")
+
+    export_parser.add_argument(
+        "-o",
+        "--out",
+        dest="out",
+        metavar="<file>",
+        required=True,
+        help="Output file",
+    )
+    export_parser.add_argument(
+        "--format",
+        dest="format",
+        choices=[FORMAT_CSV, FORMAT_JSONL],
+        default=None,
+        help="Output format.  Default: from the file extension, else csv",
+    )
+    export_parser.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=8,
+        metavar="<n>",
+        help="Number of concurrent requests. Default: 8",
+    )
+
+    return {"export": (description, execute_export)}
+
+
+def execute_export(**kwargs):
+    """Export the organization accounts"""
+
+    exexecution_check(kwargs, ORGANIZATION_EXPORT_ACTIONS)
+
+    filename = kwargs.get("out")
+    fmt = kwargs.get("format")
+    if not fmt:
+        fmt = FORMAT_JSONL if filename.endswith((".jsonl", ".json")) else FORMAT_CSV
+
+    cprint(f"Exporting organization accounts to {filename} ({fmt})...\n")
+
+    rows = crawl_accounts(kwargs.get("max_workers") or 8)
+
+    if fmt == FORMAT_JSONL:
+        count = write_jsonl(filename, rows)
+    else:
+        count = write_csv(filename, rows)
+
+    cprint(f"{count} account(s) exported.")
+    cprint("Done")
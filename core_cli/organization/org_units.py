@@ -1,13 +1,15 @@
 import core_framework as util
 
-import core_helper.aws as aws
 
 from core_cli import __version__
+
+from .. import clients
 from ..console import (
     get_iam_user_name,
     get_organization_info,
     get_account_info,
     check_admin_privileges,
+    ORGANIZATION_TREE_ACTIONS,
 )
 
 from ..cmdparser import ExecuteCommandsType
@@ -15,7 +17,7 @@ from ..cmdparser import ExecuteCommandsType
 
 def get_root_id():
     """Get the root ID of the organization."""
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     response = org_client.list_roots()
     roots = response["Roots"]
     root_id = roots[0]["Id"]
@@ -24,7 +26,7 @@ def get_root_id():
 
 def get_ou_info(ou_id):
     """Get the organizational unit information."""
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     response = org_client.describe_organizational_unit(OrganizationalUnitId=ou_id)
     return response["OrganizationalUnit"]
 
@@ -32,7 +34,7 @@ def get_ou_info(ou_id):
 def list_organizational_units(parent_id):
     """List all organizational units for a given parent ID."""
 
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     paginator = org_client.get_paginator("list_organizational_units_for_parent")
     response_iterator = paginator.paginate(ParentId=parent_id)
 
@@ -46,7 +48,7 @@ def list_organizational_units(parent_id):
 def get_child_accounts(parent_id):
     """Get the child accounts array"""
 
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     paginator = org_client.get_paginator("list_accounts_for_parent")
     response_iterator = paginator.paginate(ParentId=parent_id)
 
@@ -172,7 +174,7 @@ def execute_list(**kwargs):
         print("Aborted")
         return
 
-    is_admin = check_admin_privileges(user_name)
+    is_admin = check_admin_privileges(user_name, ORGANIZATION_TREE_ACTIONS)
 
     if not is_admin:
         print("\nYou do not have administrator privileges in this account.")
@@ -7,6 +7,7 @@ from .scp import get_scp_tasks
 from .org_units import get_org_unit_tasks
 from .show import get_show_tasks
 from .control_tower import get_control_tower_tasks
+from .export import get_export_tasks
 
 TASKS: ExecuteCommandsType = {}
 
@@ -42,5 +43,6 @@ def get_organization_command(subparsers) -> ExecuteCommandsType:
     TASKS.update(get_scp_tasks(subparsers))
     TASKS.update(get_org_unit_tasks(subparsers))
     TASKS.update(get_control_tower_tasks(subparsers))
+    TASKS.update(get_export_tasks(subparsers))
 
     return {"org": (DESCRPTION, execute_organization)}
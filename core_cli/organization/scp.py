@@ -3,46 +3,66 @@ import json
 from rich import box
 from rich.table import Table
 
-import core_helper.aws as aws
-
-from ..console import get_account_info, get_input, cprint, jprint
+from .. import clients
+from ..console import (
+    SCP_ATTACH_ACTIONS,
+    SCP_DETACH_ACTIONS,
+    SCP_READ_ACTIONS,
+    get_account_info,
+    get_input,
+    cprint,
+    jprint,
+)
 
 from ..cmdparser.cmdparser import ExecuteCommandsType
 
 from .common import exexecution_check
+from .scp_bulk import (
+    ACTION_ATTACH,
+    ACTION_DETACH,
+    SELECT_ACCOUNTS,
+    SELECT_OUS,
+    SELECT_ALL,
+    read_targets_file,
+    get_ou_subtree_targets,
+    compute_plan,
+    print_plan,
+    execute_plan,
+    print_results,
+)
 
 
 def detach_policy_from_account(policy_id: str, account_id: str):
     """Detach the policy from the account"""
     cprint(f"\nDetaching policy {policy_id} from account: {account_id}")
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     org_client.detach_policy(PolicyId=policy_id, TargetId=account_id)
 
 
 def detach_policy_from_ou(policy_id: str, ou_id: str):
     """Detach the policy from the OU"""
     cprint(f"\nDetaching policy {policy_id} from OU: {ou_id}")
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     org_client.detach_policy(PolicyId=policy_id, TargetId=ou_id)
 
 
 def attach_policy_to_account(policy_id: str, account_id: str):
     """Attach the policy to the account"""
     cprint(f"\nAttaching policy {policy_id} to account: {account_id}")
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     org_client.attach_policy(PolicyId=policy_id, TargetId=account_id)
 
 
 def attach_policy_to_ou(policy_id: str, ou_id: str):
     """Attach the policy to the OU"""
     cprint(f"\nAttaching policy {policy_id} to OU: {ou_id}")
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     org_client.attach_policy(PolicyId=policy_id, TargetId=ou_id)
 
 
 def get_ou_info(ou_id):
     """Get the organizational unit information."""
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     response = org_client.describe_organizational_unit(OrganizationalUnitId=ou_id)
     return response["OrganizationalUnit"]
 
@@ -50,7 +70,7 @@ def get_ou_info(ou_id):
 def print_policy_information(policy_id: str, file_prefix: str | None = None):
     """Retrieve and print the policy information by policy_id."""
 
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     response = org_client.describe_policy(PolicyId=policy_id)
 
     policy = response["Policy"]
@@ -87,7 +107,7 @@ def print_policy_information(policy_id: str, file_prefix: str | None = None):
 
 def list_all_scp_policies(file_prefix: str | None = None):
     """Get the service control policies attached to the organization and print them in JSON format."""
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     paginator = org_client.get_paginator("list_policies")
     response_iterator = paginator.paginate(Filter="SERVICE_CONTROL_POLICY")
 
@@ -109,6 +129,128 @@ def add_common_parameters(parser):
     )
 
 
+def add_bulk_parameters(parser):
+    """Add the bulk target selection parameters to the parser"""
+
+    parser.add_argument(
+        "--targets-file",
+        dest="targets_file",
+        metavar="<file>",
+        required=False,
+        help="File with one Account ID or OU ID per line",
+    )
+    parser.add_argument(
+        "--ou-subtree",
+        dest="ou_subtree",
+        metavar="<ou-id>",
+        required=False,
+        help="Select all the targets below this OU (or root) ID",
+    )
+    parser.add_argument(
+        "--select",
+        dest="select",
+        choices=[SELECT_ACCOUNTS, SELECT_OUS, SELECT_ALL],
+        default=SELECT_ACCOUNTS,
+        required=False,
+        help="Target types selected with --ou-subtree. Default: accounts",
+    )
+    parser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        help="Show the plan and do not change anything",
+    )
+    parser.add_argument(
+        "--max-workers",
+        dest="max_workers",
+        type=int,
+        default=4,
+        metavar="<n>",
+        help="Number of concurrent requests. Default: 4",
+    )
+    parser.add_argument(
+        "--rate",
+        dest="rate",
+        type=float,
+        default=5.0,
+        metavar="<calls/sec>",
+        help="Maximum API calls per second. Default: 5",
+    )
+
+
+def is_bulk_request(kwargs) -> bool:
+    """Return True if the bulk target options have been supplied"""
+    return bool(kwargs.get("targets_file") or kwargs.get("ou_subtree"))
+
+
+def get_bulk_targets(kwargs) -> list[str]:
+    """Collect the targets from the --target-id, --targets-file and --ou-subtree options"""
+
+    targets = []
+
+    target_id = kwargs.get("target_id")
+    if target_id:
+        targets.append(target_id)
+
+    targets_file = kwargs.get("targets_file")
+    if targets_file:
+        targets.extend(read_targets_file(targets_file))
+
+    ou_subtree = kwargs.get("ou_subtree")
+    if ou_subtree:
+        select = kwargs.get("select", SELECT_ACCOUNTS)
+        targets.extend(get_ou_subtree_targets(ou_subtree, select))
+
+    # remove duplicates but keep the order
+    return list(dict.fromkeys(targets))
+
+
+def execute_bulk(action: str, **kwargs):
+    """Plan and execute an attach or detach against many targets with a single confirmation"""
+
+    policy_id = kwargs.get("policy_id")
+
+    targets = get_bulk_targets(kwargs)
+    if not targets:
+        cprint("No targets were selected.\n", style="bold red")
+        return
+
+    cprint(f"Computing the {action} plan for {len(targets)} target(s)...\n")
+
+    plan = compute_plan(action, policy_id, targets)
+
+    print_plan(action, policy_id, plan)
+
+    if kwargs.get("dry_run"):
+        cprint("Dry run.  No changes made.")
+        return
+
+    if not plan["change"]:
+        cprint("Nothing to do.")
+        return
+
+    result = get_input(
+        f"Do you want to {action} this policy for {len(plan['change'])} target(s)?",
+        ["yes", "no"],
+    )
+    if result == "no":
+        cprint("\nAborted", style="bold red")
+        return
+
+    results = execute_plan(
+        action,
+        policy_id,
+        plan["change"],
+        max_workers=kwargs.get("max_workers") or 4,
+        rate=kwargs.get("rate") or 5.0,
+    )
+
+    print_results(action, results)
+
+    cprint("")
+    cprint("Done")
+
+
 def add_common_policy_parameters(parser, help):
 
     add_common_parameters(parser)
@@ -206,7 +348,7 @@ def get_scp_list_task(subparsers) -> ExecuteCommandsType:
 def execute_show(**kwargs):
     """Run the SCP show process"""
 
-    exexecution_check(kwargs)
+    exexecution_check(kwargs, SCP_READ_ACTIONS)
 
     policy_id = kwargs.get("policy_id")
 
@@ -221,7 +363,7 @@ def execute_show(**kwargs):
 def execute_list(**kwargs):
     """List the SCP policies"""
 
-    exexecution_check(kwargs)
+    exexecution_check(kwargs, SCP_READ_ACTIONS)
 
     cprint("Listing Service Control Policy (SCP):\n")
 
@@ -262,13 +404,19 @@ def get_scp_attach_task(subparsers) -> ExecuteCommandsType:
         help="Account ID or OU ID to attach the policy to",
     )
 
+    add_bulk_parameters(attach_parser)
+
     return {"attach": (description, execute_attach)}
 
 
 def execute_attach(**kwargs):
     """Run the SCP attach process"""
 
-    exexecution_check(kwargs)
+    exexecution_check(kwargs, SCP_ATTACH_ACTIONS)
+
+    if is_bulk_request(kwargs):
+        execute_bulk(ACTION_ATTACH, **kwargs)
+        return
 
     target_id = kwargs.get("target_id")
 
@@ -358,13 +506,19 @@ def get_scp_detach_task(subparsers) -> ExecuteCommandsType:
         help="Account ID or OU ID to detach the policy from",
     )
 
+    add_bulk_parameters(detach_parser)
+
     return {"detach": (description, execute_detach)}
 
 
 def execute_detach(**kwargs):
     """detach a poicy from an account or OU"""
 
-    exexecution_check(kwargs)
+    exexecution_check(kwargs, SCP_DETACH_ACTIONS)
+
+    if is_bulk_request(kwargs):
+        execute_bulk(ACTION_DETACH, **kwargs)
+        return
 
     target_id = kwargs.get("target_id")
 
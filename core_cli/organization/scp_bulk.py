@@ -0,0 +1,265 @@
+"""Bulk attach and detach of SCP policies across many accounts and OUs"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+from rich import box
+from rich.table import Table
+
+from .. import clients
+from ..console import cprint
+
+ACTION_ATTACH = "attach"
+ACTION_DETACH = "detach"
+
+SELECT_ACCOUNTS = "accounts"
+SELECT_OUS = "ous"
+SELECT_ALL = "all"
+
+# Organizations throttles the policy APIs aggressively.  These are the error codes we retry.
+RETRYABLE_ERRORS = [
+    "TooManyRequestsException",
+    "ConcurrentModificationException",
+    "ThrottlingException",
+    "ServiceException",
+]
+
+
+# After a throttle, each successful call wins back this share of the starting rate
+RECOVERY_STEP = 0.05
+
+
+class RateLimiter:
+    """A simple thread-safe token bucket shared by all the workers.
+
+    The rate is halved when the service throttles us and creeps back up to the
+    starting rate as calls succeed.
+
+    Attributes:
+        rate (float): The number of calls per second allowed.
+        max_rate (float): The starting rate.  The rate never goes above it.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = self.max_rate = max(rate, 0.1)
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        """Block until the next call is allowed"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + 1.0 / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+    def slow_down(self):
+        """Halve the rate after the service throttled us"""
+        with self._lock:
+            self.rate = max(self.rate / 2.0, 0.1)
+
+    def speed_up(self):
+        """Win back some of the rate after a call succeeded"""
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate * RECOVERY_STEP, self.max_rate)
+
+
+def read_targets_file(filename: str) -> list[str]:
+    """Read target ids from a file.  One id per line.  Blank lines and # comments are ignored."""
+    targets = []
+    with open(filename, "r") as f:
+        for line in f:
+            target = line.split("#", 1)[0].strip()
+            if target and target not in targets:
+                targets.append(target)
+    return targets
+
+
+def get_ou_subtree_targets(parent_id: str, select: str = SELECT_ACCOUNTS) -> list[str]:
+    """Walk the OU tree below parent_id and return the selected target ids.
+
+    The parent itself is included when OUs are selected and it is an OU (not the root).
+    """
+    org_client = clients.org_client()
+
+    accounts_paginator = org_client.get_paginator("list_accounts_for_parent")
+    ous_paginator = org_client.get_paginator("list_organizational_units_for_parent")
+
+    targets = []
+    if select != SELECT_ACCOUNTS and parent_id.startswith("ou-"):
+        targets.append(parent_id)
+
+    stack = [parent_id]
+    while stack:
+        current = stack.pop()
+
+        if select != SELECT_OUS:
+            for page in accounts_paginator.paginate(ParentId=current):
+                targets.extend(account["Id"] for account in page["Accounts"])
+
+        for page in ous_paginator.paginate(ParentId=current):
+            for ou in page["OrganizationalUnits"]:
+                if select != SELECT_ACCOUNTS:
+                    targets.append(ou["Id"])
+                stack.append(ou["Id"])
+
+    return targets
+
+
+def get_policy_targets(policy_id: str) -> dict[str, dict]:
+    """Return all the current attachments of the policy keyed by target id"""
+    org_client = clients.org_client()
+    paginator = org_client.get_paginator("list_targets_for_policy")
+
+    targets = {}
+    for page in paginator.paginate(PolicyId=policy_id):
+        for target in page["Targets"]:
+            targets[target["TargetId"]] = target
+    return targets
+
+
+def compute_plan(
+    action: str, policy_id: str, targets: list[str]
+) -> dict[str, list[str]]:
+    """Compare the requested targets with the current attachments of the policy.
+
+    Returns:
+        dict: "change" contains the targets that will be modified and "skip" the
+        targets that are already in the desired state.
+    """
+    current = get_policy_targets(policy_id)
+
+    if action == ACTION_ATTACH:
+        change = [t for t in targets if t not in current]
+    else:
+        change = [t for t in targets if t in current]
+
+    skip = [t for t in targets if t not in change]
+
+    return {"change": change, "skip": skip, "current": list(current.keys())}
+
+
+def print_plan(action: str, policy_id: str, plan: dict[str, list[str]]):
+    """Show the plan to the user"""
+
+    verb = "Attach to" if action == ACTION_ATTACH else "Detach from"
+    skip_reason = "Already attached" if action == ACTION_ATTACH else "Not attached"
+
+    table = Table(title=f"Policy {policy_id} Plan", box=box.SQUARE)
+    table.add_column("Action", style="green")
+    table.add_column("TargetId")
+    table.add_column("Type")
+
+    for target_id in plan["change"]:
+        table.add_row(verb, target_id, _target_type(target_id))
+    for target_id in plan["skip"]:
+        table.add_row(
+            f"[dim]{skip_reason}[/dim]", target_id, _target_type(target_id)
+        )
+
+    cprint(table)
+    cprint(
+        f"\n{len(plan['change'])} target(s) to {action}, {len(plan['skip'])} unchanged.\n"
+    )
+
+
+def _target_type(target_id: str) -> str:
+    if target_id.startswith("ou-"):
+        return "ORGANIZATIONAL_UNIT"
+    if target_id.startswith("r-"):
+        return "ROOT"
+    return "ACCOUNT"
+
+
+def _apply(
+    org_client,
+    limiter: RateLimiter,
+    action: str,
+    policy_id: str,
+    target_id: str,
+    max_retries: int,
+) -> str:
+    """Attach or detach one target, retrying with backoff when throttled"""
+
+    if action == ACTION_ATTACH:
+        call = org_client.attach_policy
+    else:
+        call = org_client.detach_policy
+
+    attempt = 0
+    while True:
+        limiter.wait()
+        try:
+            call(PolicyId=policy_id, TargetId=target_id)
+            limiter.speed_up()
+            return "OK"
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code == "DuplicatePolicyAttachmentException":
+                return "Already attached"
+            if code == "PolicyNotAttachedException":
+                return "Not attached"
+            if code not in RETRYABLE_ERRORS or attempt >= max_retries:
+                raise
+            limiter.slow_down()
+            time.sleep(min(2**attempt, 30) + random.uniform(0, 1))
+            attempt += 1
+
+
+def execute_plan(
+    action: str,
+    policy_id: str,
+    targets: list[str],
+    max_workers: int = 4,
+    rate: float = 5.0,
+    max_retries: int = 8,
+) -> dict[str, str]:
+    """Execute the attach or detach for all the targets concurrently.
+
+    Returns:
+        dict: The result for each target id.  Errors are returned as "ERROR: <message>".
+    """
+    if not targets:
+        return {}
+
+    org_client = clients.org_client()
+    limiter = RateLimiter(rate)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                _apply, org_client, limiter, action, policy_id, target_id, max_retries
+            ): target_id
+            for target_id in targets
+        }
+        for future in as_completed(futures):
+            target_id = futures[future]
+            try:
+                results[target_id] = future.result()
+            except Exception as e:
+                results[target_id] = f"ERROR: {e}"
+            cprint(f"   {action} {policy_id} -> {target_id}: {results[target_id]}")
+
+    return results
+
+
+def print_results(action: str, results: dict[str, str]):
+    """Print a summary of the bulk execution"""
+
+    failed = {k: v for k, v in results.items() if v.startswith("ERROR")}
+
+    succeeded = len(results) - len(failed)
+    cprint(f"\n{succeeded} of {len(results)} target(s) {action}ed successfully.")
+
+    if failed:
+        table = Table(title="Failures", box=box.SQUARE)
+        table.add_column("TargetId", style="red")
+        table.add_column("Error")
+        for target_id, message in failed.items():
+            table.add_row(target_id, message)
+        cprint(table)
@@ -1,12 +1,11 @@
-import core_helper.aws as aws
-
-
+from .. import clients
+from ..console import ORGANIZATION_TREE_ACTIONS
 from .common import exexecution_check
 
 
 def get_root_id():
     """Get the root ID of the organization."""
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     response = org_client.list_roots()
     roots = response["Roots"]
     root_id = roots[0]["Id"]
@@ -15,7 +14,7 @@ def get_root_id():
 
 def get_ou_info(ou_id):
     """Get the organizational unit information."""
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     response = org_client.describe_organizational_unit(OrganizationalUnitId=ou_id)
     return response["OrganizationalUnit"]
 
@@ -23,7 +22,7 @@ def get_ou_info(ou_id):
 def list_organizational_units(parent_id):
     """List all organizational units for a given parent ID."""
 
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     paginator = org_client.get_paginator("list_organizational_units_for_parent")
     response_iterator = paginator.paginate(ParentId=parent_id)
 
@@ -37,7 +36,7 @@ def list_organizational_units(parent_id):
 def get_child_accounts(parent_id):
     """Get the child accounts array"""
 
-    org_client = aws.org_client()
+    org_client = clients.org_client()
     paginator = org_client.get_paginator("list_accounts_for_parent")
     response_iterator = paginator.paginate(ParentId=parent_id)
 
@@ -90,7 +89,7 @@ def get_show_tasks(subparsers):
 
 def execute_show(**kwargs):
 
-    exexecution_check(kwargs)
+    exexecution_check(kwargs, ORGANIZATION_TREE_ACTIONS)
 
     print("Organizational Units Tree:\n")
 
@@ -1,14 +1,14 @@
 """mange role policy"""
 
-import boto3
 import json
 
+from .. import clients
 from ..cmdparser import ExecuteCommandsType
 
 
 def ensure_user_can_assume_role(client_account, role_name, user_arn):  # noqa E501
     # Initialize the boto3 client for IAM
-    iam_client = boto3.client("iam")
+    iam_client = clients.iam_client()
 
     # Get the current trust policy of the role
     try:
@@ -0,0 +1,637 @@
+"""Build the deployment package.zip of a platform directory.
+
+The package contains the files of the platform directory selected by the include
+and exclude patterns (by default the "components" and "vars" folders, the same
+as the pipeline package.sh).  Compared to writing the files with zipfile:
+
+* Files are deflated in 1 MiB chunks on a thread pool (zlib releases the GIL).
+  Each chunk is an independent raw deflate stream ended with a sync flush, so the
+  chunks are simply concatenated, the same way pigz does it.
+* Files that are already compressed (archives, images, ...) are stored.
+* The archive is reproducible.  Entries are sorted and every entry has the same
+  timestamp and permissions, so the same files always give the same bytes.
+* Files are streamed.  Only a bounded number of chunks is held in memory.
+* Builds are incremental.  The SHA-256 of every file is kept in a hash manifest
+  next to the zip.  Nothing is written when no file changed, and the compressed
+  data of the files that didn't change is copied from the previous zip.
+
+Archives that need ZIP64 (over 4 GiB or 65,535 entries) are written with zipfile.
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# The optional manifest file in the platform directory.  One pattern per line.
+# Lines starting with "!" are excludes.  "#" starts a comment.
+MANIFEST_FILE = ".package-manifest"
+
+DEFAULT_INCLUDE = ["components", "vars"]
+DEFAULT_EXCLUDE = [".git", ".DS_Store", "__pycache__", "*.pyc", MANIFEST_FILE]
+
+# Deflating these gains nothing
+# fmt: off
+STORED_EXTENSIONS = {
+    ".zip", ".jar", ".war", ".whl", ".egg",
+    ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+    ".mp3", ".mp4", ".mov", ".pdf", ".woff", ".woff2",
+}
+# fmt: on
+
+CHUNK_SIZE = 1024 * 1024
+
+# Written next to the zip.  Bump the version when the archive layout changes.
+HASH_MANIFEST_SUFFIX = ".hashes.json"
+HASH_MANIFEST_VERSION = 1
+
+COMPRESSION_LEVEL = 6
+
+# 1980-01-01 00:00:00, the earliest DOS date.  Used for every entry.
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_DOS_DATE = (0 << 9) | (1 << 5) | 1
+_DOS_TIME = 0
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP32_MAX_ENTRIES = 0xFFFF
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+
+_DATA_DESCRIPTOR_FLAG = 0x8
+_UTF8_FLAG = 0x800
+
+
+class Zip64Required(Exception):
+    """The archive is too large for the ZIP32 writer"""
+
+
+def load_manifest(root_dir: str) -> tuple[list[str], list[str]]:
+    """Read the include and exclude patterns of the platform directory.
+
+    Returns the defaults if there is no manifest file or it has no includes.
+    """
+    includes: list[str] = []
+    excludes: list[str] = list(DEFAULT_EXCLUDE)
+
+    path = os.path.join(root_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                pattern = line.split("#", 1)[0].strip()
+                if not pattern:
+                    continue
+                if pattern.startswith("!"):
+                    excludes.append(pattern[1:].strip())
+                else:
+                    includes.append(pattern)
+
+    return includes or list(DEFAULT_INCLUDE), excludes
+
+
+def _matches(path: str, pattern: str) -> bool:
+    """Match a relative posix path against a pattern.
+
+    A pattern matches the path itself, any of the folders of the path, or the
+    file name.  "*" matches across "/".
+    """
+    pattern = pattern.strip("/")
+    if fnmatch.fnmatchcase(path, pattern):
+        return True
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        if fnmatch.fnmatchcase("/".join(parts[:i]), pattern):
+            return True
+    return "/" not in pattern and fnmatch.fnmatchcase(parts[-1], pattern)
+
+
+def list_package_files(
+    root_dir: str, includes: list[str], excludes: list[str]
+) -> list[tuple[str, str]]:
+    """Return the (archive name, file path) of the files to package, sorted by name"""
+
+    files = []
+    for root, dirs, names in os.walk(root_dir):
+        rel_root = os.path.relpath(root, root_dir).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else f"{rel_root}/"
+
+        # Don't walk into excluded folders
+        dirs[:] = [
+            d for d in dirs if not any(_matches(rel_root + d, p) for p in excludes)
+        ]
+
+        for name in names:
+            arcname = rel_root + name
+            if any(_matches(arcname, p) for p in excludes):
+                continue
+            if not any(_matches(arcname, p) for p in includes):
+                continue
+            files.append((arcname, os.path.join(root, name)))
+
+    files.sort()
+    return files
+
+
+def _get_files(
+    root_dir: str, includes: list[str] | None, excludes: list[str] | None
+) -> list[tuple[str, str]]:
+    """List the files with the given patterns or those of the manifest file"""
+    manifest_includes, manifest_excludes = load_manifest(root_dir)
+    return list_package_files(
+        root_dir,
+        includes if includes is not None else manifest_includes,
+        excludes if excludes is not None else manifest_excludes,
+    )
+
+
+def _is_stored(arcname: str) -> bool:
+    return os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+
+
+def _file_mode(path: str) -> int:
+    """0755 for executables, 0644 for everything else"""
+    return 0o100755 if os.access(path, os.X_OK) else 0o100644
+
+
+def _deflate_chunk(data: bytes, level: int, last: bool) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    out = compressor.compress(data)
+    return out + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _done(value: bytes) -> Future:
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
+
+class _ZipWriter:
+    """Writes entries whose data arrives in chunks.
+
+    The local header is written first.  When the entry is complete, the CRC and
+    sizes are patched into it, or written after the data in a data descriptor if
+    the file is not seekable (a pipe).
+    """
+
+    def __init__(self, f, seekable: bool = True):
+        self.f = f
+        self.seekable = seekable
+        self.offset = 0
+        self.entries: list[dict] = []
+
+    def _write(self, data: bytes):
+        self.f.write(data)
+        self.offset += len(data)
+
+    def start(self, entry: dict):
+        name = entry["name"].encode("utf-8")
+        entry["flags"] = 0 if entry["name"].isascii() else _UTF8_FLAG
+        if not self.seekable:
+            entry["flags"] |= _DATA_DESCRIPTOR_FLAG
+        entry["offset"] = self.offset
+        entry["csize"] = 0
+        if entry["offset"] > _ZIP32_LIMIT or len(self.entries) >= _ZIP32_MAX_ENTRIES:
+            raise Zip64Required()
+        # CRC and sizes are written by finish()
+        # fmt: off
+        self._write(_LOCAL_HEADER.pack(
+            0x04034B50, 20, entry["flags"], entry["method"], _DOS_TIME, _DOS_DATE,
+            0, 0, 0, len(name), 0,
+        ))
+        # fmt: on
+        self._write(name)
+        self.entries.append(entry)
+
+    def write(self, entry: dict, data: bytes):
+        entry["csize"] += len(data)
+        self._write(data)
+
+    def finish(self, entry: dict):
+        if entry["csize"] > _ZIP32_LIMIT or entry["size"] > _ZIP32_LIMIT:
+            raise Zip64Required()
+        sizes = struct.pack("<III", entry["crc"], entry["csize"], entry["size"])
+        if not self.seekable:
+            self._write(struct.pack("<I", 0x08074B50) + sizes)
+            return
+        # crc, compressed size and size are at offset 14 of the local header
+        self.f.seek(entry["offset"] + 14)
+        self.f.write(sizes)
+        self.f.seek(self.offset)
+
+    def close(self):
+        start = self.offset
+        for entry in self.entries:
+            name = entry["name"].encode("utf-8")
+            # Made by unix (3) so the permissions are kept
+            # fmt: off
+            self._write(_CENTRAL_HEADER.pack(
+                0x02014B50, (3 << 8) | 20, 20, entry["flags"], entry["method"],
+                _DOS_TIME, _DOS_DATE, entry["crc"], entry["csize"], entry["size"],
+                len(name), 0, 0, 0, 0, entry["mode"] << 16, entry["offset"],
+            ))
+            # fmt: on
+            self._write(name)
+        size = self.offset - start
+        if start > _ZIP32_LIMIT:
+            raise Zip64Required()
+        count = len(self.entries)
+        self._write(_END_RECORD.pack(0x06054B50, 0, 0, count, count, size, start, 0))
+
+
+def _iter_raw(f, offset: int, size: int):
+    """Yield the compressed data of an entry of an open zip in chunks"""
+    f.seek(offset)
+    while size > 0:
+        chunk = f.read(min(CHUNK_SIZE, size))
+        if not chunk:
+            raise ValueError("The previous package is truncated")
+        size -= len(chunk)
+        yield chunk
+
+
+def get_reusable_entries(zip_path: str, arcnames: list[str]) -> dict[str, dict]:
+    """Find the entries of the previous zip whose compressed data can be copied.
+
+    Returns:
+        dict: arcname -> {"method", "crc", "size", "csize", "data_offset"}
+    """
+    reusable: dict[str, dict] = {}
+    if not arcnames or not os.path.exists(zip_path):
+        return reusable
+
+    wanted = set(arcnames)
+    with zipfile.ZipFile(zip_path) as zipf, open(zip_path, "rb") as f:
+        for info in zipf.infolist():
+            if info.filename not in wanted:
+                continue
+            # The data follows the local header, whose extra field can differ from
+            # the central directory
+            f.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+            reusable[info.filename] = {
+                "method": info.compress_type,
+                "crc": info.CRC,
+                "size": info.file_size,
+                "csize": info.compress_size,
+                "data_offset": info.header_offset
+                + _LOCAL_HEADER.size
+                + header[9]
+                + header[10],
+            }
+    return reusable
+
+
+def _write_parallel(
+    f,
+    files: list[tuple[str, str]],
+    level: int,
+    max_workers: int | None,
+    previous_zip: str | None = None,
+    reusable: dict[str, dict] | None = None,
+    seekable: bool = True,
+) -> dict:
+    """Write the archive to the open file with chunks compressed on a thread pool.
+
+    The entries in reusable are copied from previous_zip without recompressing.
+    """
+    reusable = reusable or {}
+
+    workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+
+    # Bound the chunks waiting to be written (read ahead, compressing or compressed)
+    window = workers * 4
+
+    totals = {"Files": 0, "Bytes": 0, "CompressedBytes": 0, "Reused": 0}
+
+    with (
+        open(previous_zip, "rb") if reusable else nullcontext() as previous,
+        ThreadPoolExecutor(max_workers=workers) as pool,
+    ):
+        writer = _ZipWriter(f, seekable)
+
+        # (entry, future of the chunk data, is the first chunk, is the last chunk)
+        pending: deque = deque()
+
+        def write_next():
+            entry, future, first, last = pending.popleft()
+            if first:
+                writer.start(entry)
+            writer.write(entry, future.result())
+            if last:
+                writer.finish(entry)
+                totals["Files"] += 1
+                totals["Bytes"] += entry["size"]
+                totals["CompressedBytes"] += entry["csize"]
+
+        def queue(entry: dict, future: Future, first: bool, last: bool):
+            pending.append((entry, future, first, last))
+            while len(pending) > window:
+                write_next()
+
+        for arcname, path in files:
+            if arcname in reusable:
+                old = reusable[arcname]
+                entry = {
+                    "name": arcname,
+                    "method": old["method"],
+                    "mode": _file_mode(path),
+                    "crc": old["crc"],
+                    "size": old["size"],
+                }
+                remaining = old["csize"]
+                first = True
+                for chunk in _iter_raw(previous, old["data_offset"], remaining):
+                    remaining -= len(chunk)
+                    queue(entry, _done(chunk), first, remaining == 0)
+                    first = False
+                if first:
+                    queue(entry, _done(b""), True, True)
+                totals["Reused"] += 1
+                continue
+
+            stored = _is_stored(arcname)
+            entry = {
+                "name": arcname,
+                "method": zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+                "mode": _file_mode(path),
+                "crc": 0,
+                "size": os.path.getsize(path),
+            }
+
+            with open(path, "rb") as src:
+                crc = 0
+                remaining = entry["size"]
+                first = True
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    remaining -= len(chunk)
+                    last = not chunk or remaining <= 0
+                    crc = zlib.crc32(chunk, crc)
+                    if last:
+                        # The CRC is complete before the last chunk is queued
+                        entry["crc"] = crc
+                        entry["size"] = entry["size"] - remaining
+
+                    if stored:
+                        future = _done(chunk)
+                    else:
+                        future = pool.submit(_deflate_chunk, chunk, level, last)
+                    queue(entry, future, first, last)
+                    first = False
+                    if last:
+                        break
+
+        while pending:
+            write_next()
+
+        writer.close()
+
+    return totals
+
+
+def _write_zipfile(zip_path: str, files: list[tuple[str, str]], level: int) -> dict:
+    """Write the archive with zipfile.  Supports ZIP64.  Same ordering and metadata."""
+
+    totals = {"Files": 0, "Bytes": 0, "CompressedBytes": 0}
+    with zipfile.ZipFile(zip_path, "w", allowZip64=True) as zipf:
+        for arcname, path in files:
+            info = zipfile.ZipInfo(arcname, date_time=FIXED_DATE_TIME)
+            info.external_attr = _file_mode(path) << 16
+            info.create_system = 3
+            if _is_stored(arcname):
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.compress_level = level
+            with open(path, "rb") as src, zipf.open(info, "w", force_zip64=True) as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    dst.write(chunk)
+        for info in zipf.infolist():
+            totals["Files"] += 1
+            totals["Bytes"] += info.file_size
+            totals["CompressedBytes"] += info.compress_size
+    return totals
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 hex digest of a file"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_hash_manifest_path(zip_path: str) -> str:
+    """package.zip -> package.hashes.json"""
+    return os.path.splitext(zip_path)[0] + HASH_MANIFEST_SUFFIX
+
+
+def load_hash_manifest(zip_path: str) -> dict:
+    """Return the hash manifest of the zip or an empty one"""
+    try:
+        with open(get_hash_manifest_path(zip_path), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("Version") != HASH_MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def _save_hash_manifest(zip_path: str, manifest: dict):
+    path = get_hash_manifest_path(zip_path)
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_file, path)
+
+
+def get_file_hashes(
+    files: list[tuple[str, str]],
+    previous: dict[str, dict] | None = None,
+    max_workers: int | None = None,
+) -> dict[str, dict]:
+    """Hash the files concurrently.
+
+    A file whose size and modification time match the previous manifest isn't read.
+
+    Returns:
+        dict: arcname -> {"Size", "MTime", "Mode", "Sha256"}
+    """
+    previous = previous or {}
+
+    def get_hash(item: tuple[str, str]) -> dict:
+        arcname, path = item
+        st = os.stat(path)
+        entry = {"Size": st.st_size, "MTime": st.st_mtime_ns, "Mode": _file_mode(path)}
+        old = previous.get(arcname, {})
+        if old.get("Size") == entry["Size"] and old.get("MTime") == entry["MTime"]:
+            entry["Sha256"] = old["Sha256"]
+        else:
+            entry["Sha256"] = hash_file(path)
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        hashes = list(executor.map(get_hash, files))
+    return {arcname: h for (arcname, _), h in zip(files, hashes)}
+
+
+def _archive_stat(zip_path: str) -> dict:
+    st = os.stat(zip_path)
+    return {"Size": st.st_size, "MTime": st.st_mtime_ns}
+
+
+def _is_current(zip_path: str, manifest: dict) -> bool:
+    """True if the zip wasn't changed since the manifest was written"""
+    archive = manifest.get("Archive")
+    if not archive or not os.path.exists(zip_path):
+        return False
+    return {"Size": archive["Size"], "MTime": archive["MTime"]} == _archive_stat(
+        zip_path
+    )
+
+
+def get_package_sha256(zip_path: str) -> str:
+    """Return the SHA-256 of the zip.  Read from the hash manifest if it is current."""
+
+    manifest = load_hash_manifest(zip_path)
+    if _is_current(zip_path, manifest):
+        return manifest["Archive"]["Sha256"]
+    return hash_file(zip_path)
+
+
+def build_package(
+    root_dir: str,
+    zip_path: str,
+    includes: list[str] | None = None,
+    excludes: list[str] | None = None,
+    level: int = COMPRESSION_LEVEL,
+    max_workers: int | None = None,
+    incremental: bool = True,
+) -> dict:
+    """Build the package zip of the platform directory.
+
+    Args:
+        root_dir (str): The platform directory
+        zip_path (str): The zip file to write
+        includes (list[str], optional): The patterns of the files to package.
+            Default: from the manifest file, else "components" and "vars"
+        excludes (list[str], optional): The patterns of the files to leave out.
+            Default: from the manifest file plus DEFAULT_EXCLUDE
+        level (int): The deflate level
+        max_workers (int, optional): The number of compression threads
+        incremental (bool): Reuse the previous zip and its hash manifest
+
+    Returns:
+        dict: {"Files", "Bytes", "CompressedBytes", "Reused", "Rebuilt", "Sha256",
+        "Elapsed"}
+    """
+    start = time.monotonic()
+
+    files = _get_files(root_dir, includes, excludes)
+
+    previous: dict = {}
+    if incremental and os.path.exists(zip_path):
+        previous = load_hash_manifest(zip_path)
+        if previous.get("Level") != level:
+            previous = {}
+
+    hashes = get_file_hashes(files, previous.get("Files"), max_workers)
+
+    # Nothing changed and the zip is the one we wrote
+    if _is_current(zip_path, previous) and {
+        k: (v["Sha256"], v["Mode"]) for k, v in hashes.items()
+    } == {k: (v["Sha256"], v["Mode"]) for k, v in previous["Files"].items()}:
+        totals = dict(previous["Totals"])
+        totals["Reused"] = totals["Files"]
+        totals["Rebuilt"] = False
+        totals["Sha256"] = previous["Archive"]["Sha256"]
+        totals["Elapsed"] = time.monotonic() - start
+        return totals
+
+    # Only copy entries out of the zip the manifest describes.  If the zip was
+    # replaced or changed since, rebuild everything.
+    reusable = {}
+    if _is_current(zip_path, previous):
+        unchanged = [
+            arcname
+            for arcname, h in hashes.items()
+            if previous["Files"].get(arcname, {}).get("Sha256") == h["Sha256"]
+        ]
+        try:
+            reusable = get_reusable_entries(zip_path, unchanged)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            reusable = {}
+
+    temp_file = f"{zip_path}.{os.getpid()}.tmp"
+    try:
+        try:
+            with open(temp_file, "wb") as f:
+                totals = _write_parallel(
+                    f, files, level, max_workers, zip_path, reusable
+                )
+        except Zip64Required:
+            totals = _write_zipfile(temp_file, files, level)
+            totals["Reused"] = 0
+        os.replace(temp_file, zip_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    sha256 = hash_file(zip_path)
+    _save_hash_manifest(
+        zip_path,
+        {
+            "Version": HASH_MANIFEST_VERSION,
+            "Level": level,
+            "Files": hashes,
+            "Totals": {k: totals[k] for k in ["Files", "Bytes", "CompressedBytes"]},
+            "Archive": {**_archive_stat(zip_path), "Sha256": sha256},
+        },
+    )
+
+    totals["Rebuilt"] = True
+    totals["Sha256"] = sha256
+    totals["Elapsed"] = time.monotonic() - start
+    return totals
+
+
+def stream_package(
+    root_dir: str,
+    f,
+    includes: list[str] | None = None,
+    excludes: list[str] | None = None,
+    level: int = COMPRESSION_LEVEL,
+    max_workers: int | None = None,
+) -> dict:
+    """Write the package zip of the platform directory to a stream (a pipe or a
+    socket).  Nothing is written to disk.
+
+    The CRC and sizes of each entry follow its data in a data descriptor.  The
+    entries are the same as build_package() but the archive is not incremental.
+
+    Raises:
+        Zip64Required: If the package is too large to stream
+
+    Returns:
+        dict: {"Files", "Bytes", "CompressedBytes", "Elapsed"}
+    """
+    start = time.monotonic()
+
+    files = _get_files(root_dir, includes, excludes)
+
+    totals = _write_parallel(f, files, level, max_workers, seekable=False)
+    del totals["Reused"]
+
+    totals["Elapsed"] = time.monotonic() - start
+    return totals
@@ -0,0 +1,194 @@
+"""Run the tasks for many deployments from a batch manifest.
+
+The manifest is a YAML (or JSON) file:
+
+    defaults:                       # optional, applied to every deployment
+      tasks: [package, upload, compile, deploy]
+    deployments:
+      - client: acme
+        portfolio: web
+        app: api
+        branch: main
+        build: "42"
+        platform_dir: api/platform  # relative to the manifest
+
+Each deployment is the command line arguments, then the defaults, then its own
+values.  The client defaults (profile, bucket and invoker names) are made once per
+client, scope, bucket region and invoker branch and shared by the deployments with
+the same ones.  The deployments run concurrently.  A failed
+deployment doesn't stop the others.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from rich import box
+from rich.table import Table
+
+import core_framework as util
+from core_framework.constants import (
+    P_APP,
+    P_BRANCH,
+    P_BUCKET_REGION,
+    P_BUILD,
+    P_CLIENT,
+    P_PORTFOLIO,
+    P_SCOPE,
+)
+
+from ..console import cprint
+from .package import P_SHOW_PROGRESS
+
+DEFAULT_PARALLEL = 4
+
+
+def load_batch_manifest(path: str, base: dict) -> list[dict]:
+    """Read the manifest and return the arguments of each deployment.
+
+    Args:
+        path (str): The manifest file
+        base (dict): The command line arguments
+
+    Returns:
+        list[dict]: The arguments of each deployment
+    """
+    manifest = util.load_yaml_file(path) or {}
+    if isinstance(manifest, list):
+        manifest = {"deployments": manifest}
+
+    defaults = manifest.get("defaults") or {}
+    entries = manifest.get("deployments") or []
+    if not entries:
+        raise ValueError(f"No deployments in batch manifest {path}")
+
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+
+    deployments = []
+    for i, entry in enumerate(entries):
+        data = {**base, **defaults, **entry}
+        data.pop("batch", None)
+        if not data.get(P_CLIENT):
+            raise ValueError(f"Deployment {i + 1} in {path} has no client")
+        if isinstance(data.get("tasks"), str):
+            data["tasks"] = data["tasks"].split(",")
+        platform_dir = data.get("platform_dir")
+        if "platform_dir" in {**defaults, **entry} and platform_dir:
+            data["platform_dir"] = os.path.join(manifest_dir, platform_dir)
+        deployments.append(data)
+
+    return deployments
+
+
+def apply_client_defaults(
+    deployments: list[dict], make_defaults: Callable[[dict], dict]
+) -> list[dict]:
+    """Run make_defaults once per client, scope, bucket region and invoker branch
+    and apply the values it made to the deployments that don't set them.
+
+    The bucket and invoker names depend on all four, so deployments that differ
+    in any of them don't share their defaults."""
+
+    fields = [P_CLIENT, P_SCOPE, P_BUCKET_REGION, "invoker_branch"]
+
+    def get_key(data: dict) -> tuple:
+        return tuple(data.get(k) for k in fields)
+
+    client_defaults: dict[tuple, dict] = {}
+    for data in deployments:
+        key = get_key(data)
+        if key not in client_defaults:
+            # Only from the key, so a name set by one deployment isn't shared
+            client_defaults[key] = make_defaults(
+                {k: data[k] for k in fields if data.get(k) is not None}
+            )
+
+    return [
+        {
+            **data,
+            **{
+                k: v
+                for k, v in client_defaults[get_key(data)].items()
+                if data.get(k) is None
+            },
+        }
+        for data in deployments
+    ]
+
+
+def get_deployment_name(data: dict) -> str:
+    return "/".join(
+        str(data.get(k) or "-")
+        for k in [P_CLIENT, P_PORTFOLIO, P_APP, P_BRANCH, P_BUILD]
+    )
+
+
+def run_batch(
+    deployments: list[dict],
+    run_deployment: Callable[[dict], dict[str, dict]],
+    parallel: int = DEFAULT_PARALLEL,
+) -> list[dict]:
+    """Run the deployments concurrently.
+
+    Args:
+        deployments (list[dict]): The arguments of each deployment
+        run_deployment (Callable): Runs the tasks of one deployment and returns
+            the task results (see run_graph)
+        parallel (int): The maximum number of deployments running at once
+
+    Returns:
+        list[dict]: For each deployment its "name", "status", "elapsed", "tasks"
+        and "error"
+    """
+
+    def run(data: dict) -> dict:
+        name = get_deployment_name(data)
+        start = time.monotonic()
+        # Only one progress display can be live at a time
+        data[P_SHOW_PROGRESS] = False
+        try:
+            tasks = run_deployment(data)
+            result = {"status": "complete", "tasks": tasks, "error": ""}
+            cprint(f"[cyan]{name}[/cyan] complete")
+        except Exception as e:
+            result = {"status": "failed", "tasks": {}, "error": str(e)}
+            cprint(f"[cyan]{name}[/cyan] failed: {e}", style="bold red")
+        result["name"] = name
+        result["elapsed"] = time.monotonic() - start
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as executor:
+        return list(executor.map(run, deployments))
+
+
+def print_batch_results(results: list[dict], elapsed: float):
+    """Print the status and timings of each deployment"""
+
+    table = Table(title="Batch Results", box=box.SIMPLE)
+    table.add_column("Deployment", style="cyan")
+    table.add_column("Status")
+    table.add_column("Tasks")
+    table.add_column("Elapsed", justify="right")
+    table.add_column("Error")
+
+    for result in results:
+        style = "green" if result["status"] == "complete" else "red"
+        tasks = ", ".join(
+            f"{name} {task['elapsed']:.1f}s" for name, task in result["tasks"].items()
+        )
+        table.add_row(
+            result["name"],
+            f"[{style}]{result['status']}[/{style}]",
+            tasks,
+            f"{result['elapsed']:.1f}s",
+            result["error"],
+        )
+
+    cprint(table)
+
+    failed = sum(1 for r in results if r["status"] != "complete")
+    cprint(
+        f"{len(results) - failed} of {len(results)} deployment(s) completed "
+        f"in {elapsed:.1f}s."
+    )
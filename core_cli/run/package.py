@@ -1,6 +1,69 @@
 """handle the package task"""
 
+import os
+import time
 
-def task_package(**kwargs):
-    """placeholder"""
-    print("package")
+import core_framework as util
+from core_framework.models import TaskPayload
+from core_framework.constants import P_AWS_PROFILE, V_PACKAGE_ZIP
+
+from ..console import cprint, format_bytes, package_project, stream_project
+from ..packager import load_hash_manifest
+
+# Run state shared by the tasks.  See run.execute_run()
+P_TASK_PAYLOAD = "task_payload"
+P_PACKAGE_DIR = "package_dir"
+P_PACKAGE_UPLOADED = "package_uploaded"
+P_SHOW_PROGRESS = "show_progress"
+
+
+def get_task_payload(kwargs: dict) -> TaskPayload:
+    """The task payload of the run, or one made from the arguments"""
+    return kwargs.get(P_TASK_PAYLOAD) or TaskPayload.from_arguments(**kwargs)
+
+
+def print_package_results(totals: dict, elapsed: float, destination: str):
+    """Print the files and bytes packaged and the throughput"""
+
+    rate = totals.get("Bytes", 0) / elapsed if elapsed else 0
+    cprint(
+        f"Packaged {totals.get('Files', 0)} file(s), "
+        f"{format_bytes(totals.get('Bytes', 0))} "
+        f"({format_bytes(totals.get('CompressedBytes', 0))} zipped) "
+        f"to {destination} in {elapsed:.1f}s, {format_bytes(rate)}/s"
+    )
+
+
+def task_package(**kwargs) -> dict:
+    """Package the platform directory.
+
+    With --stream and S3 storage the zip is uploaded to the package key while it is
+    built.  Otherwise it is built in the temp directory for the upload task.
+
+    Returns:
+        dict: The run state for the upload task
+    """
+    task_payload = get_task_payload(kwargs)
+    root_dir = kwargs.get("platform_dir") or os.path.join(os.getcwd(), "platform")
+
+    start = time.monotonic()
+
+    if kwargs.get("stream") and util.is_use_s3():
+        totals = stream_project(
+            root_dir,
+            task_payload,
+            show_progress=kwargs.get(P_SHOW_PROGRESS, True),
+            profile=kwargs.get(P_AWS_PROFILE),
+        )
+        package = task_payload.Package
+        destination = f"s3://{package.BucketName}/{package.Key}"
+        state = {P_PACKAGE_UPLOADED: True}
+    else:
+        temp_dir = package_project(root_dir, task_payload)
+        destination = os.path.join(temp_dir, V_PACKAGE_ZIP)
+        totals = load_hash_manifest(destination).get("Totals", {})
+        state = {P_PACKAGE_DIR: temp_dir}
+
+    print_package_results(totals, time.monotonic() - start, destination)
+
+    return state
@@ -2,8 +2,14 @@
 
 import os
 import re
+import time
 from typing import Callable
+
+import core_framework as util
+
 from ..cmdparser import ExecuteCommandsType
+from ..bootstrap.graph import GraphType, run_graph
+from ..console import cprint
 
 from core_framework.constants import (
     ENV_AWS_PROFILE,
@@ -46,7 +52,14 @@ from core_framework.constants import (
 )
 
 from .apply import task_apply
-from .package import task_package
+from .batch import (
+    DEFAULT_PARALLEL,
+    apply_client_defaults,
+    load_batch_manifest,
+    print_batch_results,
+    run_batch,
+)
+from .package import P_TASK_PAYLOAD, get_task_payload, task_package
 from .upload import task_upload
 from .compile import task_compile
 from .plan import task_plan
@@ -55,7 +68,7 @@ from .release import task_release
 from .teardown import task_teardown
 
 
-TASKS: dict[str, tuple[str, Callable[..., None]]] = {
+TASKS: dict[str, tuple[str, Callable[..., dict | None]]] = {
     "package": ("Package application files (platform/package.sh)", task_package),
     "upload": ("Upload the package to the S3 bucket for deployment", task_upload),
     "compile": ("Compile the application and generate Actions", task_compile),
@@ -66,6 +79,21 @@ TASKS: dict[str, tuple[str, Callable[..., None]]] = {
     "teardown": ("Teardown the deployed application", task_teardown),
 }
 
+# task -> the tasks whose results it needs.  A task starts as soon as the requested
+# tasks it needs (directly or through tasks that were not requested) complete.  The
+# default tasks are a chain, so they run one after the other.  Only plan and deploy
+# can run at the same time.
+TASK_DEPENDS: dict[str, list[str]] = {
+    "package": [],
+    "upload": ["package"],
+    "compile": ["upload"],
+    "plan": ["compile"],
+    "apply": ["plan"],
+    "deploy": ["compile"],
+    "release": ["deploy"],
+    "teardown": ["apply", "release"],
+}
+
 
 def get_epilog():
     return f"""Options can also be set via environment variables:
@@ -78,6 +106,13 @@ def get_epilog():
 """
 
 
+# The run options when they are not given on the command line
+_OPTION_DEFAULTS: dict = {}
+
+# make_defaults() makes these for each client of a batch
+CLIENT_OPTIONS = [P_AWS_PROFILE, P_BUCKET_NAME, P_INVOKER_NAME]
+
+
 def make_defaults(data: dict) -> dict:
     """Make default values that were not supplied in the command line arguments"""
 
@@ -253,16 +288,141 @@ def get_run_command(subparsers) -> ExecuteCommandsType:
         help="Set to 'true' to force through an action if it "
         "has protection checks on it -- see teardown.",
     )
+    run_parser.add_argument(
+        "--platform-dir",
+        dest="platform_dir",
+        metavar="<platform-dir>",
+        default=os.path.join(os.getcwd(), "platform"),
+        help='The platform directory to package. Default: "./platform"',
+    )
+    run_parser.add_argument(
+        "--stream",
+        dest="stream",
+        action="store_true",
+        help="Upload the package to S3 while it is built instead of writing a temp "
+        "file first.  Without it the tasks run one after the other.  Needs the "
+        "package and upload tasks.  Always builds and uploads the whole package, so "
+        "--force has no effect.",
+    )
+    run_parser.add_argument(
+        "--batch",
+        dest="batch",
+        metavar="<manifest>",
+        help="Run the tasks for every deployment in a YAML/JSON manifest",
+    )
+    run_parser.add_argument(
+        "--parallel",
+        dest="parallel",
+        type=int,
+        default=DEFAULT_PARALLEL,
+        metavar="<n>",
+        help=f"Number of batch deployments run at once. Default: {DEFAULT_PARALLEL}",
+    )
+
+    _OPTION_DEFAULTS.clear()
+    _OPTION_DEFAULTS.update(vars(run_parser.parse_args(default_commands)))
+    # --aws-profile is a core option.  See core.parse_args()
+    _OPTION_DEFAULTS[P_AWS_PROFILE] = util.get_aws_profile()
 
     return {"run": (descriptions, execute_run)}
 
 
+def _get_requested_depends(task: str, tasks: list[str]) -> list[str]:
+    depends = []
+    for dependency in TASK_DEPENDS[task]:
+        if dependency in tasks:
+            depends.append(dependency)
+        else:
+            depends.extend(_get_requested_depends(dependency, tasks))
+    return depends
+
+
+def _make_node(fn: Callable[..., dict | None]) -> Callable[[dict], None]:
+    """Run a task with the run data and add the state it returns to the data"""
+
+    def node(data: dict):
+        data.update(fn(**data) or {})
+
+    return node
+
+
+def get_task_graph(tasks: list[str]) -> GraphType:
+    """The requested tasks and the requested tasks each one waits for"""
+    return {
+        task: (
+            _make_node(TASKS[task][1]),
+            sorted(set(_get_requested_depends(task, tasks))),
+        )
+        for task in dict.fromkeys(tasks)
+        if task in TASKS
+    }
+
+
+def run_tasks(data: dict, quiet: bool = False) -> dict[str, dict]:
+    """Run the tasks of one deployment.
+
+    The tasks run as a graph (see TASK_DEPENDS) and share the data dictionary.  The
+    task payload is made once and each task adds its results for the tasks after it.
+    Each task needs the output of the one before it (package, upload, compile,
+    deploy), so by default the tasks run one after the other.  The only overlap is
+    with --stream, and the package and upload tasks both running against S3: the
+    package is streamed so the upload of its parts overlaps the packaging.
+
+    Returns:
+        dict[str, dict]: For each task its "status" and "elapsed" seconds
+    """
+    tasks = data.get("tasks", [])
+
+    if "package" in tasks or "upload" in tasks:
+        data[P_TASK_PAYLOAD] = get_task_payload(data)
+
+    # Streaming skips the incremental build and the check for an uploaded package
+    data["stream"] = bool(data.get("stream")) and "upload" in tasks
+
+    return run_graph(get_task_graph(tasks), data, title="Run Tasks", quiet=quiet)
+
+
+def get_batch_base(kwargs: dict) -> dict:
+    """The command line arguments shared by the deployments of a batch.
+
+    The client options are left out unless the user set them, so every client gets
+    its own profile, bucket and invoker from make_defaults().
+    """
+    return {
+        k: v
+        for k, v in kwargs.items()
+        if k not in CLIENT_OPTIONS or v != _OPTION_DEFAULTS.get(k)
+    }
+
+
+def execute_batch(**kwargs):
+    """Run the tasks for every deployment in the batch manifest"""
+
+    start = time.monotonic()
+
+    deployments = load_batch_manifest(kwargs["batch"], get_batch_base(kwargs))
+    deployments = apply_client_defaults(deployments, make_defaults)
+
+    cprint(f"Running {len(deployments)} deployment(s)...\n")
+
+    results = run_batch(
+        deployments,
+        lambda data: run_tasks(data, quiet=True),
+        kwargs.get("parallel") or DEFAULT_PARALLEL,
+    )
+
+    print_batch_results(results, time.monotonic() - start)
+
+    failed = [r["name"] for r in results if r["status"] != "complete"]
+    if failed:
+        raise Exception(f"{len(failed)} deployment(s) failed: {', '.join(failed)}")
+
+
 def execute_run(**kwargs):
     """Run the Core Automation tasks"""
 
-    data = make_defaults(dict(kwargs))
+    if kwargs.get("batch"):
+        execute_batch(**kwargs)
+        return
 
-    tasks = kwargs.get("tasks", [])
-    for task in tasks:
-        if task in TASKS:
-            TASKS[task][1](**data)
+    run_tasks(make_defaults(dict(kwargs)))
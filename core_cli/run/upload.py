@@ -1,6 +1,40 @@
 """handle the upload task"""
 
+import os
+
+from core_framework.constants import P_AWS_PROFILE, V_PACKAGE_ZIP
+
+from ..console import cprint, get_package_dir, upload_project
+from .package import (
+    P_PACKAGE_DIR,
+    P_PACKAGE_UPLOADED,
+    P_SHOW_PROGRESS,
+    get_task_payload,
+)
+
 
 def task_upload(**kwargs):
-    """placeholder"""
-    print("upload")
+    """Upload the package built by the package task to the bucket"""
+
+    if kwargs.get(P_PACKAGE_UPLOADED):
+        cprint("The package was uploaded while it was built.")
+        return
+
+    task_payload = get_task_payload(kwargs)
+    temp_dir = kwargs.get(P_PACKAGE_DIR) or get_package_dir(task_payload)
+
+    if not os.path.exists(os.path.join(temp_dir, V_PACKAGE_ZIP)):
+        raise FileNotFoundError(
+            f"No {V_PACKAGE_ZIP} in {temp_dir}.  Run the package task first."
+        )
+
+    file_key = upload_project(
+        task_payload,
+        temp_dir,
+        force=kwargs.get("force", False),
+        show_progress=kwargs.get(P_SHOW_PROGRESS, True),
+        profile=kwargs.get(P_AWS_PROFILE),
+    )
+
+    package = task_payload.Package
+    cprint(f"Package: {package.BucketName}/{file_key}")
@@ -0,0 +1,132 @@
+"""Cache of the outputs of the stacks the CLI deployed.
+
+The outputs are read with one describe_stacks call after a deployment and kept in
+memory and in ~/.core/stack-outputs.json.  Later bootstrap steps and "core info"
+read the real bucket names from here instead of recomputing them or
+asking CloudFormation again.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+import core_framework as util
+
+from . import clients
+
+STACK_OUTPUTS_FILE = os.path.join(
+    os.path.expanduser("~"), ".core", "stack-outputs.json"
+)
+
+# core-automation-storage outputs
+OUTPUT_AUTOMATION_BUCKET_NAME = "AutomationBucketName"
+OUTPUT_ARTEFACTS_BUCKET_NAME = "ArtefactsBucketName"
+
+_LOCK = threading.Lock()
+
+# key -> {"StackName", "Region", "StackStatus", "Outputs", "Updated"}
+_OUTPUTS: dict[str, dict] = {}
+
+
+def _get_key(stack_name: str, region: str, role: str | None = None) -> str:
+    key = f"{util.get_aws_profile()}:{region}:{stack_name}"
+    return f"{key}@{role}" if role else key
+
+
+def _load():
+    if _OUTPUTS:
+        return
+    try:
+        with open(STACK_OUTPUTS_FILE, "r") as f:
+            _OUTPUTS.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+
+def _save():
+    os.makedirs(os.path.dirname(STACK_OUTPUTS_FILE), exist_ok=True)
+    temp_file = f"{STACK_OUTPUTS_FILE}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(_OUTPUTS, f, indent=2, sort_keys=True)
+    os.replace(temp_file, STACK_OUTPUTS_FILE)
+
+
+def record_stack(stack: dict, region: str, role: str | None = None) -> dict[str, str]:
+    """Save the outputs of a stack returned by describe_stacks"""
+
+    outputs = {o["OutputKey"]: o["OutputValue"] for o in stack.get("Outputs", [])}
+    with _LOCK:
+        _load()
+        _OUTPUTS[_get_key(stack["StackName"], region, role)] = {
+            "StackName": stack["StackName"],
+            "Region": region,
+            "StackStatus": stack["StackStatus"],
+            "Outputs": outputs,
+            "Updated": datetime.now(timezone.utc).isoformat(),
+        }
+        _save()
+    return outputs
+
+
+def describe_stack(
+    stack_name: str, region: str, role: str | None = None
+) -> dict | None:
+    """Describe the stack and save its outputs.
+
+    Returns:
+        dict | None: The stack from describe_stacks or None if it doesn't exist
+    """
+    cloudformation = clients.cfn_client(region, role)
+    try:
+        stack = cloudformation.describe_stacks(StackName=stack_name)["Stacks"][0]
+    except ClientError as e:
+        # A stack that doesn't exist is a ValidationError
+        if e.response["Error"]["Code"] != "ValidationError":
+            raise
+        forget_stack(stack_name, region, role)
+        return None
+    record_stack(stack, region, role)
+    return stack
+
+
+def forget_stack(stack_name: str, region: str, role: str | None = None):
+    """Remove the outputs of a stack that no longer exists"""
+
+    with _LOCK:
+        _load()
+        if _OUTPUTS.pop(_get_key(stack_name, region, role), None) is not None:
+            _save()
+
+
+def get_stack_outputs(
+    stack_name: str, region: str | None = None, role: str | None = None
+) -> dict[str, str]:
+    """Return the outputs of the stack.  Only asks CloudFormation if they aren't cached.
+
+    Returns:
+        dict[str, str]: OutputKey -> OutputValue.  Empty if the stack doesn't exist.
+    """
+    region = region or util.get_region()
+
+    with _LOCK:
+        _load()
+        entry = _OUTPUTS.get(_get_key(stack_name, region, role))
+    if entry is not None:
+        return dict(entry["Outputs"])
+
+    stack = describe_stack(stack_name, region, role)
+    if stack is None:
+        return {}
+    return {o["OutputKey"]: o["OutputValue"] for o in stack.get("Outputs", [])}
+
+
+def list_stack_outputs() -> list[dict]:
+    """Return the cached stacks of the current AWS profile.  No AWS calls are made."""
+
+    prefix = f"{util.get_aws_profile()}:"
+    with _LOCK:
+        _load()
+        return [dict(v) for k, v in sorted(_OUTPUTS.items()) if k.startswith(prefix)]
@@ -0,0 +1,404 @@
+"""Upload files to the automation bucket.
+
+Files larger than the part size go up as a concurrent multipart upload with
+s3transfer, so a failed part is retried on its own instead of restarting the whole
+upload.  Every part is sent with a SHA-256 checksum that S3 verifies on arrival.
+After the upload, the checksum S3 reports for the object is compared with one
+computed from the local file.
+
+When the CLI is not using S3, the bucket is a directory on the storage volume.  The
+file is cloned into it (reflink), or copied with sendfile where the filesystem
+can't clone, rather than being read and written again by put_object.
+"""
+
+import base64
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from boto3.s3.transfer import TransferConfig
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+from s3transfer.utils import ChunksizeAdjuster
+
+from core_helper.magic import MagicS3Client
+
+import core_framework as util
+
+from . import clients
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+# Read the file in blocks of this size when computing the checksum
+_READ_SIZE = 1024 * 1024
+
+# ioctl to clone a file on Linux filesystems that share extents (btrfs, xfs)
+_FICLONE = 0x40049409
+
+
+def get_part_size(size: int, part_size: int = DEFAULT_PART_SIZE) -> int:
+    """The part size s3transfer will use.  It grows the parts to stay under the
+    S3 limit of 10,000 parts."""
+    return ChunksizeAdjuster().adjust_chunksize(part_size, size)
+
+
+def count_parts(size: int, part_size: int) -> int:
+    """The number of requests s3transfer sends the file in"""
+    return max(-(-size // part_size), 1)
+
+
+def get_checksum_sha256(fn: str, part_size: int = DEFAULT_PART_SIZE) -> str:
+    """Return the ChecksumSHA256 S3 will report for the file.
+
+    The file is uploaded in one request if it is smaller than the part size.  The
+    checksum is then the base64 SHA-256 of the file.  Otherwise it is the SHA-256
+    of the part checksums followed by "-<number of parts>".
+    """
+    size = os.path.getsize(fn)
+    part_size = get_part_size(size, part_size)
+
+    parts = []
+    with open(fn, "rb") as f:
+        for _ in range(count_parts(size, part_size)):
+            sha256 = hashlib.sha256()
+            remaining = part_size
+            while remaining > 0 and (block := f.read(min(_READ_SIZE, remaining))):
+                sha256.update(block)
+                remaining -= len(block)
+            parts.append(sha256.digest())
+
+    if size < part_size:
+        return base64.b64encode(parts[0]).decode("ascii")
+
+    checksum = base64.b64encode(hashlib.sha256(b"".join(parts)).digest())
+    return f"{checksum.decode('ascii')}-{len(parts)}"
+
+
+def _make_progress(show_progress: bool) -> Progress:
+    return Progress(
+        TextColumn("[cyan]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        transient=True,
+        disable=not show_progress,
+    )
+
+
+def get_local_object_path(region: str, bucket_name: str, key: str) -> str | None:
+    """The file of the object in the local bucket, or None if the storage volume
+    is not a local directory"""
+    volume = util.get_storage_volume(region)
+    if not volume or not os.path.isdir(volume):
+        return None
+    return os.path.join(volume, bucket_name, *key.split("/"))
+
+
+def _reflink(src: str, dest: str):
+    import fcntl
+
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+
+
+def link_file(src: str, dest: str) -> str:
+    """Put the file at dest without copying the data if possible.
+
+    Tries a reflink, then shutil.copyfile (which uses sendfile).  Not a hard link:
+    dest would share its inode with src, so writing the object in place would
+    change the package src too.  dest is replaced atomically.
+
+    Returns:
+        str: "reflink", "copy" or "unchanged" if dest is already src
+    """
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return "unchanged"
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    temp_file = f"{dest}.{os.getpid()}.tmp"
+    try:
+        try:
+            _reflink(src, temp_file)
+            method = "reflink"
+        except (OSError, ImportError):
+            shutil.copyfile(src, temp_file)
+            method = "copy"
+        os.replace(temp_file, dest)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return method
+
+
+def _upload_local(
+    fn: str, region: str, bucket_name: str, key: str, show_progress: bool
+) -> dict:
+    """Put the file in the local (non-S3) bucket"""
+
+    size = os.path.getsize(fn)
+
+    dest = get_local_object_path(region, bucket_name, key)
+    if dest:
+        method = link_file(fn, dest)
+        return {"Bytes": size, "Parts": 1, "ChecksumSHA256": None, "Method": method}
+
+    bucket = MagicS3Client.get_bucket(region, bucket_name)
+    with _make_progress(show_progress) as progress:
+        task = progress.add_task(key, total=size)
+        with open(fn, "rb") as data:
+            bucket.put_object(Key=key, Body=data)
+        progress.update(task, completed=size)
+    return {"Bytes": size, "Parts": 1, "ChecksumSHA256": None, "Method": "put_object"}
+
+
+def _verify_upload(
+    s3_client, bucket_name: str, key: str, size: int, expected: str
+) -> str | None:
+    """Compare the size and checksum of the object with the local ones.
+
+    Returns:
+        str | None: The ChecksumSHA256 of the object.  None if S3 has no checksum.
+    """
+    response = s3_client.head_object(
+        Bucket=bucket_name, Key=key, ChecksumMode="ENABLED"
+    )
+    checksum = response.get("ChecksumSHA256")
+    if checksum and checksum != expected:
+        raise OSError(
+            f"Checksum mismatch for s3://{bucket_name}/{key}: "
+            f"expected {expected}, S3 has {checksum}"
+        )
+    if response.get("ContentLength") != size:
+        raise OSError(
+            f"Size mismatch for s3://{bucket_name}/{key}: "
+            f"expected {size}, S3 has {response.get('ContentLength')}"
+        )
+    return checksum
+
+
+def upload_file(
+    fn: str,
+    region: str,
+    bucket_name: str,
+    key: str,
+    metadata: dict[str, str] | None = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    role: str | None = None,
+    show_progress: bool = True,
+    profile: str | None = None,
+) -> dict:
+    """Upload a file to the bucket and verify its checksum.
+
+    Args:
+        fn (str): The file to upload
+        region (str): The bucket region
+        bucket_name (str): The bucket
+        key (str): The object key
+        metadata (dict, optional): The object metadata (S3 only)
+        part_size (int): The multipart part size.  Smaller files are sent whole.
+        max_concurrency (int): The number of parts uploaded at once
+        role (str, optional): The role to upload with
+        show_progress (bool): Show a progress bar
+        profile (str, optional): The AWS profile.  Defaults to util.get_aws_profile()
+
+    Returns:
+        dict: {"Bytes", "Parts", "ChecksumSHA256", "Method", "Elapsed"}
+
+    Raises:
+        OSError: If the checksum of the object in S3 is not the checksum of the file
+    """
+    start = time.monotonic()
+
+    if not util.is_use_s3():
+        result = _upload_local(fn, region, bucket_name, key, show_progress)
+        result["Elapsed"] = time.monotonic() - start
+        return result
+
+    size = os.path.getsize(fn)
+    part_size = get_part_size(size, part_size)
+
+    config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency,
+    )
+    extra_args: dict = {"ChecksumAlgorithm": "SHA256"}
+    if metadata:
+        extra_args["Metadata"] = metadata
+
+    s3_client = clients.s3_client(region, role, profile)
+
+    with (
+        ThreadPoolExecutor(max_workers=1) as executor,
+        _make_progress(show_progress) as progress,
+    ):
+        # Checksum the file while it uploads
+        expected = executor.submit(get_checksum_sha256, fn, part_size)
+
+        task = progress.add_task(key, total=size)
+        s3_client.upload_file(
+            fn,
+            bucket_name,
+            key,
+            ExtraArgs=extra_args,
+            Config=config,
+            Callback=lambda n: progress.update(task, advance=n),
+        )
+
+        checksum = _verify_upload(s3_client, bucket_name, key, size, expected.result())
+
+    return {
+        "Bytes": size,
+        "Parts": count_parts(size, part_size),
+        "ChecksumSHA256": checksum,
+        "Method": "multipart" if size >= part_size else "put_object",
+        "Elapsed": time.monotonic() - start,
+    }
+
+
+class _ChecksumWriter:
+    """Passes writes through and computes the ChecksumSHA256 S3 will report for
+    the bytes written.  See get_checksum_sha256()"""
+
+    def __init__(self, f, part_size: int):
+        self.f = f
+        self.part_size = part_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.parts: list[bytes] = []
+        self._part = hashlib.sha256()
+        self._part_size = 0
+
+    def write(self, data: bytes) -> int:
+        self.f.write(data)
+        self.size += len(data)
+        self.sha256.update(data)
+        view = memoryview(data)
+        while view:
+            n = min(len(view), self.part_size - self._part_size)
+            self._part.update(view[:n])
+            self._part_size += n
+            view = view[n:]
+            if self._part_size == self.part_size:
+                self.parts.append(self._part.digest())
+                self._part = hashlib.sha256()
+                self._part_size = 0
+        return len(data)
+
+    def get_checksum_sha256(self) -> str:
+        if self.size < self.part_size:
+            return base64.b64encode(self.sha256.digest()).decode("ascii")
+        parts = self.parts + ([self._part.digest()] if self._part_size else [])
+        checksum = base64.b64encode(hashlib.sha256(b"".join(parts)).digest())
+        return f"{checksum.decode('ascii')}-{len(parts)}"
+
+
+class _ProducerReader:
+    """Reads the pipe and, at the end of it, raises the writer's exception if the
+    writer failed.  s3transfer then aborts the upload instead of completing it with
+    the data written before the failure."""
+
+    def __init__(self, f, future: Future):
+        self.f = f
+        self.future = future
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        if not data:
+            # The writer closes the pipe on its way out.  Wait for its result.
+            e = self.future.exception()
+            if e is not None:
+                raise e
+        return data
+
+
+def upload_stream(
+    write: Callable[[Any], dict],
+    region: str,
+    bucket_name: str,
+    key: str,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    role: str | None = None,
+    show_progress: bool = True,
+    profile: str | None = None,
+) -> dict:
+    """Upload what a writer function produces while it is producing it.
+
+    write(f) is called on a thread with the write end of a pipe.  s3transfer reads
+    the other end and uploads each part as soon as it is filled, so the data is
+    never written to disk.  The checksum is verified as in upload_file().  If write()
+    fails the upload is aborted and the object already at the key is left alone.
+
+    Returns:
+        dict: The result of write() plus {"UploadedBytes", "Parts", "ChecksumSHA256",
+        "Sha256", "Elapsed"}
+    """
+    start = time.monotonic()
+
+    config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency,
+    )
+    s3_client = clients.s3_client(region, role, profile)
+
+    read_fd, write_fd = os.pipe()
+    reader = os.fdopen(read_fd, "rb")
+    checksum_writer = _ChecksumWriter(os.fdopen(write_fd, "wb"), part_size)
+
+    def produce() -> dict:
+        try:
+            return write(checksum_writer)
+        finally:
+            checksum_writer.f.close()
+
+    with (
+        ThreadPoolExecutor(max_workers=1) as executor,
+        _make_progress(show_progress) as progress,
+    ):
+        future = executor.submit(produce)
+        task = progress.add_task(key, total=None)
+        try:
+            s3_client.upload_fileobj(
+                _ProducerReader(reader, future),
+                bucket_name,
+                key,
+                ExtraArgs={"ChecksumAlgorithm": "SHA256"},
+                Config=config,
+                Callback=lambda n: progress.update(task, advance=n),
+            )
+        finally:
+            # Stops the writer with a broken pipe if the upload failed
+            reader.close()
+        result = future.result()
+
+    size = checksum_writer.size
+    expected = checksum_writer.get_checksum_sha256()
+
+    checksum = _verify_upload(s3_client, bucket_name, key, size, expected)
+
+    result = dict(result or {})
+    result.update(
+        {
+            "UploadedBytes": size,
+            "Parts": count_parts(size, part_size),
+            "ChecksumSHA256": checksum,
+            "Sha256": checksum_writer.sha256.hexdigest(),
+            "Elapsed": time.monotonic() - start,
+        }
+    )
+    return result
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from core_cli.run.batch import apply_client_defaults, load_batch_manifest
+
+
+def test_load_batch_manifest(tmp_path):
+
+    fn = os.path.join(tmp_path, "batch.yaml")
+    with open(fn, "w") as f:
+        f.write(
+            "defaults:\n"
+            "  tasks: package,upload\n"
+            "  portfolio: web\n"
+            "deployments:\n"
+            "  - client: acme\n"
+            "    app: api\n"
+            "    platform_dir: api/platform\n"
+            "  - client: other\n"
+            "    app: ui\n"
+            "    portfolio: mobile\n"
+        )
+
+    base = {"batch": fn, "client": None, "branch": "main", "platform_dir": None}
+    deployments = load_batch_manifest(fn, base)
+
+    assert len(deployments) == 2
+    first, second = deployments
+    assert "batch" not in first
+    assert first["client"] == "acme"
+    assert first["portfolio"] == "web"
+    assert first["branch"] == "main"
+    assert first["tasks"] == ["package", "upload"]
+    assert first["platform_dir"] == os.path.join(tmp_path, "api/platform")
+    assert second["portfolio"] == "mobile"
+    assert second["platform_dir"] is None
+
+
+def test_load_batch_manifest_errors(tmp_path):
+
+    fn = os.path.join(tmp_path, "batch.yaml")
+    with open(fn, "w") as f:
+        f.write("deployments: []\n")
+    with pytest.raises(ValueError):
+        load_batch_manifest(fn, {})
+
+    with open(fn, "w") as f:
+        f.write("deployments:\n  - app: api\n")
+    with pytest.raises(ValueError):
+        load_batch_manifest(fn, {"client": None})
+
+
+def test_apply_client_defaults():
+
+    calls = []
+
+    def make_defaults(data: dict) -> dict:
+        calls.append(dict(data))
+        data.setdefault("aws_profile", data["client"])
+        data["bucket_name"] = f"{data['client']}-core-automation-{data['bucket_region']}"
+        data["invoker_name"] = f"core-automation-{data['invoker_branch']}-invoker"
+        return data
+
+    deployments = [
+        {"client": "acme", "bucket_region": "us-east-1", "invoker_branch": "master"},
+        {"client": "acme", "bucket_region": "us-east-1", "invoker_branch": "master"},
+        {"client": "acme", "bucket_region": "eu-west-1", "invoker_branch": "master"},
+        {"client": "acme", "bucket_region": "us-east-1", "invoker_branch": "dev"},
+        {
+            "client": "acme",
+            "bucket_region": "us-east-1",
+            "invoker_branch": "master",
+            "bucket_name": "mine",
+        },
+    ]
+
+    result = apply_client_defaults(deployments, make_defaults)
+
+    # Once per client, bucket region and invoker branch
+    assert len(calls) == 3
+    assert [d["bucket_name"] for d in result] == [
+        "acme-core-automation-us-east-1",
+        "acme-core-automation-us-east-1",
+        "acme-core-automation-eu-west-1",
+        "acme-core-automation-us-east-1",
+        "mine",
+    ]
+    assert [d["invoker_name"] for d in result] == [
+        "core-automation-master-invoker",
+        "core-automation-master-invoker",
+        "core-automation-master-invoker",
+        "core-automation-dev-invoker",
+        "core-automation-master-invoker",
+    ]
+    assert all(d["aws_profile"] == "acme" for d in result)
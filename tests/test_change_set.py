@@ -0,0 +1,47 @@
+from core_cli.bootstrap import deploy
+from core_cli.bootstrap.deploy import iter_change_set
+
+
+class FakeCloudFormation:
+    """describe_change_set in pages of two changes"""
+
+    def __init__(self, changes: list[dict]):
+        self.changes = changes
+        self.calls: list[dict] = []
+
+    def describe_change_set(self, **kwargs) -> dict:
+        self.calls.append(kwargs)
+        start = int(kwargs.get("NextToken", 0))
+        response = {"Changes": self.changes[start : start + 2]}
+        if start + 2 < len(self.changes):
+            response["NextToken"] = str(start + 2)
+        return response
+
+
+def test_iter_change_set(monkeypatch):
+
+    changes = [
+        {"Type": "Resource", "ResourceChange": {"LogicalResourceId": f"R{i}"}}
+        for i in range(5)
+    ]
+    changes.insert(3, {"Type": "Other"})
+    cloudformation = FakeCloudFormation(changes)
+    monkeypatch.setattr(
+        deploy.clients, "cfn_client", lambda region, role=None: cloudformation
+    )
+
+    resource_changes = list(iter_change_set("core-automation-roles", "us-east-1"))
+
+    assert [c["LogicalResourceId"] for c in resource_changes] == [
+        "R0",
+        "R1",
+        "R2",
+        "R3",
+        "R4",
+    ]
+    assert [c.get("NextToken") for c in cloudformation.calls] == [None, "2", "4"]
+    assert all(
+        c["ChangeSetName"] == "core-automation-roles-change-set"
+        and c["StackName"] == "core-automation-roles"
+        for c in cloudformation.calls
+    )
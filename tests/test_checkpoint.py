@@ -0,0 +1,85 @@
+import os
+import stat
+import time
+
+import pytest
+
+from core_cli.bootstrap import checkpoint
+from core_cli.bootstrap.checkpoint import (
+    CHECKPOINT_TTL,
+    clear_checkpoint,
+    load_checkpoint,
+    merge_options,
+    save_checkpoint,
+)
+
+
+@pytest.fixture
+def checkpoint_file(monkeypatch, tmp_path):
+    checkpoint_dir = os.path.join(tmp_path, ".core")
+    fn = os.path.join(checkpoint_dir, "bootstrap-checkpoint.json")
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", checkpoint_dir)
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_FILE", fn)
+    return fn
+
+
+def test_save_load_clear(checkpoint_file):
+
+    assert load_checkpoint("acme:acme") is None
+
+    save_checkpoint("acme:acme", "deploy", {"client": "acme"})
+    save_checkpoint("other:other", "org", {"client": "other"})
+
+    saved = load_checkpoint("acme:acme")
+    assert saved["step"] == "deploy"
+    assert saved["data"] == {"client": "acme"}
+
+    # Only the user can read the account and role details
+    assert stat.S_IMODE(os.stat(checkpoint_file).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(checkpoint_file)).st_mode) == 0o700
+    assert os.listdir(os.path.dirname(checkpoint_file)) == [
+        os.path.basename(checkpoint_file)
+    ]
+
+    clear_checkpoint("acme:acme")
+    assert load_checkpoint("acme:acme") is None
+    assert load_checkpoint("other:other")["step"] == "org"
+
+
+def test_expired(checkpoint_file, monkeypatch):
+
+    save_checkpoint("acme:acme", "deploy", {})
+
+    now = time.time() + CHECKPOINT_TTL + 1
+    monkeypatch.setattr(checkpoint.time, "time", lambda: now)
+    assert load_checkpoint("acme:acme") is None
+
+
+def test_write_error(checkpoint_file, monkeypatch):
+
+    def fail(*args, **kwargs):
+        raise PermissionError("read-only file system")
+
+    # A checkpoint that can't be saved must not hide the error being reported
+    monkeypatch.setattr(checkpoint.os, "open", fail)
+    save_checkpoint("acme:acme", "deploy", {})
+    assert load_checkpoint("acme:acme") is None
+
+
+def test_merge_options():
+
+    saved = {"client": "acme", "force": True, "max_workers": 8, "step_data": 1}
+    defaults = {"client": None, "force": False, "max_workers": 4, "yes": False}
+
+    options = {"client": None, "force": False, "max_workers": 4, "yes": True}
+    assert merge_options(saved, options, defaults) == {
+        "client": "acme",
+        "force": True,
+        "max_workers": 8,
+        "step_data": 1,
+        "yes": True,
+    }
+
+    # An option given on the command line wins over the saved one
+    options["max_workers"] = 2
+    assert merge_options(saved, options, defaults)["max_workers"] == 2
@@ -0,0 +1,61 @@
+import threading
+
+import core_cli.bootstrap as bootstrap
+
+
+def test_deploy_database_overlaps(monkeypatch):
+
+    prompts = []
+    registered = []
+
+    # Both stacks must be deploying at the same time to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    running = []
+
+    def finish(plan: dict):
+        running.append(plan["stack_name"])
+        barrier.wait()
+
+    def confirm(plans: list[dict]) -> bool:
+        prompts.append([plan["stack_name"] for plan in plans])
+        return True
+
+    monkeypatch.setattr(bootstrap, "get_facts_db_stack", lambda data: {"n": "facts"})
+    monkeypatch.setattr(bootstrap, "get_items_db_stack", lambda data: {"n": "items"})
+    monkeypatch.setattr(
+        bootstrap, "prepare_deploy_stack", lambda **kwargs: {"stack_name": kwargs["n"]}
+    )
+    monkeypatch.setattr(bootstrap, "confirm_deploy_stacks", confirm)
+    monkeypatch.setattr(bootstrap, "finish_deploy_stack", finish)
+    monkeypatch.setattr(bootstrap, "register_database", registered.append)
+    monkeypatch.setattr(bootstrap, "get_input", lambda *args: "Enter")
+
+    data = {"client": "acme"}
+    assert bootstrap.deploy_database(data, "next") == "next"
+
+    # A single confirmation for both change sets
+    assert prompts == [["facts", "items"]]
+    assert sorted(running) == ["facts", "items"]
+    assert registered == [data]
+
+
+def test_deploy_database_aborted(monkeypatch):
+
+    finished = []
+
+    monkeypatch.setattr(bootstrap, "get_facts_db_stack", lambda data: {"n": "facts"})
+    monkeypatch.setattr(bootstrap, "get_items_db_stack", lambda data: {"n": "items"})
+    # The facts stack is unchanged, so there is nothing to deploy
+    monkeypatch.setattr(
+        bootstrap,
+        "prepare_deploy_stack",
+        lambda **kwargs: None if kwargs["n"] == "facts" else {"stack_name": "items"},
+    )
+    monkeypatch.setattr(bootstrap, "confirm_deploy_stacks", lambda plans: False)
+    monkeypatch.setattr(bootstrap, "finish_deploy_stack", finished.append)
+    monkeypatch.setattr(bootstrap, "register_database", lambda data: None)
+    monkeypatch.setattr(bootstrap, "get_input", lambda *args: "Enter")
+
+    bootstrap.deploy_database({}, "next")
+
+    assert finished == []
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core_cli.bootstrap import events
+from core_cli.bootstrap.events import (
+    CREATE_COMPLETE,
+    UPDATE_COMPLETE,
+    StackOperationFailed,
+    wait_for_stack,
+)
+
+STACK_ID = "arn:aws:cloudformation:us-east-1:111:stack/db/1"
+
+NOW = datetime.now(timezone.utc)
+
+
+def make_event(
+    event_id: str, status: str, stack: bool = False, minutes_ago: int = 0
+) -> dict:
+    return {
+        "EventId": event_id,
+        "LogicalResourceId": "db" if stack else "Table",
+        "PhysicalResourceId": STACK_ID if stack else "table",
+        "ResourceType": (
+            "AWS::CloudFormation::Stack" if stack else "AWS::DynamoDB::Table"
+        ),
+        "ResourceStatus": status,
+        "ResourceStatusReason": f"{event_id} reason",
+        "Timestamp": NOW - timedelta(minutes=minutes_ago),
+    }
+
+
+class FakeCloudFormation:
+    """Each describe_stack_events call adds the next batch of events"""
+
+    def __init__(self, history: list[dict], polls: list[list[dict]]):
+        self.history = list(history)
+        self.polls = list(polls)
+
+    def get_paginator(self, name: str):
+        assert name == "describe_stack_events"
+        return self
+
+    def paginate(self, StackName: str):
+        assert StackName == STACK_ID
+        if self.polls:
+            self.history.extend(self.polls.pop(0))
+        # Newest first, two to a page
+        stack_events = list(reversed(self.history))
+        for i in range(0, len(stack_events), 2):
+            yield {"StackEvents": stack_events[i : i + 2]}
+
+
+@pytest.fixture
+def cloudformation(monkeypatch):
+
+    def make(history: list[dict], polls: list[list[dict]]) -> FakeCloudFormation:
+        fake = FakeCloudFormation(history, polls)
+        monkeypatch.setattr(events.clients, "cfn_client", lambda region, role: fake)
+        return fake
+
+    monkeypatch.setattr(events.time, "sleep", lambda delay: None)
+    return make
+
+
+def test_since_event_id(cloudformation):
+
+    # The failure of the last operation is before the baseline event
+    history = [make_event("e1", "UPDATE_FAILED"), make_event("e2", "UPDATE_COMPLETE")]
+    polls = [
+        [make_event("e3", "UPDATE_IN_PROGRESS", stack=True)],
+        [],
+        [
+            make_event("e4", "UPDATE_COMPLETE"),
+            make_event("e5", "UPDATE_COMPLETE", stack=True),
+        ],
+    ]
+    fake = cloudformation(history, polls)
+
+    status = wait_for_stack(STACK_ID, "us-east-1", UPDATE_COMPLETE, "e2")
+
+    assert status == "UPDATE_COMPLETE"
+    assert fake.polls == []
+
+
+def test_cutoff(cloudformation):
+
+    # Without a baseline event, the events from before the operation are skipped
+    history = [
+        make_event("e1", "CREATE_FAILED", minutes_ago=60),
+        make_event("e2", "ROLLBACK_COMPLETE", stack=True, minutes_ago=59),
+    ]
+    polls = [
+        [make_event("e3", "CREATE_IN_PROGRESS", stack=True)],
+        [make_event("e4", "CREATE_COMPLETE", stack=True)],
+    ]
+    cloudformation(history, polls)
+
+    status = wait_for_stack(STACK_ID, "us-east-1", CREATE_COMPLETE, started=NOW)
+
+    assert status == "CREATE_COMPLETE"
+
+
+def test_failure_waits_for_rollback(cloudformation):
+
+    polls = [
+        [
+            make_event("e1", "CREATE_IN_PROGRESS", stack=True),
+            make_event("e2", "CREATE_FAILED"),
+            make_event("e3", "ROLLBACK_IN_PROGRESS", stack=True),
+        ],
+        [],
+        [make_event("e4", "DELETE_COMPLETE")],
+        [make_event("e5", "ROLLBACK_COMPLETE", stack=True)],
+        [make_event("e6", "DELETE_IN_PROGRESS", stack=True)],
+    ]
+    fake = cloudformation([], polls)
+
+    # The first failure is reported, once the rollback is over
+    with pytest.raises(StackOperationFailed, match="Table e2 reason"):
+        wait_for_stack(STACK_ID, "us-east-1", CREATE_COMPLETE, started=NOW)
+
+    assert len(fake.polls) == 1
+
+
+@pytest.mark.parametrize(
+    "final", ["UPDATE_ROLLBACK_COMPLETE", "UPDATE_ROLLBACK_FAILED"]
+)
+def test_update_rollback(cloudformation, final):
+
+    polls = [
+        [make_event("e1", "UPDATE_ROLLBACK_IN_PROGRESS", stack=True)],
+        [make_event("e2", "UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS", True)],
+        [make_event("e3", final, stack=True)],
+    ]
+    fake = cloudformation([], polls)
+
+    with pytest.raises(StackOperationFailed, match="db e1 reason"):
+        wait_for_stack(STACK_ID, "us-east-1", UPDATE_COMPLETE, started=NOW)
+
+    assert fake.polls == []
+
+
+def test_timeout(cloudformation, monkeypatch):
+
+    polls = [[make_event("e1", "ROLLBACK_IN_PROGRESS", stack=True)]]
+    cloudformation([], polls)
+
+    # The failure is still reported if the rollback takes too long
+    monkeypatch.setattr(events, "MAX_WAIT", 0.05)
+    with pytest.raises(StackOperationFailed, match="still rolling back"):
+        wait_for_stack(STACK_ID, "us-east-1", CREATE_COMPLETE, started=NOW)
@@ -0,0 +1,85 @@
+import csv
+import json
+import os
+
+from core_cli.organization import export
+from core_cli.organization.export import crawl_accounts, write_csv, write_jsonl
+
+# parent -> (child OUs, accounts)
+TREE = {
+    "r-root": ([("ou-a", "Workloads"), ("ou-b", "Security")], ["111111111111"]),
+    "ou-a": ([("ou-c", "Prod")], ["222222222222"]),
+    "ou-b": ([], ["333333333333"]),
+    "ou-c": ([], ["444444444444", "555555555555"]),
+}
+
+
+class FakePaginator:
+    def __init__(self, name: str):
+        self.name = name
+
+    def paginate(self, **kwargs):
+        if self.name == "list_organizational_units_for_parent":
+            ous = TREE[kwargs["ParentId"]][0]
+            yield {"OrganizationalUnits": [{"Id": i, "Name": n} for i, n in ous]}
+        elif self.name == "list_accounts_for_parent":
+            accounts = TREE[kwargs["ParentId"]][1]
+            yield {"Accounts": [{"Id": a, "Name": f"acct-{a[0]}"} for a in accounts]}
+        elif self.name == "list_tags_for_resource":
+            yield {"Tags": [{"Key": "Owner", "Value": kwargs["ResourceId"][0]}]}
+        else:
+            yield {"Policies": [{"Id": "p-FullAWSAccess"}]}
+
+
+class FakeOrganizations:
+    def list_roots(self) -> dict:
+        return {"Roots": [{"Id": "r-root"}]}
+
+    def get_paginator(self, name: str) -> FakePaginator:
+        return FakePaginator(name)
+
+
+def test_crawl_accounts(monkeypatch):
+
+    monkeypatch.setattr(export.clients, "org_client", lambda: FakeOrganizations())
+
+    rows = {row["AccountId"]: row for row in crawl_accounts(max_workers=2)}
+
+    assert {k: (r["ParentId"], r["OuPath"]) for k, r in rows.items()} == {
+        "111111111111": ("r-root", "Root"),
+        "222222222222": ("ou-a", "Root/Workloads"),
+        "333333333333": ("ou-b", "Root/Security"),
+        "444444444444": ("ou-c", "Root/Workloads/Prod"),
+        "555555555555": ("ou-c", "Root/Workloads/Prod"),
+    }
+    assert rows["444444444444"]["Tags"] == {"Owner": "4"}
+    assert rows["444444444444"]["PolicyIds"] == ["p-FullAWSAccess"]
+
+
+def test_write(tmp_path):
+
+    def rows():
+        yield {
+            "AccountId": "111111111111",
+            "Name": "a",
+            "Email": "a@example.com",
+            "Status": "ACTIVE",
+            "JoinedMethod": "CREATED",
+            "JoinedTimestamp": "",
+            "ParentId": "r-root",
+            "OuPath": "Root",
+            "Tags": {"b": "2", "a": "1"},
+            "PolicyIds": ["p-1", "p-2"],
+        }
+
+    fn = os.path.join(tmp_path, "accounts.csv")
+    assert write_csv(fn, rows()) == 1
+    with open(fn, newline="") as f:
+        row = next(csv.DictReader(f))
+    assert row["Tags"] == '{"a": "1", "b": "2"}'
+    assert row["PolicyIds"] == "p-1;p-2"
+
+    fn = os.path.join(tmp_path, "accounts.jsonl")
+    assert write_jsonl(fn, rows()) == 1
+    with open(fn) as f:
+        assert json.loads(f.readline())["PolicyIds"] == ["p-1", "p-2"]
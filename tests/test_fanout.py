@@ -0,0 +1,150 @@
+import pytest
+
+from core_framework.constants import (
+    P_ARTEFACT_BUCKET_NAME,
+    P_BUCKET_NAME,
+    P_BUCKET_REGION,
+    P_CLIENT,
+    P_REGION,
+    P_SCOPE,
+)
+
+from core_cli.bootstrap import fanout
+from core_cli.bootstrap.deploy import P_ROLE
+from core_cli.bootstrap.fanout import (
+    P_ADDITIONAL_BUCKETS,
+    assume_roles,
+    deploy_matrix,
+    get_matrix,
+    get_role_arn,
+    get_target_data,
+)
+
+DATA = {
+    P_CLIENT: "acme",
+    P_SCOPE: None,
+    P_BUCKET_NAME: "x",
+    P_ARTEFACT_BUCKET_NAME: "x",
+}
+
+
+class FakeSTS:
+    def __init__(self, role: str | None, denied: list[str]):
+        self.role = role
+        self.denied = denied
+
+    def get_caller_identity(self):
+        if self.role in self.denied:
+            raise RuntimeError("AccessDenied")
+        return {"Arn": self.role}
+
+
+def test_get_matrix():
+
+    matrix = get_matrix(
+        ["111", "222"], ["us-east-1", "eu-west-1"], ["roles", "storage"]
+    )
+
+    # The roles stack only deploys to the first region of each account
+    assert matrix == [
+        ("111", "us-east-1", "roles"),
+        ("111", "us-east-1", "storage"),
+        ("111", "eu-west-1", "storage"),
+        ("222", "us-east-1", "roles"),
+        ("222", "us-east-1", "storage"),
+        ("222", "eu-west-1", "storage"),
+    ]
+
+
+def test_get_target_data():
+
+    regions = ["us-east-1", "eu-west-1"]
+    target = get_target_data(DATA, "111", "us-east-1", "arn:role", regions)
+
+    assert target[P_REGION] == "us-east-1"
+    assert target[P_BUCKET_REGION] == "us-east-1"
+    assert target[P_ROLE] == "arn:role"
+    assert target[P_BUCKET_NAME] == "acme-core-automation-111-us-east-1"
+    assert target[P_ARTEFACT_BUCKET_NAME] == "acme-core-automation-111-us-east-1"
+    assert target[P_ADDITIONAL_BUCKETS] == ["acme-core-automation-111-eu-west-1"]
+    # The bootstrap data is not changed
+    assert DATA[P_BUCKET_NAME] == "x"
+
+    # A separate artefacts bucket
+    data = {**DATA, P_ARTEFACT_BUCKET_NAME: "y"}
+    target = get_target_data(data, "111", "eu-west-1", None, regions)
+    assert (
+        target[P_ARTEFACT_BUCKET_NAME]
+        == "acme-core-automation-artefacts-111-eu-west-1"
+    )
+    assert target[P_ADDITIONAL_BUCKETS] == [
+        "acme-core-automation-111-us-east-1",
+        "acme-core-automation-artefacts-111-us-east-1",
+    ]
+
+
+def test_assume_roles(monkeypatch):
+
+    denied = get_role_arn("333", "Admin")
+    monkeypatch.setattr(
+        fanout.clients, "sts_client", lambda role=None: FakeSTS(role, [denied])
+    )
+
+    roles = assume_roles(["111", "222", "333"], "111", "Admin")
+
+    assert roles["111"] is None
+    assert roles["222"] == get_role_arn("222", "Admin")
+    assert isinstance(roles["333"], RuntimeError)
+
+
+def test_deploy_matrix(monkeypatch):
+
+    deployed = []
+
+    def start_deploy_stack(**kwargs):
+        if kwargs[P_REGION] == "eu-west-1":
+            raise RuntimeError("Stack failed")
+        deployed.append((kwargs["name"], kwargs[P_ROLE]))
+
+    denied = get_role_arn("333", "Admin")
+    monkeypatch.setattr(
+        fanout.clients, "sts_client", lambda role=None: FakeSTS(role, [denied])
+    )
+    monkeypatch.setattr(fanout, "start_deploy_stack", start_deploy_stack)
+
+    def storage(target: dict) -> dict:
+        return {"name": target[P_BUCKET_NAME], **target}
+
+    results = deploy_matrix(
+        DATA,
+        {"storage": storage},
+        ["111", "222", "333"],
+        ["us-east-1", "eu-west-1"],
+        "111",
+        "Admin",
+    )
+
+    assert sorted(deployed) == [
+        ("acme-core-automation-111-us-east-1", None),
+        ("acme-core-automation-222-us-east-1", get_role_arn("222", "Admin")),
+    ]
+    assert results[("111", "us-east-1", "storage")]["status"] == "complete"
+    assert results[("222", "eu-west-1", "storage")]["status"] == "failed"
+    assert results[("222", "eu-west-1", "storage")]["message"] == "Stack failed"
+    # Nothing is deployed to the account whose role cannot be assumed
+    for region in ["us-east-1", "eu-west-1"]:
+        assert results[("333", region, "storage")]["status"] == "skipped"
+
+
+def test_deploy_matrix_bucket_name(monkeypatch):
+
+    monkeypatch.setattr(fanout, "assume_roles", pytest.fail)
+
+    with pytest.raises(ValueError, match="63 characters"):
+        deploy_matrix(
+            {**DATA, P_CLIENT: "a" * 40},
+            {"storage": lambda target: target},
+            ["111111111111"],
+            ["ap-southeast-2"],
+            "111111111111",
+        )
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from core_cli.bootstrap.graph import run_graph, validate_graph
+
+
+def make_step(calls: list, name: str, delay: float = 0.0, fail: bool = False):
+    lock = threading.Lock()
+
+    def step(data: dict):
+        time.sleep(delay)
+        with lock:
+            calls.append(name)
+        if fail:
+            raise RuntimeError(f"{name} failed")
+
+    return step
+
+
+def test_validate_graph():
+
+    def noop(data):
+        pass
+
+    order = validate_graph(
+        {"c": (noop, ["a", "b"]), "b": (noop, ["a"]), "a": (noop, [])}
+    )
+    assert order == ["a", "b", "c"]
+
+    with pytest.raises(ValueError, match="unknown step"):
+        validate_graph({"a": (noop, ["missing"])})
+
+    with pytest.raises(ValueError, match="Circular"):
+        validate_graph({"a": (noop, ["b"]), "b": (noop, ["a"]), "c": (noop, [])})
+
+
+def test_run_graph():
+
+    calls: list[str] = []
+    nodes = {
+        "a": (make_step(calls, "a"), []),
+        "b": (make_step(calls, "b"), ["a"]),
+        "c": (make_step(calls, "c"), ["a"]),
+        "d": (make_step(calls, "d"), ["b", "c"]),
+    }
+
+    results = run_graph(nodes, {}, quiet=True)
+
+    assert calls[0] == "a" and calls[-1] == "d"
+    assert sorted(calls) == ["a", "b", "c", "d"]
+    assert all(r["status"] == "complete" for r in results.values())
+
+
+def test_run_graph_failure():
+
+    calls: list[str] = []
+    nodes = {
+        "fail": (make_step(calls, "fail", fail=True), []),
+        "slow": (make_step(calls, "slow", delay=0.2), []),
+        "after": (make_step(calls, "after"), ["slow"]),
+    }
+    completed: list[str] = []
+
+    with pytest.raises(RuntimeError, match="fail failed"):
+        run_graph(nodes, {}, on_complete=completed.append, quiet=True)
+
+    # The running step finishes.  Nothing new starts after the failure.
+    assert sorted(calls) == ["fail", "slow"]
+    assert completed == ["slow"]
+
+    # Resume
+    calls.clear()
+    nodes["fail"] = (make_step(calls, "fail"), [])
+    results = run_graph(nodes, {}, completed=set(completed), quiet=True)
+
+    assert sorted(calls) == ["after", "fail"]
+    assert results["slow"]["status"] == "resumed"
+    assert results["after"]["status"] == "complete"
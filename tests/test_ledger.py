@@ -0,0 +1,55 @@
+import os
+
+from core_cli.bootstrap import ledger
+from core_cli.bootstrap.ledger import (
+    forget_deployment,
+    get_fingerprint,
+    is_unchanged,
+    record_deployment,
+)
+
+TEMPLATE = "Resources:\n  Bucket:\n    Type: AWS::S3::Bucket\n"
+
+
+def test_fingerprint():
+
+    parameters = {"BucketName": "a", "Scope": ""}
+    tags = {"Client": "acme", "Portfolio": "core"}
+    fingerprint = get_fingerprint(TEMPLATE, parameters, tags)
+
+    # The order of the parameters and tags doesn't matter
+    reordered = get_fingerprint(
+        TEMPLATE,
+        {"Scope": "", "BucketName": "a"},
+        {"Portfolio": "core", "Client": "acme"},
+    )
+    assert fingerprint == reordered
+    assert get_fingerprint(TEMPLATE, parameters, None) == get_fingerprint(
+        TEMPLATE, parameters, {}
+    )
+
+    # Anything deployed changing does
+    assert fingerprint != get_fingerprint(TEMPLATE + "\n", parameters, tags)
+    assert fingerprint != get_fingerprint(
+        TEMPLATE, {**parameters, "BucketName": "b"}, tags
+    )
+    assert fingerprint != get_fingerprint(TEMPLATE, parameters, {"Client": "acme"})
+
+
+def test_ledger(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(ledger, "LEDGER_FILE", os.path.join(tmp_path, "ledger.json"))
+    monkeypatch.setattr(ledger.util, "get_aws_profile", lambda: "test")
+
+    role = "arn:aws:iam::111111111111:role/Deploy"
+
+    assert not is_unchanged("core-automation-roles", "us-east-1", "f1")
+
+    record_deployment("core-automation-roles", "us-east-1", "f1")
+    assert is_unchanged("core-automation-roles", "us-east-1", "f1")
+    assert not is_unchanged("core-automation-roles", "us-east-1", "f2")
+    assert not is_unchanged("core-automation-roles", "eu-west-1", "f1")
+    assert not is_unchanged("core-automation-roles", "us-east-1", "f1", role)
+
+    forget_deployment("core-automation-roles", "us-east-1")
+    assert not is_unchanged("core-automation-roles", "us-east-1", "f1")
@@ -0,0 +1,198 @@
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core_cli.packager import (
+    build_package,
+    get_package_sha256,
+    list_package_files,
+    load_manifest,
+    stream_package,
+    MANIFEST_FILE,
+)
+
+
+def make_platform(root, files: dict[str, bytes]) -> str:
+    platform = os.path.join(root, "platform")
+    for name, data in files.items():
+        path = os.path.join(platform, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    return platform
+
+
+def test_build_package(tmp_path):
+
+    big = (os.urandom(64) + b"\0" * 192) * 12288  # 3 MiB, several chunks
+    platform = make_platform(
+        tmp_path,
+        {
+            "components/app/main.yaml": b"Resources: {}\n" * 100,
+            "components/app/big.bin": big,
+            "components/app/image.png": b"\x89PNG" + os.urandom(1000),
+            "components/app/__pycache__/x.pyc": b"x",
+            "vars/app.yaml": b"",
+            "README.md": b"not packaged",
+        },
+    )
+
+    fn = os.path.join(tmp_path, "package.zip")
+    totals = build_package(platform, fn, max_workers=4)
+
+    with zipfile.ZipFile(fn) as zipf:
+        assert zipf.testzip() is None
+        names = zipf.namelist()
+        assert names == sorted(names)
+        assert names == [
+            "components/app/big.bin",
+            "components/app/image.png",
+            "components/app/main.yaml",
+            "vars/app.yaml",
+        ]
+        assert zipf.read("components/app/big.bin") == big
+        assert zipf.read("vars/app.yaml") == b""
+        info = zipf.getinfo("components/app/image.png")
+        assert info.compress_type == zipfile.ZIP_STORED
+        assert info.date_time == (1980, 1, 1, 0, 0, 0)
+        info = zipf.getinfo("components/app/big.bin")
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+        assert info.compress_size < info.file_size
+
+    assert totals["Files"] == 4
+
+    # Reproducible
+    fn2 = os.path.join(tmp_path, "package2.zip")
+    build_package(platform, fn2, max_workers=1)
+    with open(fn, "rb") as a, open(fn2, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_manifest(tmp_path):
+
+    platform = make_platform(
+        tmp_path,
+        {
+            MANIFEST_FILE: b"# packaged\ncomponents\nextra/*.yaml\n!*.md\n",
+            "components/a.yaml": b"a",
+            "components/notes.md": b"b",
+            "extra/b.yaml": b"c",
+            "extra/c.txt": b"d",
+            "vars/d.yaml": b"e",
+        },
+    )
+
+    includes, excludes = load_manifest(platform)
+    names = [name for name, _ in list_package_files(platform, includes, excludes)]
+    assert names == ["components/a.yaml", "extra/b.yaml"]
+
+
+@pytest.mark.skipif(
+    not os.environ.get("PACKAGER_BENCHMARK"), reason="set PACKAGER_BENCHMARK=1"
+)
+def test_benchmark(tmp_path):
+
+    # 200 templates and 40 x 8 MiB of semi-compressible data
+    files = {}
+    for i in range(200):
+        files[f"components/c{i}/template.yaml"] = b"Type: AWS::S3::Bucket\n" * 2000
+    for i in range(40):
+        files[f"vars/data{i}.bin"] = (os.urandom(64) + b"\0" * 192) * 32768
+    platform = make_platform(tmp_path, files)
+
+    start = time.monotonic()
+    with zipfile.ZipFile(os.path.join(tmp_path, "zipfile.zip"), "w") as zipf:
+        for name, _ in list_package_files(platform, ["components", "vars"], []):
+            zipf.write(os.path.join(platform, name), name, zipfile.ZIP_DEFLATED)
+    baseline = time.monotonic() - start
+
+    totals = build_package(platform, os.path.join(tmp_path, "package.zip"))
+
+    print(f"\nzipfile: {baseline:.2f}s  build_package: {totals['Elapsed']:.2f}s")
+
+
+def test_incremental(tmp_path):
+
+    files = {f"components/c{i}/template.yaml": b"x: %d\n" % i * 5000 for i in range(20)}
+    files["vars/app.yaml"] = b"a: 1\n"
+    platform = make_platform(tmp_path, files)
+
+    fn = os.path.join(tmp_path, "package.zip")
+    totals = build_package(platform, fn)
+    assert totals["Rebuilt"] and totals["Reused"] == 0
+
+    # Nothing changed
+    totals = build_package(platform, fn)
+    assert not totals["Rebuilt"]
+    assert get_package_sha256(fn) == totals["Sha256"]
+
+    # One file changed.  The others are copied and the zip is the same as a full build
+    with open(os.path.join(platform, "vars", "app.yaml"), "wb") as f:
+        f.write(b"a: 2\n")
+    totals = build_package(platform, fn)
+    assert totals["Rebuilt"] and totals["Reused"] == 20
+
+    full = os.path.join(tmp_path, "full.zip")
+    build_package(platform, full, incremental=False)
+    with open(fn, "rb") as a, open(full, "rb") as b:
+        assert a.read() == b.read()
+    with zipfile.ZipFile(fn) as zipf:
+        assert zipf.read("vars/app.yaml") == b"a: 2\n"
+
+
+def test_incremental_replaced_zip(tmp_path):
+
+    platform = make_platform(
+        tmp_path, {"components/x.yaml": b"v: 1\n", "vars/app.yaml": b"a: 1\n"}
+    )
+
+    fn = os.path.join(tmp_path, "package.zip")
+    build_package(platform, fn)
+
+    # Another build of the same names replaces the zip.  Its manifest is kept.
+    stale = make_platform(
+        os.path.join(tmp_path, "stale"),
+        {"components/x.yaml": b"v: STALE\n", "vars/app.yaml": b"a: 1\n"},
+    )
+    build_package(stale, os.path.join(tmp_path, "stale.zip"), incremental=False)
+    os.replace(os.path.join(tmp_path, "stale.zip"), fn)
+
+    with open(os.path.join(platform, "vars", "app.yaml"), "wb") as f:
+        f.write(b"a: 2\n")
+    totals = build_package(platform, fn)
+    assert totals["Rebuilt"] and totals["Reused"] == 0
+
+    with zipfile.ZipFile(fn) as zipf:
+        assert zipf.read("components/x.yaml") == b"v: 1\n"
+        assert zipf.read("vars/app.yaml") == b"a: 2\n"
+
+
+def test_stream_package(tmp_path):
+
+    files = {
+        "components/app/big.bin": (os.urandom(64) + b"\0" * 192) * 12288,
+        "components/app/image.png": os.urandom(1000),
+        "vars/app.yaml": b"a: 1\n",
+    }
+    platform = make_platform(tmp_path, files)
+
+    # Not seekable
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with os.fdopen(write_fd, "wb") as writer:
+            return stream_package(platform, writer)
+
+    with os.fdopen(read_fd, "rb") as reader, ThreadPoolExecutor(1) as executor:
+        future = executor.submit(write)
+        data = reader.read()
+    assert future.result()["Files"] == 3
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zipf:
+        assert zipf.testzip() is None
+        for name, content in files.items():
+            assert zipf.read(name) == content
@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from core_cli.bootstrap.preflight import check_preflight_results, run_preflight
+
+
+def test_run_preflight():
+
+    barrier = threading.Barrier(3, timeout=5)
+
+    def probe(value):
+        def run():
+            # Every probe waits for the others, so this only passes concurrently
+            barrier.wait()
+            time.sleep(0.01)
+            return value
+
+        return run
+
+    def fail():
+        barrier.wait()
+        raise Exception("not allowed")
+
+    results = run_preflight({"a": probe("1"), "b": probe(2), "c": fail})
+
+    assert results["a"]["ok"] and results["a"]["value"] == "1"
+    assert results["b"]["ok"] and results["b"]["value"] == 2
+    assert results["a"]["elapsed"] > 0
+    assert results["c"] == {"ok": False, "elapsed": 0.0, "error": "not allowed"}
+
+
+def test_check_preflight_results():
+
+    ok = {"ok": True, "elapsed": 0.1, "value": "1"}
+    check_preflight_results({"a": ok, "b": {**ok, "value": False}})
+
+    failed = {"ok": False, "elapsed": 0.0, "error": "not allowed"}
+    with pytest.raises(Exception, match="c: not allowed"):
+        check_preflight_results({"a": ok, "c": failed})
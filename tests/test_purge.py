@@ -0,0 +1,137 @@
+import threading
+from datetime import datetime, timezone
+
+from core_cli.engine.purge import (
+    MAX_DELETE_BATCH,
+    estimate_prefixes,
+    iter_batches,
+    purge_prefixes,
+)
+
+
+class FakePaginator:
+    def __init__(self, pages: list[dict]):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeS3:
+    """list_objects_v2 pages of 1,000 keys and a delete_objects that records calls"""
+
+    def __init__(self, keys: list[str], failed: set[str] | None = None):
+        self.keys = keys
+        self.failed = failed or set()
+        self.deletes: list[list[dict]] = []
+        self.lock = threading.Lock()
+
+    def get_paginator(self, name: str) -> FakePaginator:
+        assert name == "list_objects_v2"
+        contents = [{"Key": k, "Size": 10} for k in self.keys]
+        pages = [contents[i : i + 1000] for i in range(0, len(contents), 1000)]
+        return FakePaginator([{"Contents": page} for page in pages])
+
+    def delete_objects(self, Bucket: str, Delete: dict) -> dict:
+        with self.lock:
+            self.deletes.append(Delete["Objects"])
+        errors = [
+            {"Key": o["Key"], "Code": "AccessDenied", "Message": "Access Denied"}
+            for o in Delete["Objects"]
+            if o["Key"] in self.failed
+        ]
+        return {"Errors": errors}
+
+
+def test_iter_batches():
+
+    assert MAX_DELETE_BATCH == 1000
+
+    batches = list(iter_batches({"Key": str(i)} for i in range(2500)))
+    assert [len(b) for b in batches] == [1000, 1000, 500]
+    assert batches[2][-1] == {"Key": "2499"}
+
+    assert [len(b) for b in iter_batches(iter([{}] * 2000))] == [1000, 1000]
+    assert list(iter_batches(iter([]))) == []
+    assert [len(b) for b in iter_batches(iter([{}] * 5), size=2)] == [2, 2, 1]
+
+
+def test_purge_prefixes():
+
+    keys = [f"packages/web/api/main/{i}/package.zip" for i in range(2345)]
+    s3 = FakeS3(keys, failed={keys[7]})
+
+    results = purge_prefixes(s3, "bucket", ["packages/web/"], versions=False)
+
+    assert sorted(len(batch) for batch in s3.deletes) == [345, 1000, 1000]
+    assert sorted(o["Key"] for batch in s3.deletes for o in batch) == sorted(keys)
+
+    result = results["packages/web/"]
+    assert result["Objects"] == 2344
+    assert result["Bytes"] == 23440
+    assert result["Errors"] == [f"{keys[7]}: Access Denied"]
+
+
+class FakeVersionedPaginator:
+    def __init__(self, pages: dict):
+        self.pages = pages
+
+    def paginate(self, Bucket: str, Prefix: str):
+        return iter(self.pages[Prefix])
+
+
+class FakeVersionedS3:
+    """list_object_versions of two prefixes, with a delete marker"""
+
+    PAGES = {
+        "packages/web/": [
+            {
+                "Versions": [
+                    {
+                        "Key": "packages/web/a",
+                        "VersionId": "1",
+                        "Size": 100,
+                        "LastModified": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    },
+                    {
+                        "Key": "packages/web/a",
+                        "VersionId": "2",
+                        "Size": 50,
+                        "LastModified": datetime(2024, 3, 1, tzinfo=timezone.utc),
+                    },
+                ],
+                "DeleteMarkers": [
+                    {
+                        "Key": "packages/web/b",
+                        "VersionId": "3",
+                        "LastModified": datetime(2024, 5, 1, tzinfo=timezone.utc),
+                    }
+                ],
+            }
+        ],
+        "artefacts/web/": [{}],
+    }
+
+    def get_paginator(self, name: str) -> FakeVersionedPaginator:
+        assert name == "list_object_versions"
+        return FakeVersionedPaginator(self.PAGES)
+
+
+def test_estimate_prefixes():
+
+    estimates = estimate_prefixes(
+        FakeVersionedS3(), "bucket", ["packages/web/", "artefacts/web/"], versions=True
+    )
+
+    assert estimates["packages/web/"] == {
+        "Objects": 3,
+        "Bytes": 150,
+        "Oldest": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "Newest": datetime(2024, 5, 1, tzinfo=timezone.utc),
+    }
+    assert estimates["artefacts/web/"] == {
+        "Objects": 0,
+        "Bytes": 0,
+        "Oldest": None,
+        "Newest": None,
+    }
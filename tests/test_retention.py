@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+from core_cli.engine.retention import get_deletable_builds
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def make_builds(branches: dict[str, list[int]]) -> dict:
+    """Builds of each branch, named by their age in days"""
+    return {
+        ("web", "api", branch, str(age)): {
+            "Objects": 1,
+            "Bytes": 100,
+            "Newest": NOW - timedelta(days=age),
+            "Roots": {"packages"},
+        }
+        for branch, ages in branches.items()
+        for age in ages
+    }
+
+
+def test_keep():
+
+    builds = make_builds({"main": [1, 2, 3, 4], "dev": [5]})
+
+    deletable = get_deletable_builds(builds, keep=2, now=NOW)
+
+    assert deletable == [("web", "api", "main", "3"), ("web", "api", "main", "4")]
+
+
+def test_max_age():
+
+    builds = make_builds({"main": [1, 10, 40, 50], "dev": [60, 90]})
+
+    deletable = get_deletable_builds(builds, max_age_days=30, now=NOW)
+
+    # The latest build of dev is kept although it is too old
+    assert deletable == [
+        ("web", "api", "dev", "90"),
+        ("web", "api", "main", "40"),
+        ("web", "api", "main", "50"),
+    ]
+
+    deletable = get_deletable_builds(
+        builds, max_age_days=30, now=NOW, delete_latest=True
+    )
+    assert ("web", "api", "dev", "60") in deletable
+
+
+def test_keep_and_max_age():
+
+    builds = make_builds({"main": [1, 2, 3, 40], "dev": [50, 60]})
+
+    deletable = get_deletable_builds(builds, keep=3, max_age_days=30, now=NOW)
+
+    # Too old, except dev 50 which is the latest build of its branch
+    assert deletable == [("web", "api", "dev", "60"), ("web", "api", "main", "40")]
@@ -0,0 +1,78 @@
+from core_framework.constants import P_AWS_PROFILE, P_BUCKET_NAME, P_BUCKET_REGION
+
+from core_cli.run import run
+from core_cli.run.run import (
+    TASKS,
+    _get_requested_depends,
+    get_batch_base,
+    get_task_graph,
+)
+
+
+def test_requested_depends():
+
+    tasks = ["package", "upload", "compile", "deploy"]
+    assert _get_requested_depends("package", tasks) == []
+    assert _get_requested_depends("upload", tasks) == ["package"]
+    assert _get_requested_depends("deploy", tasks) == ["compile"]
+
+    # Tasks that were not requested pass their dependencies through
+    assert _get_requested_depends("compile", ["package", "compile"]) == ["package"]
+    assert _get_requested_depends("deploy", ["package", "deploy"]) == ["package"]
+    assert _get_requested_depends("release", ["release"]) == []
+    # Through apply and plan, and through release and deploy
+    depends = _get_requested_depends("teardown", ["compile", "teardown"])
+    assert depends == ["compile", "compile"]
+
+
+def test_get_task_graph():
+
+    graph = get_task_graph(["package", "upload", "compile", "deploy", "release"])
+    assert {task: depends for task, (_, depends) in graph.items()} == {
+        "package": [],
+        "upload": ["package"],
+        "compile": ["upload"],
+        "deploy": ["compile"],
+        "release": ["deploy"],
+    }
+
+    # Both branches of teardown lead back to compile.  Duplicates are dropped.
+    graph = get_task_graph(["compile", "teardown", "teardown", "unknown"])
+    assert list(graph) == ["compile", "teardown"]
+    assert graph["teardown"][1] == ["compile"]
+    assert graph["compile"][1] == []
+
+
+def test_task_node():
+
+    calls = []
+
+    def task(**kwargs):
+        calls.append(kwargs)
+        return {"state": 1}
+
+    saved = TASKS["package"]
+    TASKS["package"] = (saved[0], task)
+    try:
+        node, _ = get_task_graph(["package"])["package"]
+    finally:
+        TASKS["package"] = saved
+
+    data = {"client": "acme"}
+    node(data)
+    assert calls == [{"client": "acme"}]
+    assert data == {"client": "acme", "state": 1}
+
+
+def test_get_batch_base(monkeypatch):
+
+    defaults = {P_AWS_PROFILE: "default", P_BUCKET_NAME: None, P_BUCKET_REGION: "x"}
+    monkeypatch.setattr(run, "_OPTION_DEFAULTS", defaults)
+
+    kwargs = {**defaults, "tasks": ["package"]}
+    # The client options come from make_defaults() for each client
+    assert get_batch_base(kwargs) == {P_BUCKET_REGION: "x", "tasks": ["package"]}
+
+    # Unless the user set them
+    kwargs[P_AWS_PROFILE] = "shared"
+    assert get_batch_base(kwargs)[P_AWS_PROFILE] == "shared"
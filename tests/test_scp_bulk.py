@@ -0,0 +1,48 @@
+from core_cli.organization import scp_bulk
+from core_cli.organization.scp_bulk import (
+    ACTION_ATTACH,
+    ACTION_DETACH,
+    RateLimiter,
+    compute_plan,
+)
+
+
+def test_compute_plan(monkeypatch):
+
+    current = {"111111111111": {}, "ou-abcd-1234": {}}
+    monkeypatch.setattr(scp_bulk, "get_policy_targets", lambda policy_id: current)
+
+    targets = ["111111111111", "222222222222", "ou-abcd-1234", "ou-abcd-5678"]
+
+    plan = compute_plan(ACTION_ATTACH, "p-1", targets)
+    assert plan["change"] == ["222222222222", "ou-abcd-5678"]
+    assert plan["skip"] == ["111111111111", "ou-abcd-1234"]
+    assert plan["current"] == ["111111111111", "ou-abcd-1234"]
+
+    plan = compute_plan(ACTION_DETACH, "p-1", targets)
+    assert plan["change"] == ["111111111111", "ou-abcd-1234"]
+    assert plan["skip"] == ["222222222222", "ou-abcd-5678"]
+
+    plan = compute_plan(ACTION_ATTACH, "p-1", [])
+    assert plan["change"] == [] and plan["skip"] == []
+
+
+def test_rate_limiter_recovers():
+
+    limiter = RateLimiter(4.0)
+
+    limiter.slow_down()
+    limiter.slow_down()
+    assert limiter.rate == 1.0
+
+    limiter.speed_up()
+    assert limiter.rate == 1.2
+
+    for _ in range(100):
+        limiter.speed_up()
+    assert limiter.rate == 4.0
+
+    # Never below the floor
+    for _ in range(100):
+        limiter.slow_down()
+    assert limiter.rate == 0.1
@@ -0,0 +1,93 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from core_cli.bootstrap import staging
+from core_cli.bootstrap.staging import (
+    MAX_TEMPLATE_BODY_SIZE,
+    get_template_key,
+    get_template_source,
+)
+
+BODY = "Resources:\n  Bucket:\n    Type: AWS::S3::Bucket\n"
+
+
+def not_found(operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation)
+
+
+class FakeS3:
+    def __init__(self, buckets: list[str]):
+        self.buckets = buckets
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.puts = 0
+        self.roles: list[str | None] = []
+
+    def head_bucket(self, Bucket: str):
+        if Bucket not in self.buckets:
+            raise not_found("HeadBucket")
+
+    def head_object(self, Bucket: str, Key: str):
+        if (Bucket, Key) not in self.objects:
+            raise not_found("HeadObject")
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, ContentType: str):
+        self.objects[(Bucket, Key)] = Body
+        self.puts += 1
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    s3 = FakeS3(["acme-core-automation-us-east-1"])
+
+    def s3_client(region: str, role: str | None = None) -> FakeS3:
+        s3.roles.append(role)
+        return s3
+
+    monkeypatch.setattr(staging.clients, "s3_client", s3_client)
+    monkeypatch.setattr(staging, "_BUCKETS", {})
+    monkeypatch.setattr(staging, "_STAGED", set())
+    return s3
+
+
+def test_staged_once(s3):
+
+    bucket_name = "acme-core-automation-us-east-1"
+    key = get_template_key(BODY)
+
+    for _ in range(3):
+        source = get_template_source(BODY, bucket_name, "us-east-1")
+        assert source == {
+            "TemplateURL": f"https://{bucket_name}.s3.us-east-1.amazonaws.com/{key}"
+        }
+
+    assert s3.puts == 1
+    assert s3.objects[(bucket_name, key)] == BODY.encode("utf-8")
+
+    # Content addressed
+    assert get_template_key(BODY + "\n") != key
+
+
+def test_inline(s3):
+
+    assert get_template_source(BODY) == {"TemplateBody": BODY}
+    assert get_template_source(BODY, "missing", "us-east-1") == {"TemplateBody": BODY}
+    assert s3.puts == 0
+
+    large = "#" * (MAX_TEMPLATE_BODY_SIZE + 1)
+    with pytest.raises(Exception, match="must be staged"):
+        get_template_source(large, "missing", "us-east-1")
+
+
+def test_role(s3):
+
+    role = "arn:aws:iam::222222222222:role/OrganizationAccountAccessRole"
+    bucket_name = "acme-core-automation-us-east-1"
+
+    source = get_template_source(BODY, bucket_name, "us-east-1", role)
+    assert "TemplateURL" in source
+    assert s3.roles == [role]
+
+    # The bucket is checked again with the credentials of another role
+    get_template_source(BODY, bucket_name, "us-east-1")
+    assert s3.roles == [role, None]
+    assert set(staging._BUCKETS) == {(bucket_name, role), (bucket_name, None)}
@@ -0,0 +1,81 @@
+import base64
+import hashlib
+import io
+import os
+
+import pytest
+
+from core_cli.transfer import _ChecksumWriter, get_checksum_sha256, link_file
+
+# The smallest part size S3 accepts
+PART_SIZE = 5 * 1024 * 1024
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+@pytest.mark.parametrize("size", [PART_SIZE - 1, PART_SIZE, PART_SIZE + 1])
+def test_checksum_sha256(tmp_path, size):
+
+    data = os.urandom(size)
+    fn = os.path.join(tmp_path, "package.zip")
+    with open(fn, "wb") as f:
+        f.write(data)
+
+    if size < PART_SIZE:
+        # One PutObject
+        expected = b64(hashlib.sha256(data).digest())
+    else:
+        # At the part size, a multipart upload of one part
+        parts = [data[i : i + PART_SIZE] for i in range(0, size, PART_SIZE)]
+        assert len(parts) == (1 if size == PART_SIZE else 2)
+        digests = b"".join(hashlib.sha256(part).digest() for part in parts)
+        expected = f"{b64(hashlib.sha256(digests).digest())}-{len(parts)}"
+
+    assert get_checksum_sha256(fn, PART_SIZE) == expected
+
+    # The same while streaming, whatever the size of the writes
+    writer = _ChecksumWriter(io.BytesIO(), PART_SIZE)
+    for i in range(0, size, 1000003):
+        writer.write(data[i : i + 1000003])
+    assert writer.get_checksum_sha256() == expected
+    assert writer.f.getvalue() == data
+
+
+def test_link_file(tmp_path):
+
+    src = os.path.join(tmp_path, "package.zip")
+    with open(src, "wb") as f:
+        f.write(b"new package")
+
+    # Replaces what is there.  The copy doesn't share the package's inode.
+    dest = os.path.join(tmp_path, "bucket", "packages", "package.zip")
+    os.makedirs(os.path.dirname(dest))
+    with open(dest, "wb") as f:
+        f.write(b"old package")
+
+    assert link_file(src, dest) in ["reflink", "copy"]
+    with open(dest, "rb") as f:
+        assert f.read() == b"new package"
+    assert not os.path.samefile(src, dest)
+    assert os.listdir(os.path.dirname(dest)) == ["package.zip"]
+
+    # Writing the object in place leaves the package alone
+    with open(dest, "r+b") as f:
+        f.write(b"NEW")
+    with open(src, "rb") as f:
+        assert f.read() == b"new package"
+
+
+def test_link_file_unchanged(tmp_path):
+
+    src = os.path.join(tmp_path, "package.zip")
+    with open(src, "wb") as f:
+        f.write(b"package")
+
+    dest = os.path.join(tmp_path, "bucket", "package.zip")
+    os.makedirs(os.path.dirname(dest))
+    os.link(src, dest)
+
+    assert link_file(src, dest) == "unchanged"